@@ -0,0 +1,7 @@
+"""
+ysn: shared building blocks for the ysn topology scripts
+
+The ysn_*.py scripts in the parent directory import their routers,
+topology helpers and measurement tools from here, so they must be run
+from that directory (e.g. sudo python ysn_5.py).
+"""
@@ -0,0 +1,257 @@
+"""
+assign.py: move switches between controllers as their load changes
+
+MultiSwitch in ysn_7.py and ysn_8.py connects each switch to the
+controller its script's cmap names ( { 's1': c1, 's2': c0, ... } ), and
+that is where it stays: one busy switch on a slow controller ( Maple,
+the reference Controller, a RemoteController on another machine ) sets
+the first-packet latency for everything behind it.  An Assigner owns
+the cmap of a running network instead:
+
+    assigner = Assigner( net, script.cmap, failover=True )
+    assigner.start(); CLI( net ); assigner.stop()
+
+Every interval it reads each switch's packet-in rate ( table misses,
+see ysn/proactive.py ) and, when the busiest controller carries more
+than threshold above the idlest one, moves switches from the one to the
+other ( ovs-vsctl set-controller ), each time the switch whose rate
+best halves the gap.  With failover, a controller that stops accepting
+connections is treated as a failed master: its switches move to the
+least loaded live controller, and it gets switches again once it
+listens.  cmap is updated in place, so a restarted MultiSwitch comes
+back on its current controller.
+
+setupLatency() measures what each controller costs a new flow: the
+first RTT between two nodes on one of its switches, with flows and
+neighbour caches cleared, less the RTT once flows are in place.
+"""
+
+import re
+import socket
+from threading import Thread, Event
+from time import time
+
+from mininet.log import info, warn
+
+from ysn.bench import distribution
+from ysn.proactive import tableMisses
+
+RTT = re.compile( r'time=([\d.]+) ms' )
+
+
+def target( controller ):
+    "ovs-vsctl target of a controller."
+    return '%s:%s:%d' % ( getattr( controller, 'protocol', 'tcp' ),
+                          controller.IP(), controller.port )
+
+def listening( controller, timeout=.5 ):
+    "Does a controller accept connections?"
+    try:
+        sock = socket.create_connection( ( controller.IP(),
+                                           controller.port ), timeout )
+    except ( socket.error, socket.timeout ):
+        return False
+    sock.close()
+    return True
+
+
+class Assigner( object ):
+    "Balance switches across controllers by packet-in rate."
+
+    def __init__( self, net, cmap, controllers=None, interval=1,
+                  threshold=.25, minRate=10, failover=False ):
+        """net: running Mininet
+           cmap: { switch name: controller }, updated in place
+           controllers: controllers to use ( default: the network's )
+           interval: seconds between checks
+           threshold: spread of controller loads ( relative to the
+                      busiest ) that triggers moves
+           minRate: packet-ins/s below which nothing moves
+           failover: move the switches of controllers that stop
+                     listening ( otherwise they wait for them )"""
+        self.net = net
+        self.cmap = cmap
+        self.controllers = controllers or list( net.controllers )
+        self.interval = interval
+        self.threshold = threshold
+        self.minRate = minRate
+        self.failover = failover
+        self.switches = [ s for s in net.switches if s.name in cmap ]
+        self.misses = dict( ( s.name, tableMisses( s ) )
+                            for s in self.switches )
+        self.rates = dict( ( s.name, 0.0 ) for s in self.switches )
+        self.dead = set()
+        self.moves = []  # dicts of time, switch, from, to, reason
+        self.thread = None
+        self.stopped = Event()
+        self.started = None
+
+    def assign( self, switch, controller, reason ):
+        "Point a switch at another controller."
+        old = self.cmap[ switch.name ]
+        switch.vsctl( 'set-controller', switch, target( controller ) )
+        self.cmap[ switch.name ] = controller
+        self.moves.append( { 't': round( time() - self.started, 3 ),
+                             'switch': switch.name, 'from': old.name,
+                             'to': controller.name, 'reason': reason } )
+        info( '*** Moving %s from %s to %s ( %s )\n' % (
+            switch, old, controller, reason ) )
+
+    def loads( self ):
+        "{ controller: packet-ins/s } of the live controllers."
+        loads = dict( ( c, 0.0 ) for c in self.controllers
+                      if c not in self.dead )
+        for name, rate in self.rates.items():
+            if self.cmap[ name ] in loads:
+                loads[ self.cmap[ name ] ] += rate
+        return loads
+
+    def measure( self, seconds ):
+        "Update the packet-in rates over the last seconds."
+        for switch in self.switches:
+            misses = tableMisses( switch )
+            self.rates[ switch.name ] = max(
+                0, misses - self.misses[ switch.name ] ) / float( seconds )
+            self.misses[ switch.name ] = misses
+
+    def checkControllers( self ):
+        "Note controllers that stopped or started listening."
+        for controller in self.controllers:
+            alive = listening( controller )
+            if alive and controller in self.dead:
+                info( '*** Controller %s is listening\n' % controller )
+                self.dead.discard( controller )
+            elif not alive and controller not in self.dead:
+                warn( '*** Controller %s is not listening\n' % controller )
+                self.dead.add( controller )
+
+    def evacuate( self ):
+        "Move the switches of dead controllers to live ones."
+        loads = self.loads()
+        if not loads:
+            return
+        for switch in self.switches:
+            if self.cmap[ switch.name ] in self.dead:
+                backup = min( loads, key=lambda c: ( loads[ c ], c.name ) )
+                loads[ backup ] += self.rates[ switch.name ]
+                self.assign( switch, backup, 'failover' )
+
+    def balance( self ):
+        """Move switches from the busiest to the idlest controller until
+           their loads are within threshold."""
+        loads = self.loads()
+        if len( loads ) < 2:
+            return
+        while True:
+            busy = max( loads, key=lambda c: ( loads[ c ], c.name ) )
+            idle = min( loads, key=lambda c: ( loads[ c ], c.name ) )
+            gap = loads[ busy ] - loads[ idle ]
+            if ( loads[ busy ] < self.minRate or
+                 gap <= self.threshold * loads[ busy ] ):
+                return
+            # Moving a rate below the gap always narrows it
+            candidates = [ s for s in self.switches
+                           if self.cmap[ s.name ] is busy and
+                           0 < self.rates[ s.name ] < gap ]
+            if not candidates:
+                return
+            switch = min( candidates, key=lambda s: abs(
+                self.rates[ s.name ] - gap / 2 ) )
+            self.assign( switch, idle, 'load %.0f/s vs %.0f/s' % (
+                loads[ busy ], loads[ idle ] ) )
+            loads[ busy ] -= self.rates[ switch.name ]
+            loads[ idle ] += self.rates[ switch.name ]
+
+    def step( self, seconds ):
+        "One check: rates and controllers, then failover, then balance."
+        self.measure( seconds )
+        # Only controllers that listen take switches, with or without
+        # failover
+        self.checkControllers()
+        if self.failover:
+            self.evacuate()
+        self.balance()
+
+    def loop( self ):
+        "Check every interval until stopped."
+        last = time()
+        while not self.stopped.wait( self.interval ):
+            now = time()
+            try:
+                self.step( now - last )
+            except Exception as e:  # pylint: disable=broad-except
+                warn( '*** Assigner: %s\n' % e )
+            last = now
+
+    def start( self ):
+        "Start checking in the background."
+        self.started = time()
+        info( '*** Assigning %d switches to %d controllers\n' % (
+            len( self.switches ), len( self.controllers ) ) )
+        self.thread = Thread( target=self.loop )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop( self ):
+        "Stop checking."
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def status( self ):
+        """Current assignment and loads.
+           returns: { controller name: { switches, packetInRate, dead } }"""
+        status = dict( ( c.name, { 'switches': [], 'packetInRate': 0.0,
+                                   'dead': c in self.dead } )
+                       for c in self.controllers )
+        for name in sorted( self.rates ):
+            entry = status.setdefault( self.cmap[ name ].name, {
+                'switches': [], 'packetInRate': 0.0, 'dead': False } )
+            entry[ 'switches' ].append( name )
+            entry[ 'packetInRate' ] += self.rates[ name ]
+        return status
+
+
+def endpoints( switch ):
+    "Interfaces of two addressed nodes attached to switch, or None."
+    nodes = []
+    for intf in switch.intfList():
+        if not intf.link:
+            continue
+        peer = intf.link.intf1 if intf.link.intf2 is intf \
+            else intf.link.intf2
+        if peer.IP() and peer.node.inNamespace:
+            nodes.append( peer )
+    return ( nodes[ 0 ], nodes[ 1 ] ) if len( nodes ) > 1 else None
+
+def setupLatency( switch, samples=3 ):
+    """Flow-setup cost of a switch's controller: first RTT between two
+       nodes on the switch with flows and caches cleared, less the RTT
+       that follows.
+       returns: list of ms, one per sample that got both replies"""
+    pair = endpoints( switch )
+    if pair is None:
+        return []
+    src, dst = pair
+    costs = []
+    for _ in range( samples ):
+        for intf in pair:
+            intf.node.cmd( 'ip neigh flush all' )
+        switch.dpctl( 'del-flows' )
+        rtts = [ float( m ) for m in RTT.findall( src.node.cmd(
+            'ping -n -c 2 -i 0.2 -W 1 -I %s %s' % ( src.name, dst.IP() ) ) ) ]
+        if len( rtts ) == 2:
+            costs.append( max( 0, rtts[ 0 ] - rtts[ 1 ] ) )
+    return costs
+
+def controllerLatency( net, cmap, samples=3 ):
+    """Flow-setup latency per controller, over the switches cmap gives
+       it.
+       returns: { controller name: distribution of ms }"""
+    costs = {}
+    for switch in net.switches:
+        if switch.name in cmap:
+            costs.setdefault( cmap[ switch.name ].name, [] ).extend(
+                setupLatency( switch, samples ) )
+    return dict( ( name, distribution( values ) )
+                 for name, values in costs.items() )
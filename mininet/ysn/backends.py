@@ -0,0 +1,132 @@
+"""
+backends.py: run the same topology with different switch classes
+
+A backend is a switch class plus the options it needs to forward on
+its own.  The ysn scripts hard-code their switch classes, so
+useBackend() re-types every switch of a script's NetworkTopo ( and,
+for backends that need one, gives the network a controller ) without
+touching the script.  Generated topologies take the class directly
+( GeneratedTopo( switch=... ) ).
+
+ProcessCpu measures the CPU time spent by the switch processes
+( ovs-vswitchd, the user switch's ofdatapath/ofprotocol, controllers )
+and by the kernel's softirq forwarding path over a workload.
+"""
+
+import os
+
+from mininet.node import OVSSwitch, OVSBridge, UserSwitch, Controller
+from mininet.nodelib import LinuxBridge
+
+# name -> ( switch class, switch options, needs a controller )
+# ( OVSKernelSwitch is OVSSwitch; 'ovsk' is it in standalone mode as in
+# ysn_5.py, 'ovs' is it under a controller as in ysn_7.py/ysn_8.py )
+BACKENDS = { 'ovsk': ( OVSSwitch, { 'failMode': 'standalone' }, False ),
+             'ovsbr': ( OVSBridge, {}, False ),
+             'ovs': ( OVSSwitch, { 'failMode': 'secure' }, True ),
+             'ovs-user': ( OVSSwitch, { 'failMode': 'standalone',
+                                        'datapath': 'user' }, False ),
+             'user': ( UserSwitch, {}, True ),
+             'lxbr': ( LinuxBridge, {}, False ) }
+
+# Switch options that belong to a backend rather than to the topology
+BACKEND_OPTS = ( 'cls', 'failMode', 'datapath', 'protocols', 'dpopts' )
+
+# Processes whose CPU time is charged to the switches
+SWITCH_PROCS = ( 'ovs-vswitchd', 'ofdatapath', 'ofprotocol', 'controller' )
+
+
+def retype( topo, backend ):
+    "Make every switch of a built topo use backend's class and options."
+    cls, opts, _needsController = BACKENDS[ backend ]
+    for switch in topo.switches():
+        info = topo.nodeInfo( switch )
+        for key in BACKEND_OPTS:
+            info.pop( key, None )
+        info.update( opts, cls=cls )
+
+def useBackend( script, backend ):
+    "Make a loaded ysn script build its network with backend's switches."
+    _cls, _opts, needsController = BACKENDS[ backend ]
+    topoCls, netCls = script.NetworkTopo, script.Mininet
+
+    class BackendTopo( topoCls ):
+        "The script's topology with re-typed switches."
+        def build( self, *args, **kwargs ):
+            topoCls.build( self, *args, **kwargs )
+            retype( self, backend )
+
+    def makeNet( *args, **kwargs ):
+        "The script's Mininet, with a controller if the switches need one."
+        if needsController and kwargs.get( 'controller', True ) is None:
+            kwargs[ 'controller' ] = Controller
+        return netCls( *args, **kwargs )
+
+    script.NetworkTopo = BackendTopo
+    script.Mininet = makeNet
+    return script
+
+
+def clockTicks():
+    "Kernel clock ticks per second, for /proc CPU times."
+    return float( os.sysconf( 'SC_CLK_TCK' ) )
+
+def procCpu( pid ):
+    "( comm, cmdline, user + system seconds ) of a process, or None."
+    try:
+        with open( '/proc/%s/stat' % pid ) as f:
+            stat = f.read()
+        with open( '/proc/%s/cmdline' % pid ) as f:
+            cmdline = f.read().replace( '\0', ' ' ).strip()
+    except IOError:
+        return None
+    # comm may contain spaces; the fields after it are fixed
+    comm = stat[ stat.index( '(' ) + 1:stat.rindex( ')' ) ]
+    fields = stat[ stat.rindex( ')' ) + 2: ].split()
+    return comm, cmdline, ( int( fields[ 11 ] ) + int( fields[ 12 ] ) ) / \
+        clockTicks()
+
+def softirqSeconds():
+    "Total softirq time of all CPUs, where kernel forwarding is charged."
+    with open( '/proc/stat' ) as f:
+        fields = f.readline().split()
+    return int( fields[ 7 ] ) / clockTicks()
+
+
+class ProcessCpu( object ):
+    "CPU time of the switch processes and of softirq over an interval."
+
+    def __init__( self, names=SWITCH_PROCS ):
+        self.names = names
+        self.before = None
+        self.softirq = None
+
+    def snapshot( self ):
+        "Return { pid: ( comm, cmdline, seconds ) } for switch processes."
+        procs = {}
+        for pid in os.listdir( '/proc' ):
+            if pid.isdigit():
+                cpu = procCpu( pid )
+                if cpu and cpu[ 0 ] in self.names:
+                    procs[ int( pid ) ] = cpu
+        return procs
+
+    def start( self ):
+        "Begin the interval."
+        self.before = self.snapshot()
+        self.softirq = softirqSeconds()
+
+    def stop( self ):
+        """End the interval.
+           returns: { 'processes': [ { pid, comm, cmdline, seconds } ],
+                      'byName': { comm: seconds }, 'softirq': seconds }"""
+        after = self.snapshot()
+        processes, byName = [], {}
+        for pid, ( comm, cmdline, seconds ) in sorted( after.items() ):
+            used = seconds - self.before.get( pid, ( 0, 0, 0 ) )[ 2 ]
+            processes.append( { 'pid': pid, 'comm': comm,
+                                'cmdline': cmdline,
+                                'seconds': round( used, 3 ) } )
+            byName[ comm ] = round( byName.get( comm, 0 ) + used, 3 )
+        return { 'processes': processes, 'byName': byName,
+                 'softirq': round( softirqSeconds() - self.softirq, 3 ) }
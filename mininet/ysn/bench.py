@@ -0,0 +1,134 @@
+"""
+bench.py: shared plumbing for the ysn measurement tools
+
+Host pair selection, path classes, run metadata and JSON/CSV output,
+so that every benchmark reports pairs and paths the same way and its
+results can be compared across commits.
+
+Pairs are selected with a short spec:
+
+    all             every ordered pair of hosts
+    cross           pairs whose path crosses at least one router
+    h1:h5,h5:h1     an explicit list
+
+Path classes name the routers a pair's traffic crosses, following the
+static routes ( see ysn/routing.py ): 'local' for hosts on the same
+subnet, otherwise e.g. 'r2' or 'r1-r2'.
+"""
+
+import csv
+import json
+import math
+import os
+import platform
+import sys
+from time import time
+
+from mininet.log import info
+from mininet.util import quietRun
+
+from ysn.router import LinuxRouter
+from ysn.routing import RouteEngine
+
+
+def hostsOf( net ):
+    "End hosts of net: its hosts that are not routers, sorted by name."
+    return sorted( ( h for h in net.hosts
+                     if not isinstance( h, LinuxRouter ) ),
+                   key=lambda h: h.name )
+
+def selectPairs( net, spec='all', paths=None ):
+    """Return [ ( src host, dst host ) ] for a pair spec.
+       paths: PathClasses, needed for 'cross'"""
+    hosts = hostsOf( net )
+    if spec in ( 'all', 'cross' ):
+        pairs = [ ( s, d ) for s in hosts for d in hosts if s is not d ]
+        if spec == 'cross':
+            paths = paths or PathClasses( net )
+            pairs = [ p for p in pairs if paths.routers( *p ) ]
+        return pairs
+    pairs = []
+    for item in spec.split( ',' ):
+        src, dst = item.strip().split( ':' )
+        pairs.append( ( net[ src ], net[ dst ] ) )
+    return pairs
+
+
+class PathClasses( object ):
+    "Path class of host pairs, from the network's static routing."
+
+    def __init__( self, net ):
+        self.engine = RouteEngine( net.topo )
+
+    def routers( self, src, dst ):
+        "Routers between src and dst, or None if there is no route."
+        return self.engine.path( src.name, dst.name )
+
+    def __call__( self, src, dst ):
+        "Path class of the pair src -> dst."
+        routers = self.routers( src, dst )
+        if routers is None:
+            return 'unrouted'
+        return '-'.join( routers ) or 'local'
+
+
+def runWaves( items, concurrency=None ):
+    """Run measurement items ( anything with start() and finish() ) at
+       most concurrency at a time ( default: all at once ).
+       returns: list of ( items, wall-clock seconds ) per wave"""
+    concurrency = concurrency or len( items ) or 1
+    waves = []
+    for i in range( 0, len( items ), concurrency ):
+        wave = items[ i:i + concurrency ]
+        info( '*** Running %d measurements\n' % len( wave ) )
+        start = time()
+        for item in wave:
+            item.start()
+        for item in wave:
+            item.finish()
+        waves.append( ( wave, time() - start ) )
+    return waves
+
+def percentile( values, p ):
+    "Nearest-rank p-th percentile of a sorted list, or None if empty."
+    if not values:
+        return None
+    rank = int( math.ceil( p / 100.0 * len( values ) ) )
+    return values[ max( rank, 1 ) - 1 ]
+
+def distribution( values, points=( 50, 90, 99 ) ):
+    "Count, percentiles and max of a list of samples."
+    values = sorted( values )
+    d = dict( ( 'p%d' % p, percentile( values, p ) ) for p in points )
+    d.update( count=len( values ), max=values[ -1 ] if values else None )
+    return d
+
+
+def metadata( **params ):
+    """Describe the run well enough to compare it with later ones.
+       params: benchmark parameters to record as well"""
+    here = os.path.dirname( os.path.abspath( __file__ ) )
+    commit = quietRun( 'git -C %s rev-parse HEAD' % here, shell=True )
+    dirty = quietRun( 'git -C %s status --porcelain --untracked-files=no'
+                      % here, shell=True )
+    return { 'time': round( time(), 3 ),
+             'commit': commit.strip() if 'fatal' not in commit else None,
+             'dirty': bool( dirty.strip() ),
+             'kernel': platform.release(),
+             'python': platform.python_version(),
+             'argv': sys.argv,
+             'params': params }
+
+def writeJson( path, meta, results, aggregate=None ):
+    "Write metadata, per-item results and aggregates as one JSON file."
+    with open( path, 'w' ) as f:
+        json.dump( { 'meta': meta, 'results': results,
+                     'aggregate': aggregate }, f, indent=2, sort_keys=True )
+
+def writeCsv( path, results, fields ):
+    "Write one CSV row per result, in the given column order."
+    with open( path, 'w' ) as f:
+        writer = csv.writer( f )
+        writer.writerow( fields )
+        for r in results:
+            writer.writerow( [ r.get( field, '' ) for field in fields ] )
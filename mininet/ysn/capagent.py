@@ -0,0 +1,369 @@
+#!/usr/bin/python
+
+"""
+capagent.py: packet capture into per-flow summaries, from a kernel ring
+
+Run in a node's namespace by ysn/capture.py, one process per node
+however many of its interfaces are captured:
+
+    python ysn/capagent.py --intf r1-eth2 --intf r1-eth1 \\
+        --pcap /tmp/cap --sample 100
+
+Each interface gets a TPACKET_V2 receive ring ( PACKET_RX_RING ) mapped
+into this process, so the kernel writes packets straight into shared
+frames and the agent walks them without a system call per packet.
+Frames are sized to hold just the headers ( --snaplen ): payload is
+never copied.  Both directions are seen, since a packet socket bound to
+an interface also gets what the interface sends.
+
+Every TCP, UDP or ICMP conversation becomes a flow, keyed by its
+endpoints in the direction of its first packet, with per direction
+
+    packets, bytes   as on the wire
+    retrans          segments whose sequence range was already sent
+    rttMs            samples of the time from a segment to the ACK that
+                     covers it ( Karn: none for retransmitted data ),
+                     i.e. the round trip from this interface to the
+                     receiver and back; the SYN / SYN-ACK pair gives one
+                     as well
+
+With --pcap, every --sample'th packet of an interface, truncated to
+--snaplen, goes to <dir>/<intf>.pcap ( up to --pcap-max MB ).
+
+The agent prints {"ready": true} once its rings are up, and when stdin
+closes one JSON line per flow and one with each interface's ring
+statistics ( packets received into the ring, and drops when it was
+full ), then exits.
+"""
+
+import json
+import mmap
+import os
+import select
+import socket
+import struct
+import sys
+from argparse import ArgumentParser
+from collections import deque
+from time import time
+
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V2 = 1
+ETH_P_ALL = 3
+TP_STATUS_USER = 1
+
+# tpacket_req, tpacket2_hdr ( then sockaddr_ll ), tpacket_stats
+REQ = struct.Struct( 'IIII' )
+FRAME = struct.Struct( 'IIIHHIIHH4x' )
+STATS = struct.Struct( 'II' )
+# Frame bytes before the packet: header and sockaddr_ll, aligned, plus
+# room for the link header
+FRAME_OVERHEAD = 68
+
+PCAP_HEADER = struct.Struct( 'IHHiIII' )
+PCAP_RECORD = struct.Struct( 'IIII' )
+
+PROTOS = { 1: 'icmp', 6: 'tcp', 17: 'udp', 58: 'icmp6' }
+SYN, FIN, ACK = 2, 1, 16
+SEQ_SPACE = 1 << 32
+# Outstanding segments remembered per direction for RTT samples
+PENDING = 4096
+
+
+def after( a, b ):
+    "Is sequence number a after b ( modulo 2^32 )?"
+    return 0 < ( a - b ) % SEQ_SPACE < SEQ_SPACE // 2
+
+def parse( data ):
+    """Endpoints and TCP fields of an Ethernet frame.
+       returns: ( proto, src, sport, dst, dport, tcp ) with tcp
+                ( seq, ack, flags, payload length ) or None; or None for
+                frames that are not IP"""
+    if len( data ) < 14:
+        return None
+    ethertype, = struct.unpack_from( '!H', data, 12 )
+    offset = 14
+    if ethertype == 0x8100 and len( data ) >= 18:
+        ethertype, = struct.unpack_from( '!H', data, 16 )
+        offset = 18
+    if ethertype == 0x0800 and len( data ) >= offset + 20:
+        vihl, total, proto = struct.unpack_from( '!BxHxxxxxB', data, offset )
+        src = socket.inet_ntoa( data[ offset + 12:offset + 16 ] )
+        dst = socket.inet_ntoa( data[ offset + 16:offset + 20 ] )
+        header = ( vihl & 15 ) * 4
+        payload = total - header
+    elif ethertype == 0x86dd and len( data ) >= offset + 40:
+        payload, proto = struct.unpack_from( '!4xHB', data, offset )
+        src = socket.inet_ntop( socket.AF_INET6,
+                                data[ offset + 8:offset + 24 ] )
+        dst = socket.inet_ntop( socket.AF_INET6,
+                                data[ offset + 24:offset + 40 ] )
+        header = 40
+    else:
+        return None
+    offset += header
+    sport = dport = 0
+    tcp = None
+    if proto in ( 6, 17 ) and len( data ) >= offset + 4:
+        sport, dport = struct.unpack_from( '!HH', data, offset )
+        if proto == 6 and len( data ) >= offset + 14:
+            seq, ack, off, flags = struct.unpack_from( '!IIBB', data,
+                                                      offset + 4 )
+            tcp = ( seq, ack, flags, max( payload - ( off >> 4 ) * 4, 0 ) )
+    elif proto in ( 1, 58 ) and len( data ) >= offset + 6:
+        # ICMP echo: type and identifier in place of ports
+        sport, dport = struct.unpack_from( '!B3xH', data, offset )
+    return PROTOS.get( proto, str( proto ) ), src, sport, dst, dport, tcp
+
+
+class Direction( object ):
+    "One direction of a flow."
+
+    __slots__ = ( 'packets', 'bytes', 'retrans', 'highest', 'pending',
+                  'rtts', 'rttMin', 'rttMax', 'rttSum' )
+
+    def __init__( self ):
+        self.packets = self.bytes = self.retrans = self.rtts = 0
+        self.highest = None
+        self.pending = deque()  # ( sequence end, time sent )
+        self.rttMin = self.rttMax = None
+        self.rttSum = 0.0
+
+    def segment( self, seq, flags, length, t ):
+        "Account a TCP segment sent this way."
+        end = ( seq + length + ( 1 if flags & ( SYN | FIN ) else 0 ) ) \
+            % SEQ_SPACE
+        if end == seq:
+            return
+        if self.highest is not None and not after( end, self.highest ):
+            self.retrans += 1
+            # Karn: an ACK for this range is ambiguous
+            while self.pending and not after( self.pending[ 0 ][ 0 ], end ):
+                self.pending.popleft()
+            return
+        self.highest = end
+        if len( self.pending ) < PENDING:
+            self.pending.append( ( end, t ) )
+
+    def acked( self, ack, t ):
+        "Take an RTT sample for what ack covers of what we sent."
+        sent = None
+        while self.pending and not after( self.pending[ 0 ][ 0 ], ack ):
+            sent = self.pending.popleft()[ 1 ]
+        if sent is None:
+            return
+        rtt = t - sent
+        self.rtts += 1
+        self.rttSum += rtt
+        self.rttMin = rtt if self.rttMin is None else min( self.rttMin, rtt )
+        self.rttMax = rtt if self.rttMax is None else max( self.rttMax, rtt )
+
+    def asDict( self ):
+        "Counters, with RTTs in ms."
+        d = { 'packets': self.packets, 'bytes': self.bytes,
+              'retrans': self.retrans, 'rttSamples': self.rtts }
+        if self.rtts:
+            d.update( rttMinMs=round( self.rttMin * 1000, 3 ),
+                      rttMeanMs=round( self.rttSum / self.rtts * 1000, 3 ),
+                      rttMaxMs=round( self.rttMax * 1000, 3 ) )
+        return d
+
+
+class Flow( object ):
+    "A conversation seen on one interface."
+
+    __slots__ = ( 'key', 'first', 'last', 'fwd', 'rev' )
+
+    def __init__( self, key, t ):
+        self.key = key
+        self.first = self.last = t
+        self.fwd, self.rev = Direction(), Direction()
+
+    def asDict( self, intf ):
+        "The flow's summary."
+        proto, src, sport, dst, dport = self.key
+        return { 'intf': intf, 'proto': proto, 'src': src, 'sport': sport,
+                 'dst': dst, 'dport': dport, 'first': self.first,
+                 'last': self.last, 'fwd': self.fwd.asDict(),
+                 'rev': self.rev.asDict() }
+
+
+class Ring( object ):
+    "A TPACKET_V2 receive ring on one interface, and its flows."
+
+    def __init__( self, intf, snaplen=128, size=4, maxFlows=100000,
+                  pcap=None, sample=1, pcapMax=64 ):
+        """size: ring size in MB
+           pcap: directory for the sampled pcap, or None"""
+        self.intf = intf
+        self.frameSize = ( FRAME_OVERHEAD + snaplen + 15 ) & ~15
+        blockSize = 1 << 20
+        blocks = max( size, 1 )
+        perBlock = blockSize // self.frameSize
+        self.frames = perBlock * blocks
+        self.offsets = [ b * blockSize + f * self.frameSize
+                         for b in range( blocks ) for f in range( perBlock ) ]
+        # Protocol 0: nothing arrives until the bind to intf below, or
+        # the ring would take in every interface's packets until then
+        self.sock = socket.socket( socket.AF_PACKET, socket.SOCK_RAW, 0 )
+        self.sock.setsockopt( SOL_PACKET, PACKET_VERSION, TPACKET_V2 )
+        self.sock.setsockopt( SOL_PACKET, PACKET_RX_RING, REQ.pack(
+            blockSize, blocks, self.frameSize, self.frames ) )
+        self.ring = mmap.mmap( self.sock.fileno(), blockSize * blocks,
+                               mmap.MAP_SHARED,
+                               mmap.PROT_READ | mmap.PROT_WRITE )
+        # ( Python byte-swaps the protocol of AF_PACKET addresses )
+        self.sock.bind( ( intf, ETH_P_ALL ) )
+        self.next = 0
+        self.flows = {}
+        self.maxFlows = maxFlows
+        self.untracked = 0
+        self.seen = 0
+        self.packets = self.drops = 0
+        self.sample = sample
+        self.pcap = None
+        self.pcapLeft = pcapMax << 20
+        if pcap:
+            self.pcap = open( os.path.join( pcap, intf + '.pcap' ), 'wb' )
+            self.pcap.write( PCAP_HEADER.pack( 0xa1b2c3d4, 2, 4, 0, 0,
+                                               snaplen, 1 ) )
+        self.snaplen = snaplen
+
+    def fileno( self ):
+        "For poll()."
+        return self.sock.fileno()
+
+    def drain( self ):
+        "Process every frame the kernel has handed over."
+        ring, offsets = self.ring, self.offsets
+        while True:
+            base = offsets[ self.next ]
+            ( status, length, snaplen, mac, _net, sec, nsec, _tci,
+              _tpid ) = FRAME.unpack_from( ring, base )
+            if not status & TP_STATUS_USER:
+                return
+            data = ring[ base + mac:base + mac + snaplen ]
+            # Hand the frame back to the kernel
+            ring[ base:base + 4 ] = b'\0\0\0\0'
+            self.next = ( self.next + 1 ) % self.frames
+            self.packet( data, length, sec + nsec / 1e9 )
+
+    def packet( self, data, length, t ):
+        "Account one packet to its flow, and maybe the pcap."
+        self.seen += 1
+        if self.pcap and self.pcapLeft > 0 and self.seen % self.sample == 0:
+            caplen = min( len( data ), self.snaplen )
+            self.pcap.write( PCAP_RECORD.pack( int( t ),
+                                               int( t % 1 * 1e6 ), caplen,
+                                               length ) + data[ :caplen ] )
+            self.pcapLeft -= PCAP_RECORD.size + caplen
+        fields = parse( data )
+        if fields is None:
+            return
+        proto, src, sport, dst, dport, tcp = fields
+        key = ( proto, src, sport, dst, dport )
+        flow = self.flows.get( key )
+        forward = True
+        if flow is None:
+            flow = self.flows.get( ( proto, dst, dport, src, sport ) )
+            forward = False
+        if flow is None:
+            if len( self.flows ) >= self.maxFlows:
+                self.untracked += 1
+                return
+            flow = self.flows[ key ] = Flow( key, t )
+            forward = True
+        flow.last = t
+        this, other = ( flow.fwd, flow.rev ) if forward else \
+            ( flow.rev, flow.fwd )
+        this.packets += 1
+        this.bytes += length
+        if tcp:
+            seq, ack, flags, payload = tcp
+            this.segment( seq, flags, payload, t )
+            if flags & ACK:
+                other.acked( ack, t )
+
+    def statistics( self ):
+        "Ring counters since the last call, added up."
+        # The kernel's packet count includes the drops
+        packets, drops = STATS.unpack( self.sock.getsockopt(
+            SOL_PACKET, PACKET_STATISTICS, STATS.size ) )
+        self.packets += packets - drops
+        self.drops += drops
+        return { 'type': 'stats', 'intf': self.intf,
+                 'packets': self.packets, 'drops': self.drops,
+                 'flows': len( self.flows ), 'untracked': self.untracked }
+
+    def close( self ):
+        "Release the ring and the pcap."
+        if self.pcap:
+            self.pcap.close()
+        self.ring.close()
+        self.sock.close()
+
+
+def emit( record ):
+    "One JSON line to stdout."
+    sys.stdout.write( json.dumps( record ) + '\n' )
+    sys.stdout.flush()
+
+def capture( rings, report=0, control=sys.stdin ):
+    "Drain the rings until control ( stdin ) closes."
+    poller = select.poll()
+    byFd = {}
+    for ring in rings:
+        byFd[ ring.fileno() ] = ring
+        poller.register( ring.fileno(), select.POLLIN )
+    poller.register( control.fileno(), select.POLLIN | select.POLLHUP )
+    emit( { 'ready': True } )
+    lastReport = time()
+    while True:
+        for fd, _mask in poller.poll( 500 ):
+            if fd in byFd:
+                byFd[ fd ].drain()
+            elif not control.readline():
+                return
+        if report and time() - lastReport >= report:
+            lastReport = time()
+            for ring in rings:
+                emit( ring.statistics() )
+
+def run():
+    "Run the capture agent"
+    parser = ArgumentParser( description='Ring buffer flow capture' )
+    parser.add_argument( '--intf', action='append', required=True,
+                         help='interface to capture ( repeatable )' )
+    parser.add_argument( '--snaplen', type=int, default=128,
+                         help='bytes kept of each packet' )
+    parser.add_argument( '--ring', type=int, default=4,
+                         help='ring size per interface, MB' )
+    parser.add_argument( '--max-flows', type=int, default=100000 )
+    parser.add_argument( '--pcap', metavar='DIR',
+                         help='write sampled packets to DIR/<intf>.pcap' )
+    parser.add_argument( '--sample', type=int, default=1,
+                         help='keep every Nth packet in the pcap' )
+    parser.add_argument( '--pcap-max', type=int, default=64,
+                         help='MB written per pcap at most' )
+    parser.add_argument( '--report', type=float, default=0,
+                         help='seconds between ring statistics' )
+    args = parser.parse_args()
+    rings = [ Ring( intf, args.snaplen, args.ring, args.max_flows,
+                    args.pcap, max( args.sample, 1 ), args.pcap_max )
+              for intf in args.intf ]
+    try:
+        capture( rings, args.report )
+        for ring in rings:
+            ring.drain()
+            for flow in ring.flows.values():
+                emit( dict( flow.asDict( ring.intf ), type='flow' ) )
+            emit( ring.statistics() )
+    finally:
+        for ring in rings:
+            ring.close()
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,164 @@
+"""
+capture.py: capture on many interfaces at once, summarized per flow
+
+tcpdump on r1-eth2 writes every byte to disk for later parsing, which
+both disturbs the run and leaves pcaps too big to look at.  A Capture
+instead starts one capture agent ( ysn/capagent.py ) per node whose
+interfaces are selected, in that node's namespace; each agent maps a
+kernel ring per interface ( TPACKET_V2 ), keeps only packet headers,
+and summarizes flows as packets arrive: bytes, packets, retransmits
+and RTT estimates per direction.  Sampled, truncated pcaps are
+optional.
+
+    capture = Capture( net, [ 'r1-eth2', 'h2-eth1' ], pcap='/tmp/cap' )
+    capture.start(); CLI( net ); capture.stop()
+    topFlows( capture.flows )
+
+Interfaces of switches in the root namespace are captured from there,
+and light hosts ( ysn/lighthost.py ) get their agent without a shell.
+"""
+
+import json
+import os
+import sys
+from subprocess import PIPE, STDOUT
+from threading import Thread
+
+from mininet.log import info, warn
+from mininet.util import pmonitor, decode
+
+from ysn import capagent
+from ysn.router import LinuxRouter
+
+# The capture agent, run by the current interpreter
+AGENT = os.path.splitext( os.path.abspath( capagent.__file__ ) )[ 0 ] + '.py'
+
+FIELDS = [ 'node', 'intf', 'proto', 'src', 'sport', 'dst', 'dport',
+           'packets', 'bytes', 'retrans', 'rttMeanMs', 'revPackets',
+           'revBytes', 'revRetrans', 'revRttMeanMs', 'seconds' ]
+
+
+def findIntfs( net, names ):
+    """Nodes of the named interfaces.
+       returns: { node: [ intf name ] }"""
+    owners = {}
+    for node in net.hosts + net.switches:
+        for intf in node.intfList():
+            owners[ intf.name ] = node
+    byNode = {}
+    for name in names:
+        if name not in owners:
+            raise Exception( 'No interface %s' % name )
+        byNode.setdefault( owners[ name ], [] ).append( name )
+    return byNode
+
+def routerIntfs( net ):
+    "Names of every router interface, the default selection."
+    return [ intf.name for node in net.hosts
+             if isinstance( node, LinuxRouter )
+             for intf in node.intfList() if intf.name != 'lo' ]
+
+
+class Capture( object ):
+    "Capture agents on a running network, and what they report."
+
+    def __init__( self, net, intfs, snaplen=128, ring=4, pcap=None,
+                  sample=1, pcapMax=64, maxFlows=100000 ):
+        """intfs: interface names, e.g. [ 'r1-eth2', 'h2-eth1' ]
+           snaplen: bytes kept of each packet
+           ring: ring size per interface, MB
+           pcap: directory for sampled pcaps ( <intf>.pcap ), or None
+           sample: keep every sample'th packet in the pcaps
+           pcapMax: MB per pcap at most"""
+        self.net = net
+        self.byNode = findIntfs( net, intfs )
+        self.args = [ '--snaplen', str( snaplen ), '--ring', str( ring ),
+                      '--max-flows', str( maxFlows ) ]
+        if pcap:
+            if not os.path.isdir( pcap ):
+                os.makedirs( pcap )
+            self.args += [ '--pcap', os.path.abspath( pcap ),
+                           '--sample', str( sample ),
+                           '--pcap-max', str( pcapMax ) ]
+        self.popens = {}
+        self.thread = None
+        self.flows = []
+        self.stats = {}
+
+    def start( self ):
+        "Start an agent per node and wait until its rings are up."
+        for node, intfs in sorted( self.byNode.items(),
+                                   key=lambda item: item[ 0 ].name ):
+            cmd = [ sys.executable, AGENT ] + self.args
+            for intf in intfs:
+                cmd += [ '--intf', intf ]
+            popen = node.popen( cmd, stdin=PIPE, stdout=PIPE,
+                                stderr=STDOUT )
+            line = decode( popen.stdout.readline() )
+            if '"ready"' not in line:
+                # It exited ( no such interface, no CAP_NET_RAW, ... )
+                line += decode( popen.communicate()[ 0 ] )
+                self.stop()
+                raise Exception( 'Capture on %s failed: %s' % (
+                    node.name, line.strip() ) )
+            self.popens[ node.name ] = popen
+        info( '*** Capturing on %d interfaces of %d nodes\n' % (
+            sum( len( i ) for i in self.byNode.values() ),
+            len( self.byNode ) ) )
+        self.thread = Thread( target=self.collect )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def collect( self ):
+        "Gather the agents' reports until they exit."
+        for name, line in pmonitor( dict( self.popens ), timeoutms=500 ):
+            if not name or not line.strip():
+                continue
+            try:
+                record = json.loads( line )
+            except ValueError:
+                warn( '*** %s: %s\n' % ( name, line.strip() ) )
+                continue
+            if record.get( 'type' ) == 'flow':
+                record[ 'node' ] = name
+                self.flows.append( record )
+            elif record.get( 'type' ) == 'stats':
+                self.stats[ record[ 'intf' ] ] = dict( record, node=name )
+
+    def stop( self ):
+        """Stop the agents and collect their flows.
+           returns: flows"""
+        for popen in self.popens.values():
+            # The agents report and exit when their stdin closes
+            popen.stdin.close()
+        if self.thread:
+            self.thread.join()
+        for popen in self.popens.values():
+            popen.wait()
+        for s in self.stats.values():
+            if s[ 'drops' ]:
+                # packets: what made it into the ring
+                warn( '*** %s: ring dropped %d of %d packets\n' % (
+                    s[ 'intf' ], s[ 'drops' ],
+                    s[ 'packets' ] + s[ 'drops' ] ) )
+        return self.flows
+
+
+def flowRow( flow ):
+    "A flow as one flat row ( see FIELDS )."
+    fwd, rev = flow[ 'fwd' ], flow[ 'rev' ]
+    return { 'node': flow.get( 'node' ), 'intf': flow[ 'intf' ],
+             'proto': flow[ 'proto' ], 'src': flow[ 'src' ],
+             'sport': flow[ 'sport' ], 'dst': flow[ 'dst' ],
+             'dport': flow[ 'dport' ], 'packets': fwd[ 'packets' ],
+             'bytes': fwd[ 'bytes' ], 'retrans': fwd[ 'retrans' ],
+             'rttMeanMs': fwd.get( 'rttMeanMs' ),
+             'revPackets': rev[ 'packets' ], 'revBytes': rev[ 'bytes' ],
+             'revRetrans': rev[ 'retrans' ],
+             'revRttMeanMs': rev.get( 'rttMeanMs' ),
+             'seconds': round( flow[ 'last' ] - flow[ 'first' ], 6 ) }
+
+def topFlows( flows, count=10 ):
+    "The flows that carried the most bytes, both directions together."
+    return sorted( flows, key=lambda f: f[ 'fwd' ][ 'bytes' ] +
+                   f[ 'rev' ][ 'bytes' ], reverse=True )[ :count ]
@@ -0,0 +1,281 @@
+"""
+ctlpool.py: controller processes kept warm between runs, started when ready
+
+Controller.start() runs the controller command in the background and
+returns at once: Maple in ysn_8.py ( a JVM ) is started afresh on every
+run, and the switches start connecting long before it accepts OpenFlow,
+so the first seconds of a run are connection retries.  A
+PooledController instead
+
+    reuses  a controller process left running by an earlier run with the
+            same command and port ( the pool keeps one JSON entry per
+            port under POOL_DIR ), after resetting its state; else it
+            starts one, in its own session so it outlives the run
+    waits   until the controller really speaks OpenFlow: it answers a
+            HELLO with a HELLO and an ECHO_REQUEST with an ECHO_REPLY
+            ( waitReady() ), so start() returns, and Mininet starts the
+            switches, only then
+    keeps   the process at stop(), unless keep=False
+
+Resetting means sending the process the signal given as reset ( e.g.
+'HUP' for the stub controller, which then forgets what it learned and
+clears its switches' flows ); controllers without one are reused as
+they are, which for per-switch state is enough since every run brings
+new switch connections.
+
+PooledStub runs the stub controller of ysn/stubctl.py, for trying this
+out where Maple is not installed ( MAPLE_STUB=1 python ysn_8.py ).
+stopPool() ends the kept processes for good.
+"""
+
+import json
+import os
+import signal
+import socket
+import sys
+from subprocess import Popen, STDOUT
+from time import sleep, time
+
+from mininet.log import info, warn
+from mininet.node import Controller, Node
+
+from ysn import stubctl
+
+POOL_DIR = '/tmp/ysn-controllers'
+
+# The stub controller, run by the current interpreter
+STUB_COMMAND = '%s %s' % ( sys.executable, os.path.splitext(
+    os.path.abspath( stubctl.__file__ ) )[ 0 ] + '.py' )
+
+
+def ofReady( ip, port, timeout=1 ):
+    """Does an OpenFlow controller answer at ip:port, with a HELLO and an
+       ECHO_REPLY to our ECHO_REQUEST?"""
+    try:
+        sock = socket.create_connection( ( ip, port ), timeout )
+    except ( socket.error, socket.timeout ):
+        return False
+    try:
+        sock.settimeout( timeout )
+        sock.sendall( stubctl.message( stubctl.HELLO ) +
+                      stubctl.message( stubctl.ECHO_REQUEST, xid=0x5953 ) )
+        seen, buf = set(), b''
+        while not { stubctl.HELLO, stubctl.ECHO_REPLY } <= seen:
+            data = sock.recv( 4096 )
+            if not data:
+                return False
+            buf += data
+            while len( buf ) >= stubctl.HEADER.size:
+                _version, kind, length, _xid = \
+                    stubctl.HEADER.unpack_from( buf )
+                if length < stubctl.HEADER.size:
+                    return False
+                if len( buf ) < length:
+                    break
+                seen.add( kind )
+                buf = buf[ length: ]
+        return True
+    except ( socket.error, socket.timeout ):
+        return False
+    finally:
+        sock.close()
+
+def waitReady( ip, port, timeout=60 ):
+    """Wait until an OpenFlow controller answers at ip:port.
+       returns: seconds waited
+       raises: Exception if it does not within timeout"""
+    start, delay = time(), .05
+    while not ofReady( ip, port ):
+        if time() - start > timeout:
+            raise Exception( 'Controller at %s:%d not ready after %ds' % (
+                ip, port, timeout ) )
+        sleep( delay )
+        delay = min( delay * 2, 1 )
+    return time() - start
+
+def pidAlive( pid ):
+    "Is process pid running?"
+    try:
+        # Reap it if it is our child that exited
+        if os.waitpid( pid, os.WNOHANG )[ 0 ] == pid:
+            return False
+    except OSError:
+        pass
+    try:
+        os.kill( pid, 0 )
+    except OSError:
+        return False
+    return True
+
+def entryPath( pool, port ):
+    "Pool entry file of the controller on port."
+    return os.path.join( pool, '%d.json' % port )
+
+def loadEntry( pool, port ):
+    "Pool entry of the controller on port, if its process still runs."
+    path = entryPath( pool, port )
+    if not os.path.exists( path ):
+        return None
+    with open( path ) as f:
+        entry = json.load( f )
+    if not pidAlive( entry[ 'pid' ] ):
+        os.remove( path )
+        return None
+    return entry
+
+def poolEntries( pool=POOL_DIR ):
+    "Entries of the running pooled controllers, by port."
+    if not os.path.isdir( pool ):
+        return []
+    ports = [ int( name[ :-5 ] ) for name in os.listdir( pool )
+              if name.endswith( '.json' ) and name[ :-5 ].isdigit() ]
+    return [ e for e in ( loadEntry( pool, p ) for p in sorted( ports ) )
+             if e ]
+
+def stopEntry( pool, entry ):
+    "End a pooled controller process and drop its entry."
+    info( '*** Stopping pooled controller %s on port %d ( pid %d )\n' % (
+        entry[ 'name' ], entry[ 'port' ], entry[ 'pid' ] ) )
+    try:
+        os.killpg( entry[ 'pid' ], signal.SIGTERM )
+    except OSError:
+        pass
+    for _ in range( 50 ):
+        if not pidAlive( entry[ 'pid' ] ):
+            break
+        sleep( .1 )
+    else:
+        warn( '*** Controller pid %d did not exit, killing it\n' %
+              entry[ 'pid' ] )
+        try:
+            os.killpg( entry[ 'pid' ], signal.SIGKILL )
+        except OSError:
+            pass
+    path = entryPath( pool, entry[ 'port' ] )
+    if os.path.exists( path ):
+        os.remove( path )
+
+def stopPool( pool=POOL_DIR, ports=None ):
+    """End pooled controllers ( default: all ).
+       returns: number stopped"""
+    entries = [ e for e in poolEntries( pool )
+                if not ports or e[ 'port' ] in ports ]
+    for entry in entries:
+        stopEntry( pool, entry )
+    return len( entries )
+
+def launchEntry( pool, name, cmd, port, cdir=None, reset=None ):
+    """Start a controller process in its own session, so it outlives
+       this run, and add it to the pool ( logging to <port>.log there ).
+       returns: its pool entry"""
+    if not os.path.isdir( pool ):
+        os.makedirs( pool )
+    log = open( os.path.join( pool, '%d.log' % port ), 'a' )
+    devnull = open( os.devnull )
+    popen = Popen( 'exec ' + cmd, shell=True, cwd=cdir, stdin=devnull,
+                   stdout=log, stderr=STDOUT, preexec_fn=os.setsid )
+    log.close()
+    devnull.close()
+    entry = { 'name': name, 'pid': popen.pid, 'port': port, 'cmd': cmd,
+              'cdir': cdir, 'reset': reset, 'started': time() }
+    with open( entryPath( pool, port ), 'w' ) as f:
+        json.dump( entry, f )
+    return entry
+
+def resetEntry( entry ):
+    "Send a pooled controller its reset signal, if it has one."
+    if not entry.get( 'reset' ):
+        return False
+    os.kill( entry[ 'pid' ], getattr( signal, 'SIG' + entry[ 'reset' ] ) )
+    return True
+
+
+class PooledController( Controller ):
+    "A Controller whose process is kept between runs and waited for."
+
+    def __init__( self, name, pool=POOL_DIR, keep=True, reset=None,
+                  readyTimeout=60, **kwargs ):
+        """pool: directory of the pool entries
+           keep: leave the process running at stop()
+           reset: signal name that resets the controller's state
+                  ( e.g. 'HUP' ), or None
+           readyTimeout: seconds to wait for OpenFlow readiness
+           other arguments are passed to Controller"""
+        self.pool = pool
+        self.keep = keep
+        self.reset = reset
+        self.readyTimeout = readyTimeout
+        self.warm = False
+        self.readySeconds = None
+        Controller.__init__( self, name, **kwargs )
+
+    def launchCmd( self ):
+        "The controller command line."
+        return self.command + ' ' + self.cargs % self.port
+
+    def entry( self ):
+        "Our pool entry, if a process with our command runs on our port."
+        entry = loadEntry( self.pool, self.port )
+        return entry if entry and entry[ 'cmd' ] == self.launchCmd() \
+            else None
+
+    def checkListening( self ):
+        "Our own pooled process may hold the port; anything else may not."
+        if not self.entry():
+            Controller.checkListening( self )
+
+    def start( self ):
+        "Reuse or start the controller process, and wait until it is ready."
+        entry = self.entry()
+        self.warm = entry is not None
+        if entry:
+            info( '*** Reusing %s ( pid %d )\n' % ( self.name,
+                                                     entry[ 'pid' ] ) )
+            resetEntry( entry )
+        else:
+            stale = loadEntry( self.pool, self.port )
+            if stale:
+                # A different command holds the port
+                stopEntry( self.pool, stale )
+            entry = self.launch()
+        self.readySeconds = waitReady( self.IP(), self.port,
+                                       self.readyTimeout )
+        info( '*** %s ready in %.3fs ( %s )\n' % (
+            self.name, self.readySeconds, 'warm' if self.warm else 'cold' ) )
+
+    def launch( self ):
+        "Start the controller process and add it to the pool."
+        return launchEntry( self.pool, self.name, self.launchCmd(),
+                            self.port, self.cdir, self.reset )
+
+    def resetState( self ):
+        "Reset the running controller's state without restarting it."
+        entry = self.entry()
+        return bool( entry ) and resetEntry( entry )
+
+    def stop( self, *args, **kwargs ):
+        "Keep the process for the next run, or end it."
+        entry = self.entry()
+        if entry and not self.keep:
+            stopEntry( self.pool, entry )
+        elif entry:
+            info( '*** Keeping %s ( pid %d ) for the next run\n' % (
+                self.name, entry[ 'pid' ] ) )
+        Node.stop( self, *args, **kwargs )
+
+
+class PooledStub( PooledController ):
+    "The stub controller ( ysn/stubctl.py ), pooled."
+
+    def __init__( self, name, delay=0, **kwargs ):
+        """delay: ms the stub holds each packet-in
+           other arguments are passed to PooledController"""
+        kwargs.setdefault( 'command', STUB_COMMAND )
+        kwargs.setdefault( 'cargs', '--port %%d --delay %g' % delay )
+        kwargs.setdefault( 'reset', 'HUP' )
+        PooledController.__init__( self, name, **kwargs )
+
+    @classmethod
+    def isAvailable( cls ):
+        "The stub needs nothing but Python."
+        return True
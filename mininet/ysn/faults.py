@@ -0,0 +1,236 @@
+"""
+faults.py: link failures under traffic, and how long recovery takes
+
+The ysn topologies have redundant paths ( h2's second link into s5,
+r1-r2 next to the path through h2 with multipath routes ), and a link
+failure should cost a short outage rather than reachability.  A fault
+schedule takes links down and up at given times:
+
+    [ { "at": 2, "a": "r1", "b": "r2", "state": "down" },
+      { "at": 6, "a": "r1", "b": "r2", "state": "up" } ]
+
+or randomFaults() draws one from the links that have a node with
+another link at both ends.  FaultRun injects the schedule while every
+selected pair is probed at a high rate ( see ysn/latency.py ) and
+watches for the network's reaction: route changes in the routers
+( ip monitor route ) and flow-mods in OVS switches that have a
+controller ( ovs-ofctl monitor watch: ).  For each fault it reports
+
+    lost          probes lost by the pairs it affected
+    recoveryMs    time from the fault until a pair's probes got replies
+                  again for good, worst pair ( the convergence time )
+    reactionMs    time from the fault until the first route change or
+                  flow-mod, i.e. when the kernel or controller reacted
+    unrecovered   pairs still without replies when the next fault came
+                  or the probes ended
+
+Static-route setups ( ysn_5.py ) recover only through multipath routes
+whose dead next hops the kernel skips; SDN setups ( MultiSwitch in
+ysn_7.py, Maple in ysn_8.py ) recover when their controllers do, so the
+recovery times of the two compare the approaches directly.
+"""
+
+import random
+from subprocess import Popen, PIPE, STDOUT
+from threading import Thread
+from time import sleep, time
+
+from mininet.log import info, warn
+from mininet.node import OVSSwitch
+from mininet.util import pmonitor
+
+from ysn.latency import Probe
+from ysn.topogen import loadSpec
+
+
+def loadFaults( path ):
+    "Faults of a JSON or YAML fault schedule file, in time order."
+    spec = loadSpec( path )
+    faults = spec[ 'faults' ] if isinstance( spec, dict ) else spec
+    for fault in faults:
+        if fault.get( 'state', 'down' ) not in ( 'up', 'down' ):
+            raise Exception( 'Bad link state %s in %s' % (
+                fault[ 'state' ], path ) )
+    return sorted( faults, key=lambda f: f.get( 'at', 0 ) )
+
+def redundantLinks( net ):
+    """( node, node ) names of the links with a node that has another
+       link at both ends; links to single-homed hosts are left out."""
+    def degree( node ):
+        "Data interfaces of a node."
+        return len( [ i for i in node.intfList() if i.link ] )
+    return sorted( set( tuple( sorted( ( link.intf1.node.name,
+                                         link.intf2.node.name ) ) )
+                        for link in net.links
+                        if degree( link.intf1.node ) > 1 and
+                        degree( link.intf2.node ) > 1 ) )
+
+def randomFaults( links, count=3, downFor=3, gap=3, start=2, seed=None ):
+    """A schedule that fails count random links one after the other.
+       links: [ ( node, node ) ] to choose from
+       downFor: seconds each link stays down
+       gap: seconds between a repair and the next failure
+       start: seconds before the first failure"""
+    rng = random.Random( seed )
+    faults, at = [], start
+    for _ in range( count ):
+        a, b = rng.choice( links )
+        faults += [ { 'at': at, 'a': a, 'b': b, 'state': 'down' },
+                    { 'at': at + downFor, 'a': a, 'b': b, 'state': 'up' } ]
+        at += downFor + gap
+    return faults
+
+def faultsLength( faults ):
+    "Seconds until the last fault."
+    return max( [ f.get( 'at', 0 ) for f in faults ] or [ 0 ] )
+
+
+class ChangeLog( object ):
+    "Times of route changes in routers and flow-mods in OVS switches."
+
+    def __init__( self, net, routers=None ):
+        """net: running Mininet
+           routers: node names to watch routes on ( default: nodes with
+                    IP forwarding on )"""
+        self.net = net
+        self.routers = routers or [
+            h.name for h in net.hosts
+            if h.cmd( 'sysctl -n net.ipv4.ip_forward' ).strip() == '1' ]
+        self.popens = {}
+        self.thread = None
+        self.events = []  # ( time, node name, line )
+
+    def start( self ):
+        "Start the monitors."
+        for name in self.routers:
+            self.popens[ name ] = self.net[ name ].popen(
+                [ 'ip', '-o', '-4', 'monitor', 'route' ],
+                stdout=PIPE, stderr=STDOUT )
+        for switch in self.net.switches:
+            if ( isinstance( switch, OVSSwitch ) and
+                 switch.vsctl( 'get-controller', switch ).strip() ):
+                self.popens[ switch.name ] = Popen(
+                    [ 'ovs-ofctl', 'monitor', switch.name, 'watch:' ],
+                    stdout=PIPE, stderr=STDOUT )
+        self.thread = Thread( target=self.loop )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def loop( self ):
+        "Timestamp events until the monitors exit."
+        for name, line in pmonitor( dict( self.popens ), timeoutms=100 ):
+            if name is None:
+                continue
+            if name in self.routers or 'event=' in line:
+                self.events.append( ( time(), name, line.strip() ) )
+
+    def stop( self ):
+        "Stop the monitors."
+        for popen in self.popens.values():
+            popen.terminate()
+        if self.thread:
+            self.thread.join()
+        for popen in self.popens.values():
+            popen.wait()
+
+    def after( self, start, end=None ):
+        "Events from start to end ( default: on )."
+        return [ e for e in self.events
+                 if e[ 0 ] >= start and ( end is None or e[ 0 ] < end ) ]
+
+
+def recovery( probe, started, start, end ):
+    """How probe fared from start to end ( times; probe started at
+       started ).
+       returns: ( lost, ms until replies resumed for good or None if
+                they did not, 0 if none were lost )"""
+    first = int( ( start - started ) / probe.interval ) + 1
+    last = min( probe.count, int( ( end - started ) / probe.interval ) )
+    seqs = range( max( 1, first ), last + 1 )
+    lost = [ s for s in seqs if s not in probe.rtts ]
+    if not lost:
+        return 0, 0
+    if lost[ -1 ] == last:
+        return len( lost ), None
+    resumed = started + lost[ -1 ] * probe.interval
+    return len( lost ), round( max( 0, resumed - start ) * 1000, 1 )
+
+
+class FaultRun( object ):
+    "Inject a fault schedule while probing host pairs."
+
+    def __init__( self, net, faults, pairs, rate=100, tail=3 ):
+        """net: running Mininet
+           faults: fault dicts in time order ( see loadFaults() )
+           pairs: [ ( src host, dst host ) ] to probe
+           rate: probes per second per pair
+           tail: seconds to keep probing after the last fault"""
+        self.net = net
+        self.faults = faults
+        seconds = faultsLength( faults ) + tail
+        self.probes = [ Probe( src, dst, rate, seconds, warmup=0 )
+                        for src, dst in pairs ]
+        self.changes = ChangeLog( net )
+        self.started = None
+        self.injected = []  # ( time, fault )
+
+    def run( self ):
+        """Probe, inject every fault when due and wait for the probes.
+           returns: list of per-fault results"""
+        info( '*** Injecting %d link faults under %d probes\n' % (
+            len( self.faults ), len( self.probes ) ) )
+        self.changes.start()
+        try:
+            self.started = time()
+            for probe in self.probes:
+                probe.start()
+            for fault in self.faults:
+                sleep( max( 0, self.started + fault.get( 'at', 0 ) -
+                            time() ) )
+                self.injected.append( ( time(), fault ) )
+                self.net.configLinkStatus( fault[ 'a' ], fault[ 'b' ],
+                                           fault.get( 'state', 'down' ) )
+            for probe in self.probes:
+                probe.finish()
+        finally:
+            self.changes.stop()
+        return self.results()
+
+    def results( self ):
+        "Loss, recovery and reaction times of each injected fault."
+        results = []
+        end = self.started + max( p.count * p.interval
+                                  for p in self.probes ) \
+            if self.probes else time()
+        for i, ( at, fault ) in enumerate( self.injected ):
+            until = self.injected[ i + 1 ][ 0 ] \
+                if i + 1 < len( self.injected ) else end
+            affected, lost, worst, unrecovered = [], 0, 0, []
+            for probe in self.probes:
+                plost, ms = recovery( probe, self.started, at, until )
+                pair = '%s->%s' % ( probe.src.name, probe.dst.name )
+                if not plost:
+                    continue
+                affected.append( pair )
+                lost += plost
+                if ms is None:
+                    unrecovered.append( pair )
+                else:
+                    worst = max( worst, ms )
+            changes = self.changes.after( at, until )
+            results.append( {
+                'at': round( at - self.started, 3 ),
+                'link': '%s-%s' % ( fault[ 'a' ], fault[ 'b' ] ),
+                'state': fault.get( 'state', 'down' ),
+                'affected': affected, 'lost': lost,
+                'recoveryMs': None if unrecovered else worst,
+                'unrecovered': unrecovered,
+                'reactionMs': round( ( changes[ 0 ][ 0 ] - at ) * 1000, 1 )
+                              if changes else None,
+                'changes': len( changes ),
+                'changedNodes': sorted( set( c[ 1 ] for c in changes ) ) } )
+            if unrecovered:
+                warn( '*** %s %s: %d pairs did not recover\n' % (
+                    results[ -1 ][ 'link' ], results[ -1 ][ 'state' ],
+                    len( unrecovered ) ) )
+        return results
@@ -0,0 +1,246 @@
+#!/usr/bin/python
+
+"""
+flowagent.py: one event loop per host that sends and receives TCP flows
+
+Run in each host's namespace by ysn/workload.py, never once per flow:
+
+    python ysn/flowagent.py --port 5700 --schedule flows.json
+
+It serves flows on --port and, once a line arrives on stdin ( 'go' ),
+starts the flows of its schedule, a JSON list of [ id, offset, ip,
+port, size ] with offsets in seconds from 'go', each on time and all on
+one poll() loop, however many are in flight.  A flow is a connection
+that carries a 16-byte header ( id, size ) and size bytes; the receiver
+answers with one byte once it has them all, and the flow completion
+time ( FCT ) is from the connect() to that byte.  Every flow ends in a
+JSON line on stdout
+
+    {"id": 7, "fct": 0.0123, "lag": 0.0001, "ok": true}
+
+( lag: how late it started ), and a flow still unfinished --timeout
+seconds after it started fails with "ok": false.  When its schedule is
+done the agent prints {"done": true} and keeps serving until stdin
+closes or it is killed.
+"""
+
+import errno
+import json
+import select
+import socket
+import struct
+import sys
+from argparse import ArgumentParser
+from collections import deque
+from time import time
+
+HEADER = struct.Struct( '!QQ' )
+CHUNK = 1 << 16
+ZEROS = memoryview( b'\0' * CHUNK )
+
+IN, OUT = select.POLLIN, select.POLLOUT
+ERR = select.POLLERR | select.POLLHUP
+
+
+def emit( record ):
+    "One JSON line to stdout."
+    sys.stdout.write( json.dumps( record ) + '\n' )
+    sys.stdout.flush()
+
+
+class Sender( object ):
+    "An outgoing flow."
+
+    def __init__( self, fid, ip, port, size, lag ):
+        self.id, self.size, self.lag = fid, size, lag
+        self.started = time()
+        self.header = HEADER.pack( fid, size )
+        self.sent = 0
+        self.sock = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        self.sock.setblocking( 0 )
+        err = self.sock.connect_ex( ( ip, port ) )
+        if err not in ( 0, errno.EINPROGRESS ):
+            raise socket.error( err, 'connect' )
+
+    def writable( self ):
+        """Send what the socket takes.
+           returns: True once everything is sent"""
+        if self.header:
+            n = self.sock.send( self.header )
+            self.header = self.header[ n: ]
+            if self.header:
+                return False
+        while self.sent < self.size:
+            n = self.sock.send(
+                ZEROS[ :min( CHUNK, self.size - self.sent ) ] )
+            if not n:
+                return False
+            self.sent += n
+        return True
+
+
+class Receiver( object ):
+    "An incoming flow."
+
+    def __init__( self, sock ):
+        self.sock = sock
+        self.header = b''
+        self.left = None
+        self.buf = bytearray( CHUNK )
+
+    def readable( self ):
+        """Drain what has arrived.
+           returns: True once the whole flow is in, None if it broke off"""
+        if self.left is None:
+            data = self.sock.recv( HEADER.size - len( self.header ) )
+            if not data:
+                return None
+            self.header += data
+            if len( self.header ) < HEADER.size:
+                return False
+            self.left = HEADER.unpack( self.header )[ 1 ]
+        while self.left:
+            n = self.sock.recv_into( self.buf, min( CHUNK, self.left ) )
+            if not n:
+                return None
+            self.left -= n
+        return True
+
+
+class FlowAgent( object ):
+    "Serve incoming flows and run a schedule of outgoing ones."
+
+    def __init__( self, port, schedule=(), timeout=30 ):
+        self.listener = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        self.listener.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR,
+                                  1 )
+        self.listener.bind( ( '0.0.0.0', port ) )
+        self.listener.listen( 1024 )
+        self.listener.setblocking( 0 )
+        self.schedule = deque( sorted( schedule, key=lambda f: f[ 1 ] ) )
+        self.timeout = timeout
+        self.poller = select.poll()
+        self.senders = {}  # fd -> Sender
+        self.receivers = {}  # fd -> Receiver
+        self.start = None
+
+    def finish( self, fd, ok ):
+        "End an outgoing flow and report it."
+        sender = self.senders.pop( fd )
+        self.poller.unregister( fd )
+        sender.sock.close()
+        emit( { 'id': sender.id, 'ok': ok, 'lag': round( sender.lag, 6 ),
+                'fct': round( time() - sender.started, 6 ) if ok else None } )
+
+    def drop( self, fd ):
+        "End an incoming flow."
+        self.poller.unregister( fd )
+        self.receivers.pop( fd ).sock.close()
+
+    def launch( self, now ):
+        "Start the flows that are due."
+        while self.schedule and self.start + self.schedule[ 0 ][ 1 ] <= now:
+            fid, offset, ip, port, size = self.schedule.popleft()
+            try:
+                sender = Sender( fid, ip, port, size,
+                                 now - self.start - offset )
+            except socket.error:
+                emit( { 'id': fid, 'ok': False, 'lag': 0, 'fct': None } )
+                continue
+            fd = sender.sock.fileno()
+            self.senders[ fd ] = sender
+            self.poller.register( fd, OUT | ERR )
+
+    def accept( self ):
+        "Take new incoming flows."
+        while True:
+            try:
+                sock, _addr = self.listener.accept()
+            except socket.error:
+                return
+            sock.setblocking( 0 )
+            self.receivers[ sock.fileno() ] = Receiver( sock )
+            self.poller.register( sock.fileno(), IN | ERR )
+
+    def event( self, fd, mask ):
+        "Handle one socket event."
+        if fd in self.receivers:
+            receiver = self.receivers[ fd ]
+            try:
+                done = receiver.readable()
+                if done:
+                    receiver.sock.send( b'\1' )
+            except socket.error as e:
+                done = False if e.args[ 0 ] == errno.EAGAIN else None
+            if done or done is None:
+                self.drop( fd )
+            return
+        sender = self.senders.get( fd )
+        if sender is None:
+            return
+        try:
+            if mask & ERR and not mask & IN:
+                self.finish( fd, False )
+            elif sender.sent < sender.size or sender.header:
+                if sender.writable():
+                    # All sent: wait for the receiver's byte
+                    self.poller.modify( fd, IN | ERR )
+            elif sender.sock.recv( 1 ):
+                self.finish( fd, True )
+            else:
+                self.finish( fd, False )
+        except socket.error as e:
+            if e.args[ 0 ] != errno.EAGAIN:
+                self.finish( fd, False )
+
+    def expire( self, now ):
+        "Fail outgoing flows that took too long."
+        for fd, sender in list( self.senders.items() ):
+            if now - sender.started > self.timeout:
+                self.finish( fd, False )
+
+    def serve( self, control=sys.stdin ):
+        "Run until control ( stdin ) closes."
+        self.poller.register( self.listener.fileno(), IN )
+        self.poller.register( control.fileno(), IN | ERR )
+        done = False
+        while True:
+            now = time()
+            if self.start is not None:
+                self.launch( now )
+                self.expire( now )
+                if not done and not self.schedule and not self.senders:
+                    emit( { 'done': True } )
+                    done = True
+            wait = 1000
+            if self.start is not None and self.schedule:
+                wait = max( 0, ( self.start + self.schedule[ 0 ][ 1 ] -
+                                 time() ) * 1000 )
+            for fd, mask in self.poller.poll( int( min( wait, 100 ) ) ):
+                if fd == self.listener.fileno():
+                    self.accept()
+                elif fd == control.fileno():
+                    if not control.readline():
+                        return
+                    if self.start is None:
+                        self.start = time()
+                else:
+                    self.event( fd, mask )
+
+
+def run():
+    "Run the flow agent"
+    parser = ArgumentParser( description='Per-host flow event loop' )
+    parser.add_argument( '--port', type=int, default=5700 )
+    parser.add_argument( '--schedule', help='JSON list of flows to send' )
+    parser.add_argument( '--timeout', type=float, default=30,
+                         help='seconds before a flow fails' )
+    args = parser.parse_args()
+    schedule = []
+    if args.schedule:
+        with open( args.schedule ) as f:
+            schedule = json.load( f )
+    FlowAgent( args.port, schedule, args.timeout ).serve()
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,288 @@
+"""
+instances.py: many isolated copies of a ysn topology on one host
+
+The ysn scripts use fixed node names and module-level controllers ( c0
+on 6633 and c1 on 6634 in ysn_7.py/ysn_8.py ), so a second copy would
+fight the first over bridge names, switch interface names and
+controller ports.  Instance number i gets its own:
+
+    switches     names prefixed with 'x<i>' ( s1 -> x3s1 ), so OVS
+                 bridges and the switch ends of links ( x3s1-eth1 )
+                 are distinct; dpids stay those of the unprefixed names,
+                 and net[ 's1' ] still finds the switch
+    controllers  names prefixed as well ( for /tmp/x3c0.log ), ports
+                 moved up by i * PORT_STRIDE, including the module-level
+                 controllers of a script and the ones cmap points to
+    hosts        unchanged: their names and interfaces live in their own
+                 namespaces already
+
+A variant changes one run's switch backend ( see ysn/backends.py ),
+controller mapping ( cmap, by controller name ), link parameters ( for
+TCLink ) or, for spec files, GeneratedTopo parameters:
+
+    { "name": "s1-on-c0", "backend": "ovs", "cmap": { "s1": "c0" },
+      "link": { "delay": "5ms" }, "topo": { "hosts": 4 } }
+
+runInstances() runs each variant as instance i in a process of its own
+( a process pool sized to the number of cores by default ), so module
+globals and class-level state never leak between runs, and returns the
+results in variant order.  Remote controllers are moved too; whatever
+serves them must listen on the moved ports.
+"""
+
+import re
+from itertools import product
+from multiprocessing import Pool, cpu_count
+from time import time
+
+from mininet.link import TCLink
+from mininet.log import info, warn, setLogLevel
+from mininet.node import Controller
+
+from ysn.backends import BACKENDS, useBackend
+from ysn.bench import hostsOf, selectPairs
+from ysn.routing import routeTopo
+from ysn.scripts import loadScript, runScript
+from ysn.shaping import applyShaping
+from ysn.startup import ParallelMininet
+from ysn.throughput import Flow, runFlows
+from ysn.topogen import GeneratedTopo, loadSpec
+from ysn.verify import Snapshot, Model
+
+# Controller ports of instance i are moved up by i * PORT_STRIDE
+PORT_STRIDE = 10
+
+# Port of controllers added without one ( Mininet's default )
+CONTROLLER_PORT = 6653
+
+
+def nameDpid( name ):
+    "The dpid Mininet derives from a switch name ( s1 -> 1 ), or None."
+    nums = re.findall( r'\d+', name )
+    return '%x' % int( nums[ 0 ] ) if nums else None
+
+
+class Instance( object ):
+    "Names and ports of one isolated copy of a topology."
+
+    def __init__( self, index ):
+        self.index = index
+        self.prefix = 'x%d' % index
+        self.offset = index * PORT_STRIDE
+
+    def name( self, name ):
+        "Instance name of a switch or controller."
+        return self.prefix + name
+
+    def relocate( self, controller ):
+        "Move a controller created for the unprefixed topology."
+        controller.name = self.name( controller.name )
+        controller.port += self.offset
+
+
+def isolate( netCls, instance ):
+    "Subclass of a Mininet class that builds instance's copy."
+
+    class InstanceNet( netCls ):
+        "A network whose switches and controllers belong to an instance."
+
+        def __init__( self, *args, **kwargs ):
+            self.aliases = {}
+            netCls.__init__( self, *args, **kwargs )
+
+        def addSwitch( self, name, cls=None, **params ):
+            "Add a switch under its instance name, keeping its dpid."
+            if 'dpid' not in params and nameDpid( name ):
+                params[ 'dpid' ] = nameDpid( name )
+            self.aliases[ name ] = instance.name( name )
+            return netCls.addSwitch( self, instance.name( name ), cls,
+                                     **params )
+
+        def addController( self, name='c0', controller=None, **params ):
+            "Add a controller on the instance's ports."
+            if not isinstance( name, Controller ):
+                name = instance.name( name )
+                params[ 'port' ] = params.get(
+                    'port', CONTROLLER_PORT ) + instance.offset
+            return netCls.addController( self, name, controller, **params )
+
+        def getNodeByName( self, *args ):
+            "Nodes by name, unprefixed switch names included."
+            return netCls.getNodeByName(
+                self, *[ self.aliases.get( n, n ) for n in args ] )
+
+        def __getitem__( self, key ):
+            return netCls.__getitem__( self, self.aliases.get( key, key ) )
+
+        def __contains__( self, item ):
+            return netCls.__contains__( self,
+                                        self.aliases.get( item, item ) )
+
+    InstanceNet.__name__ = getattr( netCls, '__name__', 'Mininet' )
+    return InstanceNet
+
+
+def shapeLinks( topo, opts ):
+    "Make every link of a built topo a TCLink with opts."
+    for _src, _dst, params in topo.links( withInfo=True ):
+        params.update( opts, cls=TCLink )
+
+def useLinkOpts( script, opts ):
+    "Make a loaded ysn script build every link as a TCLink with opts."
+    topoCls = script.NetworkTopo
+
+    class ShapedTopo( topoCls ):
+        "The script's topology with shaped links."
+        def build( self, *args, **kwargs ):
+            topoCls.build( self, *args, **kwargs )
+            shapeLinks( self, opts )
+
+    script.NetworkTopo = ShapedTopo
+    return script
+
+def loadInstance( path, instance, cmap=None ):
+    """Load a ysn script for instance, moving its module-level
+       controllers and remapping its cmap.
+       cmap: { switch: controller name } overriding the script's"""
+    # The controllers are checked once moved, not on their own ports
+    check = Controller.checkListening
+    Controller.checkListening = lambda self: None
+    try:
+        script = loadScript( path, 'ysn_%s' % instance.prefix )
+    finally:
+        Controller.checkListening = check
+    controllers = dict( ( c.name, c ) for c in vars( script ).values()
+                        if isinstance( c, Controller ) )
+    for controller in controllers.values():
+        instance.relocate( controller )
+        controller.checkListening()
+    mapping = dict( getattr( script, 'cmap', None ) or {} )
+    for switch, name in ( cmap or {} ).items():
+        mapping[ switch ] = controllers[ name ]
+    # MultiSwitch looks its controller up by its ( prefixed ) name
+    mapping.update( ( instance.name( s ), c ) for s, c in
+                    list( mapping.items() ) )
+    script.cmap = mapping
+    script.Mininet = isolate( script.Mininet, instance )
+    return script
+
+
+def variantName( variant ):
+    "A variant's name, or one made up from what it changes."
+    if variant.get( 'name' ):
+        return variant[ 'name' ]
+    parts = []
+    for key in sorted( variant ):
+        value = variant[ key ]
+        if isinstance( value, dict ):
+            value = ','.join( '%s=%s' % kv for kv in sorted( value.items() ) )
+        if value:
+            parts.append( '%s:%s' % ( key, value ) )
+    return ' '.join( parts ) or 'default'
+
+def expandVariants( spec ):
+    """Variants of a spec: a list of variants, or a dict of lists whose
+       product is taken ( { "backend": [ "ovsk", "ovs" ],
+       "link": [ {}, { "delay": "5ms" } ] } is four variants )."""
+    if isinstance( spec, list ):
+        return spec
+    keys = sorted( spec )
+    return [ dict( zip( keys, values ) ) for values in
+             product( *[ spec[ k ] for k in keys ] ) ]
+
+def loadVariants( path ):
+    "Variants from a JSON or YAML file ( see expandVariants() )."
+    return expandVariants( loadSpec( path ) )
+
+
+def measure( net, measures, seconds ):
+    "Run the named measurements on a running instance."
+    result = {}
+    if 'ping' in measures:
+        result[ 'pingLoss' ] = net.ping( hostsOf( net ), timeout='1' )
+    if 'verify' in measures:
+        verified = Model( Snapshot.capture( net ) ).verify()
+        pairs = verified[ 'pairs' ]
+        result[ 'reachable' ] = sum( 1 for p in pairs
+                                     if p[ 'status' ] == 'reachable' )
+        result[ 'pairs' ] = len( pairs )
+    if 'throughput' in measures:
+        flows = [ Flow( src, dst, 'tcp', seconds )
+                  for src, dst in selectPairs( net, 'cross' ) ]
+        runFlows( flows )
+        done = [ f.result for f in flows if f.result ]
+        result[ 'flows' ] = len( flows )
+        result[ 'failed' ] = len( flows ) - len( done )
+        result[ 'totalMbps' ] = sum( r[ 'bps' ] for r in done ) / 1e6
+    return result
+
+def startInstance( target, variant, instance, callback ):
+    "Bring up variant of target as instance and call callback( net )."
+    backend = variant.get( 'backend' )
+    if target.endswith( '.py' ):
+        script = loadInstance( target, instance, variant.get( 'cmap' ) )
+        if backend:
+            useBackend( script, backend )
+        if variant.get( 'link' ):
+            useLinkOpts( script, variant[ 'link' ] )
+        return runScript( script, callback )
+    params = dict( variant.get( 'topo' ) or {} )
+    controller = None
+    if backend:
+        cls, opts, needsController = BACKENDS[ backend ]
+        params.update( switch=cls, switchOpts=opts )
+        controller = Controller if needsController else None
+    topo = GeneratedTopo( spec=target, **params )
+    routeTopo( topo )
+    if variant.get( 'link' ):
+        shapeLinks( topo, variant[ 'link' ] )
+    net = isolate( ParallelMininet, instance )( topo=topo,
+                                                 controller=controller )
+    net.start()
+    applyShaping( net )
+    try:
+        return callback( net )
+    finally:
+        net.stop()
+
+def runInstance( job ):
+    "Run one variant in a pool process; never raises."
+    index, target, variant, measures, seconds = job
+    instance = Instance( index )
+    result = { 'instance': instance.prefix,
+               'variant': variantName( variant ) }
+    started = time()
+
+    def callback( net ):
+        "At the point where the CLI would start."
+        bringup = time() - started
+        return dict( measure( net, measures, seconds ),
+                     bringup=round( bringup, 3 ) )
+
+    try:
+        result.update( startInstance( target, variant, instance,
+                                      callback ) or {} )
+    except Exception as e:  # pylint: disable=broad-except
+        warn( '*** %s ( %s ) failed: %s\n' % (
+            instance.prefix, result[ 'variant' ], e ) )
+        result[ 'error' ] = str( e )
+    result[ 'seconds' ] = round( time() - started, 3 )
+    return result
+
+def runInstances( target, variants, processes=None, measures=( 'ping', ),
+                  seconds=5, logLevel='warning' ):
+    """Run every variant of target as an isolated instance, processes
+       at a time ( default: one per core ).
+       returns: one result dict per variant, in order"""
+    processes = processes or cpu_count()
+    info( '*** Running %d instances of %s, %d at a time\n' % (
+        len( variants ), target, processes ) )
+    jobs = [ ( i + 1, target, v, tuple( measures ), seconds )
+             for i, v in enumerate( variants ) ]
+    # One process per instance: scripts build their controllers at import
+    pool = Pool( processes, setLogLevel, ( logLevel, ), maxtasksperchild=1 )
+    try:
+        return pool.map( runInstance, jobs, chunksize=1 )
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,128 @@
+"""
+latency.py: concurrent RTT probing between host pairs
+
+Each Probe is a ping process started with popen(), so every pair can be
+probed at once at its own rate.  The first packet of a pair pays for
+ARP resolution and, on OpenFlow switches with a controller, for the
+packet-in round trips that set up its flows; it is reported separately
+( as the time until the first reply ) from the steady-state RTTs of the
+packets after the warm-up.
+
+resetState() flushes neighbour caches, and optionally the switches'
+controller-installed flows, so that first packets really are first.
+"""
+
+import re
+
+from mininet.log import warn
+from mininet.node import OVSSwitch
+
+from ysn.bench import distribution
+
+REPLY = re.compile( r'icmp_seq=(\d+) .*time=([\d.]+) ms' )
+
+
+class Probe( object ):
+    "Ping one host from another and collect the RTTs."
+
+    def __init__( self, src, dst, rate=10, seconds=5, warmup=1,
+                  pathClass=None ):
+        """src, dst: hosts
+           rate: probes per second
+           seconds: duration
+           warmup: leading probes left out of the steady state
+           pathClass: label for reporting"""
+        self.src, self.dst = src, dst
+        self.interval = 1.0 / rate
+        self.count = max( warmup + 1, int( rate * seconds ) )
+        self.warmup = warmup
+        self.pathClass = pathClass
+        self.proc = None
+        self.rtts = {}  # icmp_seq -> ms
+
+    def pingCmd( self ):
+        "ping command line ( intervals below 0.2s need root )."
+        return [ 'ping', '-n', '-i', '%.3f' % self.interval,
+                 '-c', str( self.count ), '-W', '1', self.dst.IP() ]
+
+    def start( self ):
+        "Start pinging."
+        self.proc = self.src.popen( self.pingCmd() )
+
+    def finish( self ):
+        "Wait for ping and parse its replies."
+        out, _err = self.proc.communicate()
+        if not isinstance( out, str ):
+            out = out.decode( 'utf-8', 'replace' )
+        for line in out.splitlines():
+            match = REPLY.search( line )
+            # Keep the first reply of duplicates
+            if match and 'DUP!' not in line:
+                self.rtts.setdefault( int( match.group( 1 ) ),
+                                      float( match.group( 2 ) ) )
+        if not self.rtts:
+            warn( '*** No replies from %s to %s\n' % ( self.src, self.dst ) )
+        return self.rtts
+
+    def first( self ):
+        """Time from sending the first probe to the first reply, in ms
+           ( lost leading probes count their send intervals ).
+           returns: ( ms, icmp_seq ) or ( None, None )"""
+        if not self.rtts:
+            return None, None
+        seq = min( self.rtts )
+        return ( seq - 1 ) * self.interval * 1000 + self.rtts[ seq ], seq
+
+    def steady( self ):
+        "RTTs of the probes after the warm-up and the first reply."
+        _first, firstSeq = self.first()
+        return [ rtt for seq, rtt in sorted( self.rtts.items() )
+                 if seq > max( self.warmup, firstSeq ) ]
+
+    def asDict( self ):
+        "Pair, first-packet latency and steady-state distribution."
+        first, firstSeq = self.first()
+        d = { 'src': self.src.name, 'dst': self.dst.name,
+              'srcIp': self.src.IP(), 'dstIp': self.dst.IP(),
+              'path': self.pathClass, 'sent': self.count,
+              'received': len( self.rtts ),
+              'lossPct': 100.0 * ( self.count - len( self.rtts ) ) /
+                         self.count,
+              'firstMs': first, 'firstSeq': firstSeq }
+        d.update( ( key + 'Ms' if key != 'count' else 'samples', value )
+                  for key, value in distribution( self.steady() ).items() )
+        return d
+
+
+def resetState( net, flows=False ):
+    """Forget learned state before probing: neighbour caches on all
+       hosts and routers, and with flows=True the flow tables of the
+       OVS switches that have a controller."""
+    for host in net.hosts:
+        host.cmd( 'ip neigh flush all' )
+    if not flows:
+        return
+    for switch in net.switches:
+        if ( isinstance( switch, OVSSwitch ) and
+             switch.vsctl( 'get-controller', switch ).strip() ):
+            switch.dpctl( 'del-flows' )
+
+def aggregate( probes ):
+    """Pool the samples of finished probes per path class.
+       returns: dict of path class -> { 'pairs', 'first', 'steady' }"""
+    pooled = {}
+    for probe in probes:
+        entry = pooled.setdefault( probe.pathClass,
+                                   { 'pairs': 0, 'first': [], 'steady': [],
+                                     'sent': 0, 'received': 0 } )
+        entry[ 'pairs' ] += 1
+        entry[ 'sent' ] += probe.count
+        entry[ 'received' ] += len( probe.rtts )
+        first, _seq = probe.first()
+        if first is not None:
+            entry[ 'first' ].append( first )
+        entry[ 'steady' ] += probe.steady()
+    for entry in pooled.values():
+        entry[ 'first' ] = distribution( entry[ 'first' ] )
+        entry[ 'steady' ] = distribution( entry[ 'steady' ] )
+    return pooled
@@ -0,0 +1,242 @@
+"""
+lighthost.py: hosts without an idle shell
+
+Every Mininet Node is a long-lived bash process holding its network
+namespace, whether or not anything ever runs in it; most ysn hosts
+( h3..h8, and the thousands of a generated topology ) only need an
+address and a default route.  A LightHost instead
+
+    holds   its namespace as a named one ( 'ip netns add', pinned under
+            NETNS_DIR ), so no process needs to stay in it
+    config  addresses, MACs, lo and the default route with a single
+            'ip -n <netns> -batch' run from the root namespace ( iproute2
+            talking netlink to the namespace, no exec into it );
+            ParallelMininet does the same for all light hosts at once
+    runs    commands only on demand: cmd() execs a one-off shell in the
+            namespace, popen() ( iperf, ping and the other generators
+            in ysn/ ) starts its command there directly, and only
+            sendCmd() ( the CLI ) or a background cmd( '... &' ) opens
+            a shell that stays
+
+Mininet passes a node's pid where ip link expects a namespace, and ip
+takes a namespace name there as well, so a LightHost's pid is its
+namespace name.  privateDirs are not supported: every exec gets its
+own mount namespace.
+
+nodeCost() reports the processes and memory held in each node's
+namespace, for comparing light hosts with ordinary ones ( see
+ysn_hostcost.py ).
+
+    net = Mininet( topo=topo, host=LightHost )
+    net = Mininet( topo=topo, host=lightHosts( [ 'h3', 'h4' ] ) )
+"""
+
+import os
+from subprocess import PIPE, STDOUT
+
+from mininet.log import warn
+from mininet.node import Host
+from mininet.util import quietRun, decode
+
+from ysn.router import batchCmd, writeBatch, sysctlCmd, defaultRouteLines
+
+# Where ip netns pins named namespaces
+NETNS_DIR = '/var/run/netns'
+
+NETNS_PREFIX = 'ysn-'
+
+
+def netnsBatchCmd( netns, lines ):
+    "Shell command running ip commands in named namespace netns."
+    return batchCmd( lines, tool='ip -n %s' % netns )
+
+def runBatches( batches ):
+    """Run ip -batch lines in many named namespaces with one shell.
+       batches: list of ( netns, lines )
+       returns: their output ( empty on success )"""
+    cmds = [ netnsBatchCmd( netns, lines )
+             for netns, lines in batches if lines ]
+    if not cmds:
+        return ''
+    # A script file: thousands of commands exceed one argument's limit
+    path = writeBatch( cmds, suffix='.sh' )
+    return quietRun( 'sh %s; rm -f %s' % ( path, path ), shell=True )
+
+
+class LightHost( Host ):
+    "A host whose namespace is held by name rather than by a shell."
+
+    def __init__( self, name, netns=None, **params ):
+        """netns: name of our namespace ( default NETNS_PREFIX + name )
+           other arguments are passed to Host"""
+        if not params.get( 'inNamespace', True ):
+            raise Exception( 'LightHost %s needs its own namespace' % name )
+        if params.get( 'privateDirs' ):
+            raise Exception( 'LightHost %s cannot have privateDirs' % name )
+        self.netns = netns or NETNS_PREFIX + name
+        Host.__init__( self, name, **params )
+
+    def startShell( self, mnopts=None ):
+        "Create our namespace; shells wait for openShell()."
+        if os.path.exists( os.path.join( NETNS_DIR, self.netns ) ):
+            # Left over from a run that did not stop cleanly
+            self.deleteNetns()
+        output = quietRun( [ 'ip', 'netns', 'add', self.netns ] )
+        if output.strip():
+            raise Exception( 'Cannot create namespace %s: %s' % (
+                self.netns, output.strip() ) )
+        self.pid = self.netns
+
+    def openShell( self, mnopts=None ):
+        "Start a shell in our namespace if there is none yet."
+        if not self.shell:
+            Host.startShell( self, mnopts )
+            self.pid = self.netns
+
+    def _popen( self, cmd, **params ):
+        if not self.shell and cmd[ :1 ] == [ 'mnexec' ]:
+            # The shell: no new namespace, enter ours
+            cmd = [ 'ip', 'netns', 'exec', self.netns, 'mnexec',
+                    cmd[ 1 ].replace( 'n', '' ) ] + cmd[ 2: ]
+        return Host._popen( self, cmd, **params )
+
+    def popen( self, *args, **kwargs ):
+        "Return a Popen() object in our namespace."
+        kwargs.setdefault( 'mncmd', [ 'ip', 'netns', 'exec', self.netns ] )
+        return Host.popen( self, *args, **kwargs )
+
+    def sendCmd( self, *args, **kwargs ):
+        "Send a command to our shell, opening it first."
+        self.openShell()
+        return Host.sendCmd( self, *args, **kwargs )
+
+    def cmd( self, *args, **kwargs ):
+        """Run a command and return its output: in a one-off shell, or in
+           our shell if it is open or the command runs in the background"""
+        if len( args ) == 1 and isinstance( args[ 0 ], list ):
+            args = args[ 0 ]
+        cmd = ' '.join( str( arg ) for arg in args )
+        if self.shell or cmd.strip().endswith( '&' ):
+            # A background job would hold a one-off shell's output open
+            self.openShell()
+            return Host.cmd( self, cmd, **kwargs )
+        popen = self.popen( [ 'sh', '-c', cmd ], stdin=PIPE, stdout=PIPE,
+                            stderr=STDOUT )
+        return decode( popen.communicate()[ 0 ] )
+
+    def config( self, mac=None, ip=None, defaultRoute=None, lo='up',
+                sysctls=None, **_params ):
+        """Configure the default interface, lo and the default route with
+           one ip -batch, as Node.config() would one by one.
+           sysctls: sysctl settings ( dict ) for our namespace"""
+        lines = []
+        intf = self.defaultIntf() if self.intfs else None
+        if intf and mac:
+            lines.append( 'link set %s address %s' % ( intf, mac ) )
+            intf.mac = mac
+        if intf and ip:
+            addr = ip if '/' in ip else ip + '/8'
+            lines += [ 'addr flush dev %s' % intf,
+                       'addr add %s dev %s' % ( addr, intf ),
+                       'link set %s up' % intf ]
+            intf.ip, intf.prefixLen = addr.split( '/' )
+        lines.append( 'link set lo %s' % lo )
+        lines += defaultRouteLines( defaultRoute )
+        r = {}
+        output = quietRun( netnsBatchCmd( self.netns, lines ), shell=True )
+        if sysctls:
+            output += self.cmd( sysctlCmd( sysctls ) )
+        if output.strip():
+            r[ 'config' ] = output
+        return r
+
+    def deleteNetns( self ):
+        "Kill whatever runs in our namespace and remove it."
+        quietRun( 'ip netns pids %s | xargs -r kill -9; ip netns delete %s' %
+                  ( self.netns, self.netns ), shell=True )
+
+    def terminate( self ):
+        "Stop our shell, if open, and everything else in our namespace."
+        Host.terminate( self )
+        self.deleteNetns()
+
+
+def lightHosts( names=None ):
+    """Host class for Mininet( host=... ): LightHost for names ( default:
+       every host ), Host for the others"""
+    if names is None:
+        return LightHost
+    names = set( names )
+
+    def makeHost( name, **params ):
+        "A LightHost or Host, by name."
+        return ( LightHost if name in names else Host )( name, **params )
+
+    return makeHost
+
+
+def netnsId( node ):
+    "Kernel id ( nsfs inode ) of node's network namespace."
+    if isinstance( node, LightHost ):
+        return os.stat( os.path.join( NETNS_DIR, node.netns ) ).st_ino
+    # 'net:[4026532...]'
+    return int( os.readlink( '/proc/%d/ns/net' % node.pid )[ 5:-1 ] )
+
+def netnsPids():
+    "Dict of namespace id -> pids of the processes in it."
+    pids = {}
+    for entry in os.listdir( '/proc' ):
+        if not entry.isdigit():
+            continue
+        try:
+            link = os.readlink( '/proc/%s/ns/net' % entry )
+        except OSError:
+            # Gone already, or a kernel thread
+            continue
+        pids.setdefault( int( link[ 5:-1 ] ), [] ).append( int( entry ) )
+    return pids
+
+def memoryKb( pid ):
+    """Resident memory of a process, and its proportional share of pages
+       it shares with others ( Pss, e.g. bash's code ).
+       returns: ( rss, pss ) in kB, pss None before Linux 4.14"""
+    rss = pss = None
+    try:
+        with open( '/proc/%d/smaps_rollup' % pid ) as f:
+            for line in f:
+                key, value = line.split( ':', 1 )
+                if key == 'Rss':
+                    rss = int( value.split()[ 0 ] )
+                elif key == 'Pss':
+                    pss = int( value.split()[ 0 ] )
+    except ( IOError, OSError ):
+        try:
+            with open( '/proc/%d/status' % pid ) as f:
+                for line in f:
+                    if line.startswith( 'VmRSS:' ):
+                        rss = int( line.split()[ 1 ] )
+        except ( IOError, OSError ):
+            pass
+    return rss or 0, pss
+
+def nodeCost( net ):
+    """Processes and memory held in each namespaced node's namespace.
+       returns: [ { 'node', 'class', 'pids', 'rssKb', 'pssKb' } ]"""
+    pids = netnsPids()
+    rows = []
+    for node in net.hosts:
+        if not node.inNamespace:
+            continue
+        try:
+            inside = pids.get( netnsId( node ), [] )
+        except OSError:
+            warn( '*** %s has no namespace\n' % node.name )
+            continue
+        rss = pss = 0
+        for pid in inside:
+            r, p = memoryKb( pid )
+            rss += r
+            pss = None if p is None or pss is None else pss + p
+        rows.append( { 'node': node.name, 'class': type( node ).__name__,
+                       'pids': len( inside ), 'rssKb': rss, 'pssKb': pss } )
+    return rows
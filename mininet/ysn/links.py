@@ -0,0 +1,70 @@
+"""
+links.py: bulk veth creation for large topologies
+
+Mininet's Link creates its veth pair immediately, with one 'ip link add'
+round-trip per link.  BatchLink only records the pair; flushLinks() then
+creates every recorded pair with a single ip -batch run in the root
+namespace, placing each end directly into its node's namespace under
+its final name ( so explicit names such as intfName1='r1-eth2' are kept
+and no rename or move step is needed ).
+
+BatchLink is meant for ParallelMininet( batchLinks=True ), which keeps
+the batch of pending pairs per network and also defers the
+per-interface addressing and 'up' commands that would otherwise touch
+the devices before they exist.
+"""
+
+from mininet.link import Link
+from mininet.log import warn
+from mininet.util import quietRun
+
+from ysn.router import batchCmd
+
+
+class BatchLink( Link ):
+    "A Link whose veth pair is created later, in bulk, by flushLinks()."
+
+    def __init__( self, node1, node2, batch=None, **kwargs ):
+        """batch: list to record the pair in until flushLinks( batch ),
+                  one per network ( default: create the pair at once )
+           other arguments are passed to Link"""
+        self.batch = batch
+        Link.__init__( self, node1, node2, **kwargs )
+
+    def makeIntfPair( self, intfname1, intfname2, addr1=None, addr2=None,
+                      node1=None, node2=None, deleteIntfs=True ):
+        "Record the pair instead of creating it."
+        if self.batch is None or node1 is None or node2 is None:
+            # Not the fast path: fall back to creating it right away
+            return Link.makeIntfPair( intfname1, intfname2, addr1, addr2,
+                                      node1, node2, deleteIntfs )
+        # ( intf1, intf2, addr1, addr2, node1, node2 ) for flushLinks()
+        self.batch.append( ( intfname1, intfname2, addr1, addr2,
+                             node1, node2 ) )
+
+
+def netnsOf( node ):
+    "Namespace argument for ip link: the node's shell pid, or the root."
+    return node.pid if node.inNamespace else 1
+
+def vethLine( intf1, intf2, addr1, addr2, node1, node2 ):
+    "ip -batch line creating a veth pair with both ends in place."
+    end1 = 'name %s%s netns %s' % (
+        intf1, ' address %s' % addr1 if addr1 else '', netnsOf( node1 ) )
+    end2 = 'name %s%s netns %s' % (
+        intf2, ' address %s' % addr2 if addr2 else '', netnsOf( node2 ) )
+    return 'link add %s type veth peer %s' % ( end1, end2 )
+
+def flushLinks( batch ):
+    """Create the veth pairs recorded in batch with one ip -batch, and
+       empty it.
+       returns: number of pairs created"""
+    pending = list( batch )
+    del batch[ : ]
+    if not pending:
+        return 0
+    output = quietRun( batchCmd( [ vethLine( *p ) for p in pending ] ),
+                       shell=True )
+    if output.strip():
+        warn( '*** Bulk link creation: %s\n' % output.strip() )
+    return len( pending )
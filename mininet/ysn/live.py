@@ -0,0 +1,264 @@
+"""
+live.py: apply an edited topology to a running network
+
+Every ysn script ends with CLI( net ); net.stop(), so trying a changed
+link, address or switch class normally means tearing down and
+rebuilding every namespace, bridge and controller.  TopoDiff compares
+the Topo a network was built from ( net.topo ) with an edited one, and
+applyDiff() changes only what differs:
+
+    nodes     added, removed, or replaced when their class or any
+              parameter other than the ones below changed
+    links     added, removed, or replaced when their options changed
+              ( links of replaced nodes are replaced too ); a changed
+              shape ( see ysn/shaping.py ) is applied in place
+    in place  host ip, interface ip ( params1/params2 ), routes,
+              defaultRoute and sysctls are reconfigured without
+              touching the node
+
+Links are matched by their end nodes and ports, so edits that renumber
+the ports of existing links show up as replaced links.  Deleting a
+device flushes its addresses and the routes and sysctls that use it, so
+the nodes at either end of a re-created link are configured again.
+Controllers are left alone.
+
+    diff = TopoDiff( net.topo, editedTopo )
+    applyDiff( net, diff )
+"""
+
+from time import time
+
+from mininet.log import info, warn
+
+from ysn.lighthost import LightHost
+from ysn.router import LinuxRouter, sysctlCmd, batchCmd, routeLines, \
+    applySysctls
+from ysn.shaping import applyShaping
+
+# Node parameters that can change without replacing the node
+INPLACE = ( 'ip', 'routes', 'defaultRoute', 'sysctls' )
+
+
+def linkId( opts ):
+    "What identifies a link: its ( node, port ) ends, in order."
+    return tuple( sorted( [ ( opts[ 'node1' ], opts[ 'port1' ] ),
+                            ( opts[ 'node2' ], opts[ 'port2' ] ) ] ) )
+
+def linkMap( topo ):
+    "{ link id: link options } of a topo."
+    return dict( ( linkId( opts ), opts ) for _src, _dst, opts in
+                 topo.links( sort=True, withInfo=True ) )
+
+def strip( params, keys ):
+    "params without keys."
+    return dict( ( k, v ) for k, v in params.items() if k not in keys )
+
+def intfIps( opts ):
+    "The ip parameters of a link's two interfaces."
+    return [ ( opts.get( key ) or {} ).get( 'ip' )
+             for key in ( 'params1', 'params2' ) ]
+
+def intfShapes( opts ):
+    "{ ( node, port ): shape } of a link's two interfaces."
+    return dict( ( ( opts[ 'node%d' % i ], opts[ 'port%d' % i ] ),
+                   ( opts.get( 'params%d' % i ) or {} ).get(
+                       'shape', opts.get( 'shape' ) ) )
+                 for i in ( 1, 2 ) )
+
+def sameLink( old, new ):
+    "Do two link options differ in interface addresses and shapes at most?"
+    def shape( opts ):
+        "Link options without interface addresses and shapes."
+        opts = strip( opts, ( 'shape', ) )
+        for key in 'params1', 'params2':
+            opts[ key ] = strip( opts.get( key ) or {}, ( 'ip', 'shape' ) )
+        return opts
+    return shape( old ) == shape( new )
+
+
+class TopoDiff( object ):
+    "Differences between the topo a network was built from and a new one."
+
+    def __init__( self, old, new ):
+        self.old, self.new = old, new
+        oldNodes, newNodes = set( old.nodes() ), set( new.nodes() )
+        self.addedNodes = sorted( newNodes - oldNodes )
+        self.removedNodes = sorted( oldNodes - newNodes )
+        self.replacedNodes, self.changedNodes = [], []
+        for name in sorted( oldNodes & newNodes ):
+            before, after = old.nodeInfo( name ), new.nodeInfo( name )
+            if ( old.isSwitch( name ) != new.isSwitch( name ) or
+                 strip( before, INPLACE ) != strip( after, INPLACE ) ):
+                self.replacedNodes.append( name )
+            elif before != after:
+                self.changedNodes.append( name )
+        gone = set( self.removedNodes + self.replacedNodes )
+        oldLinks, newLinks = linkMap( old ), linkMap( new )
+        self.addedLinks, self.removedLinks = [], []
+        self.readdressedLinks, self.reshapedLinks = [], []
+        for key in sorted( set( oldLinks ) | set( newLinks ) ):
+            before, after = oldLinks.get( key ), newLinks.get( key )
+            touched = any( node in gone for node, _port in key )
+            if before and after and not touched and sameLink( before,
+                                                              after ):
+                if intfIps( before ) != intfIps( after ):
+                    self.readdressedLinks.append( after )
+                if intfShapes( before ) != intfShapes( after ):
+                    self.reshapedLinks.append( after )
+                continue
+            if before:
+                self.removedLinks.append( before )
+            if after:
+                self.addedLinks.append( after )
+
+    def empty( self ):
+        "Is there nothing to do?"
+        return not ( self.addedNodes or self.removedNodes or
+                     self.replacedNodes or self.changedNodes or
+                     self.addedLinks or self.removedLinks or
+                     self.readdressedLinks or self.reshapedLinks )
+
+    def summary( self ):
+        "One line per kind of change."
+        def links( opts ):
+            "Link names."
+            return ' '.join( '%s-%s' % ( o[ 'node1' ], o[ 'node2' ] )
+                             for o in opts )
+        lines = [ ( '+nodes', ' '.join( self.addedNodes ) ),
+                  ( '-nodes', ' '.join( self.removedNodes ) ),
+                  ( '~nodes', ' '.join( self.replacedNodes ) ),
+                  ( 'reconfigured', ' '.join( self.changedNodes ) ),
+                  ( '+links', links( self.addedLinks ) ),
+                  ( '-links', links( self.removedLinks ) ),
+                  ( 'readdressed', links( self.readdressedLinks ) ),
+                  ( 'reshaped', links( self.reshapedLinks ) ) ]
+        return '\n'.join( '%-13s %s' % ( kind, names )
+                          for kind, names in lines if names ) or 'no changes'
+
+
+def findLink( net, opts ):
+    "The running link built from link options, or None."
+    key = linkId( opts )
+    for link in net.links:
+        if tuple( sorted( ( i.node.name, i.node.ports.get( i ) )
+                          for i in ( link.intf1, link.intf2 ) ) ) == key:
+            return link
+    return None
+
+def reconfigCmd( before, after ):
+    """Command that moves a node's routes, default route and sysctls
+       from the before to the after node parameters."""
+    oldRoutes = before.get( 'routes' ) or []
+    newRoutes = after.get( 'routes' ) or []
+    lines = routeLines( [ r for r in oldRoutes if r not in newRoutes ],
+                        verb='del' )
+    lines += routeLines( [ r for r in newRoutes if r not in oldRoutes ] )
+    default = after.get( 'defaultRoute' )
+    if default != before.get( 'defaultRoute' ):
+        if default:
+            lines.append( 'route replace default ' + (
+                default if ' ' in default else 'dev ' + default ) )
+        else:
+            lines.append( 'route del default' )
+    oldSysctls = before.get( 'sysctls' ) or {}
+    sysctls = dict( ( k, v ) for k, v in
+                    ( after.get( 'sysctls' ) or {} ).items()
+                    if oldSysctls.get( k ) != v )
+    cmds = [ sysctlCmd( sysctls ), batchCmd( lines ) ]
+    return '; '.join( c for c in cmds if c )
+
+def reconfigure( node, params ):
+    """Configure a node that kept running while links of its were
+       re-created: deleting a device flushes its addresses and the
+       routes and per-device sysctls that used it.
+       params: the node's parameters in the new topology"""
+    # LinuxRouter and LightHost config() apply sysctls themselves
+    node.config( **params )
+    if params.get( 'sysctls' ) and \
+            not isinstance( node, ( LinuxRouter, LightHost ) ):
+        output = applySysctls( node, params[ 'sysctls' ] )
+        if output.strip():
+            warn( '*** %s: %s\n' % ( node.name, output.strip() ) )
+
+def attachIntfs( net, switch, intfs ):
+    "Add new interfaces to a running switch."
+    if hasattr( switch, 'attach' ):
+        for intf in intfs:
+            switch.attach( intf )
+    else:
+        # No incremental attach ( e.g. LinuxBridge ): restart it
+        switch.stop( deleteIntfs=False )
+        switch.start( net.controllers )
+
+def applyDiff( net, diff ):
+    """Apply a TopoDiff to a running network built from diff.old.
+       returns: seconds taken"""
+    start = time()
+    old, new = diff.old, diff.new
+    gone = set( diff.removedNodes + diff.replacedNodes )
+    # Links first, so that no link outlives its nodes
+    for opts in diff.removedLinks:
+        link = findLink( net, opts )
+        if not link:
+            warn( '*** No running link %s-%s\n' % ( opts[ 'node1' ],
+                                                    opts[ 'node2' ] ) )
+            continue
+        for intf in link.intf1, link.intf2:
+            if ( intf.node in net.switches and intf.node.name not in gone
+                 and hasattr( intf.node, 'detach' ) ):
+                intf.node.detach( intf )
+        net.delLink( link )
+    for name in sorted( gone ):
+        net.delNode( net[ name ] )
+    added = diff.addedNodes + diff.replacedNodes
+    for name in added:
+        params = new.nodeInfo( name )
+        if new.isSwitch( name ):
+            net.addSwitch( name, **params )
+        else:
+            net.addHost( name, **params )
+    newIntfs = {}
+    for opts in diff.addedLinks:
+        link = net.addLink( **opts )
+        for intf in link.intf1, link.intf2:
+            newIntfs.setdefault( intf.node, [] ).append( intf )
+    for name in added:
+        node = net[ name ]
+        if node in net.switches:
+            node.start( net.controllers )
+        elif node.intfs:
+            node.configDefault()
+        else:
+            node.configDefault( ip=None, mac=None )
+    for node, intfs in newIntfs.items():
+        if node in net.switches and node.name not in added:
+            attachIntfs( net, node, intfs )
+    rewired = set( opts[ key ] for opts in diff.addedLinks + diff.removedLinks
+                   for key in ( 'node1', 'node2' ) )
+    for name in sorted( rewired - gone - set( added ) ):
+        if not new.isSwitch( name ):
+            reconfigure( net[ name ], new.nodeInfo( name ) )
+    for opts in diff.readdressedLinks:
+        link = findLink( net, opts )
+        for intf, ip in zip( ( link.intf1, link.intf2 ), intfIps( opts ) ):
+            if ip:
+                intf.setIP( ip )
+    for opts in diff.reshapedLinks:
+        shapes, link = intfShapes( opts ), findLink( net, opts )
+        for intf in link.intf1, link.intf2:
+            intf.params[ 'shape' ] = shapes[ intf.node.name,
+                                             intf.node.ports[ intf ] ]
+    for name in diff.changedNodes:
+        node, before, after = net[ name ], old.nodeInfo( name ), \
+            new.nodeInfo( name )
+        if after.get( 'ip' ) != before.get( 'ip' ) and after.get( 'ip' ):
+            node.defaultIntf().setIP( after[ 'ip' ] )
+        output = node.cmd( reconfigCmd( before, after ) )
+        if output.strip():
+            warn( '*** %s: %s\n' % ( name, output.strip() ) )
+    # New links, and the reshaped ones
+    applyShaping( net )
+    net.topo = new
+    elapsed = time() - start
+    info( '*** Applied topology changes in %.3fs\n' % elapsed )
+    return elapsed
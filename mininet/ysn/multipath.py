@@ -0,0 +1,202 @@
+"""
+multipath.py: ECMP routes, hash policies and per-path counters
+
+h2 in ysn_5.py, ysn_7.py and ysn_8.py sits on both 10.1.1.0/24 ( s1,
+behind r1 ) and 10.1.4.0/24 ( s5, behind r2 ) and forwards, so there
+are two paths between those subnets: over the r1-r2 WAN link and
+through h2.  A plain 'via' route uses one of them.  Here
+
+    nexthops()           turns [ ( gateway, dev ) ] into a multipath
+                         route spec ( nexthop via ... nexthop via ... ),
+                         or a single via when multipath is off
+    multipathRoutes()    swaps the routes of given prefixes in a route
+                         list for multipath ones
+    multipathSysctls()   selects the kernel's ECMP hash: 'l3' ( source
+                         and destination address ), 'l4' ( plus ports
+                         and protocol, so flows between the same hosts
+                         spread too ) or 'l3inner'; and relaxes
+                         rp_filter to loose mode, since replies may come
+                         back over the other path; next hops behind a
+                         downed link or a dead neighbour are skipped.
+                         Given the node's multipath routes, it also
+                         stops ICMP redirects, see below
+    multipathPairs()     host pairs whose flows the multipath routes
+                         carry
+    PathCounters         bytes and packets each node sends to its
+                         multipath prefixes over each next hop during
+                         an interval, to see the split
+
+    h2 = self.addHost( 'h2', ip='10.1.1.3/24',
+                       defaultRoute=nexthops( H2_NEXTHOPS, MULTIPATH ) )
+
+r1's next hop through h2 ( 10.1.1.3 ) is on the LAN that h1's packets
+arrive from, so r1 would answer them with ICMP redirects, h1 would then
+send to h2 directly and the hash would never see those flows; routers
+with such next hops get send_redirects off.
+"""
+
+from ysn.bench import hostsOf
+from ysn.routing import inPrefix
+from ysn.verify import parseRoute
+
+# fib_multipath_hash_policy values
+HASH_POLICIES = { 'l3': 0, 'l4': 1, 'l3inner': 2 }
+
+
+def nexthops( hops, policy='l4', weights=None ):
+    """Route spec over several next hops ( for routes= or defaultRoute= ).
+       hops: [ ( gateway, dev ) ]
+       policy: hash policy, or None for the first hop alone
+       weights: per-hop weights ( optional )"""
+    if not policy or len( hops ) == 1:
+        return 'via %s dev %s' % hops[ 0 ]
+    weights = weights or [ None ] * len( hops )
+    return ' '.join( 'nexthop via %s dev %s%s' % (
+        gw, dev, ' weight %d' % weight if weight else '' )
+        for ( gw, dev ), weight in zip( hops, weights ) )
+
+def multipathRoutes( routes, multipath, policy='l4' ):
+    """Replace the routes of some prefixes with multipath routes.
+       routes: routes in 'ip route' syntax
+       multipath: { prefix: [ ( gateway, dev ) ] }
+       policy: hash policy, or None to leave routes alone"""
+    if not policy:
+        return list( routes )
+    kept = [ r for r in routes if r.split()[ 0 ] not in multipath ]
+    return kept + [ '%s %s' % ( prefix, nexthops( hops, policy ) )
+                    for prefix, hops in sorted( multipath.items() ) ]
+
+def multipathSysctls( policy='l4', multipath=None ):
+    """Sysctls for a hash policy ( none for None ).
+       multipath: { prefix: [ ( gateway, dev ) ] } of the node's multipath
+                  routes, to stop redirects on their devs ( optional )"""
+    if not policy:
+        return {}
+    sysctls = { 'net.ipv4.fib_multipath_hash_policy':
+                HASH_POLICIES[ policy ],
+                # Skip next hops whose neighbour is known to be dead, or
+                # whose link is down, so a failed path is left at once
+                'net.ipv4.fib_multipath_use_neigh': 1,
+                'net.ipv4.conf.all.ignore_routes_with_linkdown': 1,
+                'net.ipv4.conf.all.rp_filter': 2,
+                'net.ipv4.conf.default.rp_filter': 2 }
+    if multipath:
+        # A device sends redirects if either it or 'all' says so
+        devs = set( dev for hops in multipath.values() for _gw, dev in hops )
+        for conf in [ 'all', 'default' ] + sorted( devs ):
+            sysctls[ 'net.ipv4.conf.%s.send_redirects' % conf ] = 0
+    return sysctls
+
+def multipathDevs( node ):
+    "{ prefix: [ devs ] } of node's routes with more than one next hop."
+    devs = {}
+    for line in node.cmd( 'ip -o -4 route show table main' ).splitlines():
+        route = parseRoute( line )
+        if route and len( route[ 2 ] ) > 1:
+            devs[ route[ 0 ] ] = [ dev for _via, dev in route[ 2 ] ]
+    return devs
+
+
+def multipathPairs( net, prefixes ):
+    """Host pairs on different multipath prefixes, whose flows the
+       multipath routes carry.  Hosts on several of the prefixes ( like
+       h2 ) reach them directly, so they are left out.
+       prefixes: prefixes that routes have several next hops to
+       returns: [ ( src host, dst host ) ]"""
+    on = {}
+    for host in hostsOf( net ):
+        inside = set( prefix for prefix in prefixes
+                      for intf in host.intfList() if intf.IP()
+                      and inPrefix( intf.IP(), prefix ) )
+        if len( inside ) == 1:
+            on[ host ] = inside.pop()
+    hosts = hostsOf( net )
+    return [ ( src, dst ) for src in hosts for dst in hosts
+             if src in on and dst in on and on[ src ] != on[ dst ] ]
+
+
+class PathCounters( object ):
+    """Traffic each node sends to its multipath prefixes over each next
+       hop during an interval.  An iptables chain of our own, jumped to
+       from FORWARD and OUTPUT, holds one rule per ( prefix, dev ) of
+       the node's multipath routes, so other traffic leaving those
+       devs is not counted."""
+
+    CHAIN = 'ysn-paths'
+
+    def __init__( self, net, nodes=None ):
+        """net: running Mininet
+           nodes: node names ( default: every node with multipath
+                  routes )"""
+        self.rules = {}  # node -> [ ( prefix, dev ) ]
+        for node in ( [ net[ n ] for n in nodes ] if nodes else net.hosts ):
+            rules = sorted( ( prefix, dev ) for prefix, devs
+                            in multipathDevs( node ).items()
+                            for dev in devs )
+            if rules:
+                self.rules[ node ] = rules
+        self.before = None
+
+    def install( self ):
+        "Add the counting chain to each node."
+        for node, rules in self.rules.items():
+            cmds = [ '-N %s' % self.CHAIN ]
+            cmds += [ '-A %s -d %s -o %s' % (
+                self.CHAIN, '0.0.0.0/0' if prefix == 'default' else prefix,
+                dev ) for prefix, dev in rules ]
+            cmds += [ '-I %s -j %s' % ( hook, self.CHAIN )
+                      for hook in ( 'FORWARD', 'OUTPUT' ) ]
+            node.cmd( '; '.join( 'iptables -w ' + c for c in cmds ) )
+
+    def remove( self ):
+        "Remove the counting chain from each node."
+        for node in self.rules:
+            cmds = [ '-D %s -j %s' % ( hook, self.CHAIN )
+                     for hook in ( 'FORWARD', 'OUTPUT' ) ]
+            cmds += [ '-F %s' % self.CHAIN, '-X %s' % self.CHAIN ]
+            node.cmd( '; '.join( 'iptables -w ' + c for c in cmds ) )
+
+    def read( self ):
+        """{ ( node name, prefix, dev ): [ bytes, packets ] }, one cmd
+           per node"""
+        counts = {}
+        for node, rules in self.rules.items():
+            # Rules list in the order they were added, starting with
+            # their packet and byte counts
+            lines = [ line.split() for line in node.cmd(
+                'iptables -w -nvxL %s' % self.CHAIN ).splitlines() ]
+            values = [ ( int( f[ 1 ] ), int( f[ 0 ] ) ) for f in lines
+                       if len( f ) > 2 and f[ 0 ].isdigit()
+                       and f[ 1 ].isdigit() ]
+            if len( values ) != len( rules ):
+                continue
+            for ( prefix, dev ), ( nbytes, packets ) in zip( rules, values ):
+                counts[ node.name, prefix, dev ] = [ nbytes, packets ]
+        return counts
+
+    def start( self ):
+        "Begin the interval."
+        self.install()
+        self.before = self.read()
+
+    def stop( self ):
+        """End the interval.
+           returns: [ { node, prefix, dev, bytes, packets, share } ],
+                    share being the dev's part of the bytes its node
+                    sent to the prefix"""
+        after = self.read()
+        self.remove()
+        paths = []
+        for ( node, prefix, dev ), ( nbytes, packets ) in sorted(
+                after.items() ):
+            old = self.before.get( ( node, prefix, dev ), [ 0, 0 ] )
+            paths.append( { 'node': node, 'prefix': prefix, 'dev': dev,
+                            'bytes': nbytes - old[ 0 ],
+                            'packets': packets - old[ 1 ] } )
+        for path in paths:
+            total = sum( p[ 'bytes' ] for p in paths
+                         if ( p[ 'node' ], p[ 'prefix' ] ) ==
+                         ( path[ 'node' ], path[ 'prefix' ] ) )
+            path[ 'share' ] = ( round( float( path[ 'bytes' ] ) / total, 3 )
+                                if total else None )
+        return paths
@@ -0,0 +1,195 @@
+"""
+proactive.py: precomputed L3 flows for OpenFlow 'router' switches
+
+In the SDN variant of ysn_5 ( ysn_5_sdn.py ) the routers are OpenFlow
+switches whose ports carry the gateway addresses, and every new flow
+costs a packet-in round trip to the controller.  ProactiveFabric
+derives the complete forwarding state from the running network instead:
+
+    router switches   switches with addressed ports
+    ARP               the router answers ARP for its own port addresses
+    local hosts       ip,nw_dst=host/32 -> rewrite MACs, dec_ttl, output
+    remote prefixes   ip,nw_dst=prefix -> rewrite MACs towards the next
+                      router on the shortest ( hop count ) path, dec_ttl,
+                      output
+    other switches    NORMAL ( the switch's own MAC learning )
+
+and install() pushes each switch's flows with a single ovs-ofctl
+add-flows run, all switches at once.  Traffic addressed to the router
+ports themselves ( e.g. pinging a gateway ) is not handled and still
+goes to the controller, as does anything else missing the table.
+"""
+
+import re
+from time import time
+
+from mininet.log import info, warn
+from mininet.util import quietRun
+
+from ysn.router import writeBatch
+from ysn.routing import prefixOf, inPrefix
+
+ARP_PRIORITY = 500
+HOST_PRIORITY = 400
+PREFIX_PRIORITY = 100  # plus the prefix length, for longest match
+NORMAL_PRIORITY = 0
+
+# ARP responder: turn the request around in place
+ARP_REPLY = ( 'move:NXM_OF_ETH_SRC[]->NXM_OF_ETH_DST[],mod_dl_src:%(mac)s,'
+              'load:0x2->NXM_OF_ARP_OP[],'
+              'move:NXM_NX_ARP_SHA[]->NXM_NX_ARP_THA[],'
+              'move:NXM_OF_ARP_SPA[]->NXM_OF_ARP_TPA[],'
+              'load:0x%(machex)s->NXM_NX_ARP_SHA[],'
+              'load:0x%(iphex)s->NXM_OF_ARP_SPA[],in_port' )
+
+
+def macOf( intf ):
+    "MAC address of an interface, asking the kernel if not yet known."
+    return intf.MAC() or intf.updateMAC()
+
+def addrOf( intf ):
+    "An interface's 'ip/len', or None."
+    if not intf.IP() or intf.prefixLen is None:
+        return None
+    return '%s/%s' % ( intf.IP(), intf.prefixLen )
+
+def hexIP( ip ):
+    "Dotted quad as hex digits."
+    return ''.join( '%02x' % int( octet ) for octet in ip.split( '.' ) )
+
+
+class ProactiveFabric( object ):
+    "Forwarding state for every switch of a running SDN network."
+
+    def __init__( self, net ):
+        self.net = net
+        self.switches = net.switches
+        self.peer = {}  # intf -> intf at the other end of its link
+        for link in net.links:
+            self.peer[ link.intf1 ] = link.intf2
+            self.peer[ link.intf2 ] = link.intf1
+        self.ports = dict( ( s, [ i for i in s.intfList()
+                                  if addrOf( i ) and i in self.peer ] )
+                           for s in self.switches )
+        self.routers = [ s for s in self.switches if self.ports[ s ] ]
+        # router -> [ ( out intf, peer intf on the neighbour router ) ]
+        self.adj = dict( ( r, [] ) for r in self.routers )
+        for r in self.routers:
+            for intf in self.ports[ r ]:
+                if self.peer[ intf ].node in self.adj:
+                    self.adj[ r ].append( ( intf, self.peer[ intf ] ) )
+
+    def island( self, intf ):
+        """Host interfaces reachable through intf's link without
+           crossing a router."""
+        hosts, seen, todo = [], set( [ intf.node ] ), [ self.peer[ intf ] ]
+        while todo:
+            end = todo.pop()
+            node = end.node
+            if node in seen or node in self.adj:
+                continue
+            seen.add( node )
+            if node in self.switches:
+                todo += [ self.peer[ i ] for i in node.intfList()
+                          if i in self.peer ]
+            elif end.IP():
+                hosts.append( end )
+        return hosts
+
+    def nextHops( self ):
+        """Shortest-path next hop from every router towards every
+           router, by hop count.
+           returns: dict ( router, owner ) -> ( out intf, peer intf )"""
+        hops = {}
+        for owner in self.routers:
+            frontier, dist = [ owner ], { owner: 0 }
+            while frontier:
+                nxt = []
+                for v in frontier:
+                    for r in self.routers:
+                        for intf, peer in self.adj[ r ]:
+                            if peer.node is v and r not in dist:
+                                dist[ r ] = dist[ v ] + 1
+                                hops[ ( r, owner ) ] = ( intf, peer )
+                                nxt.append( r )
+                frontier = nxt
+        return hops
+
+    def flows( self ):
+        "Return dict of switch -> list of ovs-ofctl flow specs."
+        flows = dict( ( s, [ 'priority=%d,actions=NORMAL' %
+                             NORMAL_PRIORITY ] )
+                      for s in self.switches if s not in self.adj )
+        hops = self.nextHops()
+        for r in self.routers:
+            flows[ r ] = []
+        for owner in self.routers:
+            for intf in self.ports[ owner ]:
+                addr, mac = addrOf( intf ), macOf( intf )
+                port = owner.ports[ intf ]
+                flows[ owner ].append(
+                    'priority=%d,arp,in_port=%d,arp_tpa=%s,arp_op=1,'
+                    'actions=%s' % ( ARP_PRIORITY, port, intf.IP(),
+                                     ARP_REPLY % {
+                                         'mac': mac,
+                                         'machex': mac.replace( ':', '' ),
+                                         'iphex': hexIP( intf.IP() ) } ) )
+                if self.peer[ intf ].node in self.adj:
+                    continue
+                prefix = prefixOf( addr )
+                for host in self.island( intf ):
+                    if inPrefix( host.IP(), prefix ):
+                        flows[ owner ].append(
+                            'priority=%d,ip,nw_dst=%s,actions=mod_dl_src:%s,'
+                            'mod_dl_dst:%s,dec_ttl,output:%d' % (
+                                HOST_PRIORITY, host.IP(), mac,
+                                macOf( host ), port ) )
+                for r in self.routers:
+                    if ( r, owner ) not in hops:
+                        continue
+                    out, peer = hops[ ( r, owner ) ]
+                    flows[ r ].append(
+                        'priority=%d,ip,nw_dst=%s,actions=mod_dl_src:%s,'
+                        'mod_dl_dst:%s,dec_ttl,output:%d' % (
+                            PREFIX_PRIORITY + int( prefix.split( '/' )[ 1 ] ),
+                            prefix, macOf( out ), macOf( peer ),
+                            r.ports[ out ] ) )
+        return flows
+
+    def install( self ):
+        """Push every switch's flows, one ovs-ofctl add-flows per switch,
+           all switches concurrently.
+           returns: ( number of flows, seconds )"""
+        flows = self.flows()
+        paths = dict( ( s, writeBatch( f, suffix='.flows' ) )
+                      for s, f in flows.items() )
+        cmd = ' '.join( 'ovs-ofctl add-flows %s %s &' % ( s.name, path )
+                        for s, path in sorted( paths.items(),
+                                               key=lambda i: i[ 0 ].name ) )
+        start = time()
+        output = quietRun( cmd + ' wait', shell=True )
+        elapsed = time() - start
+        quietRun( 'rm -f ' + ' '.join( paths.values() ), shell=True )
+        if output.strip():
+            warn( '*** Proactive flows: %s\n' % output.strip() )
+        count = sum( len( f ) for f in flows.values() )
+        info( '*** Installed %d proactive flows on %d switches in %.3fs\n' %
+              ( count, len( flows ), elapsed ) )
+        return count, elapsed
+
+
+def tableMisses( switch ):
+    """Packets that missed table 0 of an OVS switch; with a controller
+       in secure mode each one is a packet-in."""
+    stats = re.search( r'lookup=(\d+), matched=(\d+)',
+                       quietRun( 'ovs-ofctl dump-tables %s' % switch.name ) )
+    return int( stats.group( 1 ) ) - int( stats.group( 2 ) ) if stats else 0
+
+def flowCount( switch ):
+    "Number of flows in an OVS switch's tables."
+    return quietRun( 'ovs-ofctl dump-flows %s' % switch.name ).count(
+        'actions=' )
+
+def installProactive( net ):
+    "Install proactive L3 flows on a running SDN network."
+    return ProactiveFabric( net ).install()
@@ -0,0 +1,260 @@
+"""
+profiler.py: phase-level instrumentation of network bring-up
+
+StartupProfiler wraps the Mininet methods that make up bring-up, and
+records for every phase ( and every node within it ) the wall time, the
+number of shell round-trips ( Node.sendCmd() calls, which is what cmd()
+uses ) and the number of processes spawned ( subprocess.Popen, which
+covers node shells, popen() and the quietRun()/errRun() helpers ).
+
+Phases nest ( 'build' contains 'config', which contains the routers'
+'router-config' ); times and counts are inclusive, so a parent phase
+includes everything done by its children.  Extra phases can be marked
+with the phase() context manager or with wrap().
+
+    prof = StartupProfiler().install()
+    net = Mininet( topo ); net.start()
+    with prof.phase( 'sysctls' ):
+        applySysctls( net[ 'h2' ], H2_SYSCTLS )
+    prof.uninstall()
+    info( prof.summary() )
+    prof.dump( 'startup.json' )
+"""
+
+import json
+import subprocess
+from types import FunctionType
+from contextlib import contextmanager
+from functools import wraps
+from time import time
+
+from mininet.net import Mininet
+from mininet.node import Node, Switch, Controller
+
+from ysn.router import LinuxRouter
+
+# ( class, method, phase ) hooks installed by default
+HOOKS = [ ( Mininet, 'build', 'build' ),
+          ( Mininet, 'buildFromTopo', 'create' ),
+          ( Mininet, 'configHosts', 'config' ),
+          ( Node, 'configDefault', 'node-config' ),
+          ( LinuxRouter, 'config', 'router-config' ),
+          ( Mininet, 'start', 'start' ),
+          ( Controller, 'start', 'controllers' ),
+          ( Switch, 'start', 'switches' ),
+          ( Mininet, 'stop', 'stop' ) ]
+
+ROOT = '(root)'
+
+
+def subclasses( cls ):
+    "Return cls and all of its ( currently defined ) subclasses."
+    result = [ cls ]
+    for sub in cls.__subclasses__():
+        result += subclasses( sub )
+    return result
+
+
+class PhaseStats( object ):
+    "Counters for one phase, or for one node within a phase."
+
+    def __init__( self ):
+        self.seconds = 0.0
+        self.calls = 0
+        self.cmds = 0
+        self.procs = 0
+
+    def asDict( self ):
+        return { 'seconds': round( self.seconds, 6 ), 'calls': self.calls,
+                 'cmds': self.cmds, 'procs': self.procs }
+
+
+class StartupProfiler( object ):
+    "Per-phase, per-node wall time, shell round-trips and process spawns."
+
+    def __init__( self, hooks=HOOKS ):
+        self.hooks = hooks
+        self.stack = []  # active phase names, innermost last
+        self.active = set()  # ( phase, node ) currently being recorded
+        self.order = []  # ( phase, depth ) in order of first entry
+        self.phases = {}
+        self.totals = PhaseStats()
+        self.nodes = {}  # phase -> node name -> PhaseStats
+        self.saved = []
+        self.marks = []
+        self.started = None
+        self.stopped = None
+
+    # Recording
+
+    def stats( self, phase, node=None ):
+        "Return ( creating if needed ) the counters for phase[ / node ]."
+        if phase not in self.phases:
+            self.phases[ phase ] = PhaseStats()
+            self.order.append( ( phase, len( self.stack ) ) )
+        if node is None:
+            return self.phases[ phase ]
+        return self.nodes.setdefault( phase, {} ).setdefault(
+            node, PhaseStats() )
+
+    def count( self, field, node ):
+        "Charge one cmd or proc to every active phase and to node."
+        setattr( self.totals, field, getattr( self.totals, field ) + 1 )
+        for phase in self.stack:
+            setattr( self.stats( phase ), field,
+                     getattr( self.stats( phase ), field ) + 1 )
+        if self.stack:
+            stats = self.stats( self.stack[ -1 ], node )
+            setattr( stats, field, getattr( stats, field ) + 1 )
+
+    @contextmanager
+    def phase( self, name, node=None ):
+        "Mark a ( possibly per-node ) phase of bring-up."
+        stats = self.stats( name )
+        nodeStats = self.stats( name, node ) if node else None
+        self.stack.append( name )
+        start = time()
+        try:
+            yield stats
+        finally:
+            elapsed = time() - start
+            self.stack.pop()
+            stats.seconds += elapsed
+            stats.calls += 1
+            if nodeStats:
+                nodeStats.seconds += elapsed
+                nodeStats.calls += 1
+
+    # Installation
+
+    def patch( self, owner, name, replacement ):
+        "Replace owner.name, remembering the original for uninstall()."
+        self.saved.append( ( owner, name, owner.__dict__[ name ] ) )
+        setattr( owner, name, replacement )
+
+    def wrap( self, cls, method, phase ):
+        """Record calls of cls.method, and of its overrides in subclasses
+           defined so far, as phase ( per node if called on a Node )."""
+        for sub in subclasses( cls ):
+            orig = sub.__dict__.get( method )
+            if isinstance( orig, FunctionType ):
+                self.patch( sub, method, self.phaseWrapper( orig, phase ) )
+
+    def phaseWrapper( self, orig, phase ):
+        "Return orig wrapped in phase."
+        profiler = self
+
+        @wraps( orig )
+        def wrapper( obj, *args, **kwargs ):
+            node = obj.name if isinstance( obj, Node ) else None
+            key = ( phase, node )
+            # Overrides calling their parent count once, not twice
+            if key in profiler.active:
+                return orig( obj, *args, **kwargs )
+            profiler.active.add( key )
+            try:
+                with profiler.phase( phase, node ):
+                    return orig( obj, *args, **kwargs )
+            finally:
+                profiler.active.discard( key )
+
+        return wrapper
+
+    def mark( self, name ):
+        "Record a named point in time ( e.g. reaching the CLI prompt )."
+        self.marks.append( ( name, time() - self.started ) )
+
+    def install( self, hooks=True ):
+        """Install the counters and ( unless hooks=False ) the phase hooks.
+           Installing hooks later, with installHooks(), also catches
+           subclasses defined in between.
+           returns: self"""
+        profiler = self
+        sendCmd = Node.sendCmd
+        popenInit = subprocess.Popen.__init__
+        nodePopen = Node._popen
+
+        def countedSendCmd( node, *args, **kwargs ):
+            profiler.count( 'cmds', node.name )
+            return sendCmd( node, *args, **kwargs )
+
+        def countedNodePopen( node, *args, **kwargs ):
+            # Attribute the spawn to the node, then let Popen count it
+            profiler.spawner = node.name
+            try:
+                return nodePopen( node, *args, **kwargs )
+            finally:
+                profiler.spawner = None
+
+        def countedPopen( popen, *args, **kwargs ):
+            profiler.count( 'procs', profiler.spawner or ROOT )
+            return popenInit( popen, *args, **kwargs )
+
+        self.spawner = None
+        self.patch( Node, 'sendCmd', countedSendCmd )
+        self.patch( Node, '_popen', countedNodePopen )
+        self.patch( subprocess.Popen, '__init__', countedPopen )
+        if hooks:
+            self.installHooks()
+        self.started = time()
+        return self
+
+    def installHooks( self ):
+        "Wrap the methods listed in self.hooks."
+        for cls, method, phase in self.hooks:
+            self.wrap( cls, method, phase )
+
+    def uninstall( self ):
+        "Restore everything install() and wrap() replaced."
+        while self.saved:
+            owner, name, orig = self.saved.pop()
+            setattr( owner, name, orig )
+        self.stopped = time()
+
+    # Reporting
+
+    def report( self ):
+        "Return the measurements as a JSON-serializable dict."
+        end = self.stopped or time()
+        return {
+            'total': round( end - self.started, 6 ) if self.started else None,
+            'cmds': self.totals.cmds,
+            'procs': self.totals.procs,
+            'marks': dict( ( name, round( t, 6 ) ) for name, t in self.marks ),
+            'phases': [ dict( self.phases[ phase ].asDict(), phase=phase,
+                              depth=depth,
+                              nodes=dict( ( node, stats.asDict() )
+                                          for node, stats in sorted(
+                                              self.nodes.get( phase,
+                                                              {} ).items() ) ) )
+                        for phase, depth in self.order ] }
+
+    def dump( self, path ):
+        "Write report() to path as JSON."
+        with open( path, 'w' ) as f:
+            json.dump( self.report(), f, indent=2, sort_keys=True )
+
+    def summary( self, top=3 ):
+        """Return a printable summary: one line per phase, plus its
+           slowest nodes."""
+        report = self.report()
+        lines = [ '%-28s %9s %6s %7s %6s' % ( 'phase', 'seconds', 'calls',
+                                             'cmds', 'procs' ) ]
+        for p in report[ 'phases' ]:
+            lines.append( '%-28s %9.3f %6d %7d %6d' % (
+                '  ' * p[ 'depth' ] + p[ 'phase' ], p[ 'seconds' ],
+                p[ 'calls' ], p[ 'cmds' ], p[ 'procs' ] ) )
+            slowest = sorted( p[ 'nodes' ].items(),
+                              key=lambda i: -i[ 1 ][ 'seconds' ] )[ :top ]
+            for node, n in slowest:
+                if n[ 'seconds' ] or n[ 'cmds' ]:
+                    lines.append( '%-28s %9.3f %6d %7d %6d' % (
+                        '  ' * ( p[ 'depth' ] + 1 ) + node, n[ 'seconds' ],
+                        n[ 'calls' ], n[ 'cmds' ], n[ 'procs' ] ) )
+        for name, t in self.marks:
+            lines.append( '%-28s %9.3f' % ( '@' + name, t ) )
+        if report[ 'total' ] is not None:
+            lines.append( '%-28s %9.3f %6s %7d %6d' % (
+                'total', report[ 'total' ], '', report[ 'cmds' ],
+                report[ 'procs' ] ) )
+        return '\n'.join( lines ) + '\n'
@@ -0,0 +1,516 @@
+"""
+routing.py: static route computation from a Topo graph
+
+RouteEngine walks a Topo, groups switches into broadcast domains, and
+treats every LinuxRouter attached to a domain as adjacent to every
+other router on it.  Each domain's prefixes ( taken from the interface
+addresses on it ) become destinations of a multi-source shortest path
+computation, and the resulting next hops are emitted as per-router
+tables in 'ip route' syntax, ready for LinuxRouter( routes=... ) or
+ysn.router.installRoutes().
+
+Link costs come from an optional 'cost' link option ( default 1 ).
+With ecmp=True every equal-cost next hop is used ( nexthop ... nexthop
+... ); otherwise the lowest one is picked deterministically.
+
+The engine keeps its own copy of the link list.  addLink() and
+removeLink() mirror changes made to a running network and only
+recompute the destinations whose shortest paths the change can affect;
+updates() then returns just the routes that differ from what was last
+emitted.  Changes between switches re-derive the domains from scratch.
+"""
+
+from heapq import heappush, heappop
+
+from mininet.util import netParse, ipStr
+
+from ysn.router import LinuxRouter, ipBatch
+
+
+def isRouter( info ):
+    "Is this node info dict a LinuxRouter?"
+    cls = info.get( 'cls' )
+    return isinstance( cls, type ) and issubclass( cls, LinuxRouter )
+
+_prefixes = {}
+
+def prefixOf( addr ):
+    "Return the network prefix ( a.b.c.d/len ) of an ip/len address."
+    prefix = _prefixes.get( addr )
+    if prefix is None:
+        ip, prefixLen = netParse( addr )
+        mask = ( 0xffffffff << ( 32 - prefixLen ) ) & 0xffffffff
+        prefix = '%s/%d' % ( ipStr( ip & mask ), prefixLen )
+        _prefixes[ addr ] = prefix
+    return prefix
+
+def inPrefix( ip, prefix ):
+    "Is the address ip ( no length ) inside prefix?"
+    return prefixOf( '%s/%s' % ( ip, prefix.split( '/' )[ 1 ] ) ) == prefix
+
+
+class Domain( object ):
+    "A broadcast domain: a switch island or a point-to-point link."
+
+    def __init__( self, name ):
+        self.name = name
+        # ( node, intf, 'ip/len' ) for every addressed member interface
+        self.members = []
+        # Cost of crossing the domain: lowest 'cost' of its links
+        self.cost = None
+        self._prefixes = None
+
+    def addMember( self, member ):
+        "Add a ( node, intf, 'ip/len' ) member."
+        self.members.append( member )
+        self._prefixes = None
+
+    def removeMembers( self, members ):
+        "Remove a list of members."
+        self.members = [ m for m in self.members if m not in members ]
+        self._prefixes = None
+
+    def prefixes( self ):
+        "Prefixes reachable on this domain, sorted."
+        if self._prefixes is None:
+            self._prefixes = sorted( set(
+                prefixOf( addr ) for _node, _intf, addr in self.members ) )
+        return self._prefixes
+
+    def routerMembers( self, routers ):
+        "Members that are routers."
+        return [ m for m in self.members if m[ 0 ] in routers ]
+
+    def __repr__( self ):
+        return '<Domain %s %s>' % ( self.name, ' '.join( self.prefixes() ) )
+
+
+class RouteEngine( object ):
+    "Shortest-path static routes for every LinuxRouter in a Topo."
+
+    def __init__( self, topo, ecmp=False ):
+        """topo: Topo whose nodes and links to route over
+           ecmp: install all equal-cost next hops"""
+        self.ecmp = ecmp
+        self.info = dict( ( n, topo.nodeInfo( n ) ) for n in topo.nodes() )
+        self.switches = set( topo.switches() )
+        self.routers = set( n for n, info in self.info.items()
+                            if isRouter( info ) )
+        self.links = [ ( src, dst, dict( info ) ) for src, dst, info in
+                       topo.links( sort=True, withInfo=True ) ]
+        self.installed = {}
+        self.rebuild()
+
+    # Model construction
+
+    def endpoints( self, node1, node2, opts ):
+        "Return ( node, intf name, 'ip/len' or None ) for both link ends."
+        ends = []
+        for i, node in ( ( '1', node1 ), ( '2', node2 ) ):
+            port = opts.get( 'port' + i )
+            intf = opts.get( 'intfName' + i ) or '%s-eth%s' % ( node, port )
+            params = opts.get( 'params' + i ) or {}
+            addr = params.get( 'ip' )
+            # Like Node.config(), the node's ip wins on its default intf,
+            # which is the one with the lowest port
+            nodeIp = self.info.get( node, {} ).get( 'ip' )
+            if nodeIp and port == self.defaultPort.get( node ):
+                addr = nodeIp
+            ends.append( ( node, intf, addr ) )
+        return ends
+
+    def notePorts( self, src, dst, opts ):
+        "Track the lowest port of each node."
+        for node, port in ( ( src, opts.get( 'port1' ) ),
+                            ( dst, opts.get( 'port2' ) ) ):
+            if port is not None and port < self.defaultPort.get( node,
+                                                                 port + 1 ):
+                self.defaultPort[ node ] = port
+
+    def rebuild( self ):
+        "Recompute domains, adjacencies and all distances from scratch."
+        self.domains = {}
+        self.switchDomain = {}
+        self.linkDomain = {}
+        self.addrs = {}
+        self.specs = {}
+        self.defaultPort = {}
+        for src, dst, opts in self.links:
+            self.notePorts( src, dst, opts )
+        # Union switches into islands
+        parent = dict( ( s, s ) for s in self.switches )
+
+        def find( s ):
+            while parent[ s ] != s:
+                parent[ s ] = parent[ parent[ s ] ]
+                s = parent[ s ]
+            return s
+
+        for src, dst, _opts in self.links:
+            if src in self.switches and dst in self.switches:
+                parent[ find( src ) ] = find( dst )
+        for switch in sorted( self.switches ):
+            root = find( switch )
+            if root not in self.domains:
+                self.domains[ root ] = Domain( root )
+            self.switchDomain[ switch ] = self.domains[ root ]
+        for src, dst, opts in self.links:
+            self.attach( src, dst, opts )
+        self.adj = {}
+        for domain in self.domains.values():
+            self.connect( domain )
+        self.dist = dict( ( name, self.spf( domain ) )
+                          for name, domain in self.domains.items() )
+        # cache[ router ][ domain name ] = [ ( prefix, route ) ]
+        self.cache = dict( ( r, {} ) for r in self.routers )
+        self.dirty = set( ( r, d ) for r in self.routers
+                          for d in self.domains )
+
+    def linkKey( self, src, dst, opts ):
+        "Stable name for a point-to-point link domain."
+        return '%s:%s-%s:%s' % ( src, opts.get( 'port1' ),
+                                 dst, opts.get( 'port2' ) )
+
+    def attach( self, src, dst, opts ):
+        """Add the addressed ends of a link to their domain.
+           returns: the domain, or None for switch-switch links"""
+        if src in self.switches and dst in self.switches:
+            return None
+        if src in self.switches or dst in self.switches:
+            domain = self.switchDomain[ src if src in self.switches
+                                        else dst ]
+        else:
+            key = self.linkKey( src, dst, opts )
+            domain = self.domains.setdefault( key, Domain( key ) )
+            self.linkDomain[ key ] = domain
+        cost = opts.get( 'cost', 1 )
+        if domain.cost is None or cost < domain.cost:
+            domain.cost = cost
+        for end in self.endpoints( src, dst, opts ):
+            node, intf, addr = end
+            if node not in self.switches and addr:
+                domain.addMember( end )
+                self.addrs.setdefault( ( node, intf ), [] ).append( addr )
+        return domain
+
+    def connect( self, domain ):
+        """Make routers on domain adjacent to each other.
+           returns: list of ( u, v, cost ) edges added"""
+        added = []
+        cost = domain.cost if domain.cost is not None else 1
+        members = domain.routerMembers( self.routers )
+        for u, intf, _addr in members:
+            for v, _vintf, vaddr in members:
+                if u == v:
+                    continue
+                edge = ( v, cost, intf, vaddr.split( '/' )[ 0 ], domain.name )
+                self.adj.setdefault( u, [] ).append( edge )
+                added.append( ( u, v, cost ) )
+        return added
+
+    def disconnect( self, domain ):
+        """Remove all adjacencies learned over domain.
+           returns: list of ( u, v, cost ) edges removed"""
+        removed = []
+        for u, edges in self.adj.items():
+            keep = []
+            for edge in edges:
+                if edge[ 4 ] == domain.name:
+                    removed.append( ( u, edge[ 0 ], edge[ 1 ] ) )
+                else:
+                    keep.append( edge )
+            self.adj[ u ] = keep
+        return removed
+
+    def domainFor( self, src, dst, opts ):
+        "Domain a link belongs to, if any."
+        if src in self.switches:
+            return self.switchDomain.get( src )
+        if dst in self.switches:
+            return self.switchDomain.get( dst )
+        return self.linkDomain.get( self.linkKey( src, dst, opts ) )
+
+    def spf( self, domain ):
+        """Multi-source Dijkstra from the routers attached to domain.
+           returns: dict of router -> distance to domain"""
+        dist = {}
+        heap = []
+        for router, _intf, _addr in domain.routerMembers( self.routers ):
+            dist[ router ] = 0
+            heappush( heap, ( 0, router ) )
+        while heap:
+            d, u = heappop( heap )
+            if d > dist.get( u, d ):
+                continue
+            # Links are symmetric, so u's edges lead back towards domain
+            for v, cost, _intf, _nh, _dname in self.adj.get( u, [] ):
+                if d + cost < dist.get( v, d + cost + 1 ):
+                    dist[ v ] = d + cost
+                    heappush( heap, ( d + cost, v ) )
+        return dist
+
+    # Incremental updates
+
+    def addLink( self, node1, node2, **opts ):
+        """Add a link ( Topo.addLink options, including port1/port2 )
+           and update only the affected destinations."""
+        self.links.append( ( node1, node2, opts ) )
+        if node1 in self.switches and node2 in self.switches:
+            self.rebuild()
+            return
+        self.notePorts( node1, node2, opts )
+        domain = self.attach( node1, node2, opts )
+        self.reconnect( domain )
+
+    def removeLink( self, node1, node2 ):
+        "Remove the first link between node1 and node2."
+        for i, ( src, dst, opts ) in enumerate( self.links ):
+            if set( ( src, dst ) ) == set( ( node1, node2 ) ):
+                break
+        else:
+            raise Exception( 'No link between %s and %s' % ( node1, node2 ) )
+        domain = self.domainFor( src, dst, opts )
+        del self.links[ i ]
+        if domain is None:
+            self.rebuild()
+            return
+        ends = self.endpoints( src, dst, opts )
+        domain.removeMembers( ends )
+        for node, intf, addr in ends:
+            if addr in self.addrs.get( ( node, intf ), [] ):
+                self.addrs[ ( node, intf ) ].remove( addr )
+        costs = [ o.get( 'cost', 1 ) for s, d, o in self.links
+                  if self.domainFor( s, d, o ) is domain ]
+        domain.cost = min( costs ) if costs else None
+        if not domain.members and domain.name in self.linkDomain:
+            del self.linkDomain[ domain.name ]
+            del self.domains[ domain.name ]
+            del self.dist[ domain.name ]
+        self.reconnect( domain )
+
+    def reconnect( self, domain ):
+        "Re-derive domain's adjacencies and propagate the net change."
+        # Addresses changed, so onlink decisions may have too
+        self.specs = {}
+        removed = set( self.disconnect( domain ) )
+        added = set( self.connect( domain ) )
+        self.update( list( added - removed ), list( removed - added ),
+                     domain.name )
+
+    def update( self, added, removed, changed ):
+        """Recompute distances only for destinations a set of edge
+           changes can affect, and mark stale routes dirty."""
+        affected = set( [ changed ] ) & set( self.domains )
+        for name, dist in self.dist.items():
+            if name in affected:
+                continue
+            for u, v, cost in removed:
+                # A removed edge matters if it lies on a shortest path
+                if ( u in dist and v in dist and
+                     dist[ u ] == cost + dist[ v ] ):
+                    affected.add( name )
+                    break
+            else:
+                for u, v, cost in added:
+                    # An added edge matters if it shortens a path
+                    if v in dist and cost + dist[ v ] < dist.get(
+                            u, cost + dist[ v ] + 1 ):
+                        affected.add( name )
+                        break
+        for name in affected:
+            old = self.dist.get( name, {} )
+            new = self.dist[ name ] = self.spf( self.domains[ name ] )
+            if name == changed:
+                # Its prefixes or members changed: refresh everywhere
+                self.dirty.update( ( r, name ) for r in self.routers )
+                continue
+            moved = set( r for r in self.routers
+                         if old.get( r ) != new.get( r ) )
+            # Next hops depend on the neighbours' distances as well
+            for r in list( moved ):
+                moved.update( edge[ 0 ] for edge in self.adj.get( r, [] ) )
+            self.dirty.update( ( r, name ) for r in moved )
+        # Equal-cost changes only alter the next hops at the ends
+        ends = set( u for u, _v, _c in added + removed )
+        self.dirty.update( ( r, name ) for r in ends
+                           for name in self.domains )
+
+    # Queries
+
+    def hostDomains( self, host ):
+        """Domains of host's addressed interfaces, that of its default
+           interface ( its lowest port ) first."""
+        port = self.defaultPort.get( host )
+        found = []
+        for src, dst, opts in self.links:
+            for i, ( node, _intf, addr ) in enumerate(
+                    self.endpoints( src, dst, opts ) ):
+                intfPort = opts.get( 'port%d' % ( i + 1 ) )
+                if node == host and ( addr or intfPort == port ):
+                    domain = self.domainFor( src, dst, opts )
+                    if domain is not None:
+                        found.append( ( intfPort != port, domain ) )
+        return [ domain for _other, domain in
+                 sorted( found, key=lambda f: f[ 0 ] ) ]
+
+    def hostDomain( self, host ):
+        "Domain of host's default interface ( its lowest port ), if any."
+        domains = self.hostDomains( host )
+        return domains[ 0 ] if domains else None
+
+    def gateway( self, host, domain ):
+        "Router on domain that host sends off-subnet traffic to."
+        routers = domain.routerMembers( self.routers )
+        tokens = ( self.info.get( host, {} ).get( 'defaultRoute' ) or
+                   '' ).split()
+        # The first gateway of a single or multipath ( nexthop ) route
+        gw = tokens[ tokens.index( 'via' ) + 1 ] if 'via' in tokens[ :-1 ] \
+            else None
+        for router, _intf, addr in routers:
+            if addr.split( '/' )[ 0 ] == gw:
+                return router
+        return min( routers )[ 0 ] if routers else None
+
+    def path( self, src, dst ):
+        """Routers crossed from host src to host dst, following the
+           shortest path ( the first next hop where there are several ).
+           returns: list of router names ( [] when src has an interface
+                    on dst's domain ), or None if dst is unreachable"""
+        domains, last = self.hostDomains( src ), self.hostDomain( dst )
+        if not domains or last is None:
+            return None
+        # A host on several domains reaches dst's default address
+        # directly from the interface on its subnet
+        if last in domains:
+            return []
+        first = domains[ 0 ]
+        dist = self.dist.get( last.name, {} )
+        router, routers = self.gateway( src, first ), []
+        while router in dist and router not in routers:
+            routers.append( router )
+            if dist[ router ] == 0:
+                return routers
+            hops = sorted( v for v, cost, _intf, _nh, _dname
+                           in self.adj.get( router, [] )
+                           if v in dist and cost + dist[ v ] == dist[ router ] )
+            router = hops[ 0 ] if hops else None
+        return None
+
+    # Route emission
+
+    def routesFor( self, router, domain ):
+        "Return list of ( prefix, route ) for router towards domain."
+        dist = self.dist.get( domain.name, {} )
+        own = [ m for m in domain.members if m[ 0 ] == router ]
+        if own:
+            # Directly attached: only prefixes we have no address in
+            # ( e.g. a mismatched far end ) need an explicit dev route
+            routes = []
+            for prefix in domain.prefixes():
+                if not any( prefixOf( addr ) == prefix
+                            for _n, _i, addr in own ):
+                    routes.append( ( prefix, '%s dev %s' %
+                                     ( prefix, own[ 0 ][ 1 ] ) ) )
+            return routes
+        if router not in dist:
+            return []
+        hops = sorted( set(
+            ( intf, nh ) for v, cost, intf, nh, _dname
+            in self.adj.get( router, [] )
+            if v in dist and cost + dist[ v ] == dist[ router ] ) )
+        if not hops:
+            return []
+        if not self.ecmp:
+            hops = hops[ :1 ]
+        key = ( router, tuple( hops ) )
+        spec = self.specs.get( key )
+        if spec is None:
+            spec = self.specs[ key ] = self.nexthops( *key )
+        return [ ( prefix, prefix + ' ' + spec )
+                 for prefix in domain.prefixes() ]
+
+    def nexthops( self, router, hops ):
+        "Format one or more next hops in 'ip route' syntax."
+        def via( intf, nh ):
+            onlink = not self.onSubnet( router, intf, nh )
+            return 'via %s dev %s%s' % ( nh, intf, ' onlink' if onlink else '' )
+        if len( hops ) == 1:
+            return via( *hops[ 0 ] )
+        return ' '.join( 'nexthop ' + via( *hop ) for hop in hops )
+
+    def onSubnet( self, router, intf, nh ):
+        "Is next hop nh inside a prefix configured on router's intf?"
+        return any( inPrefix( nh, prefixOf( addr ) )
+                    for addr in self.addrs.get( ( router, intf ), [] ) )
+
+    def refresh( self ):
+        "Recompute dirty ( router, domain ) route entries."
+        for router, name in self.dirty:
+            domain = self.domains.get( name )
+            if domain is None:
+                self.cache[ router ].pop( name, None )
+            else:
+                self.cache[ router ][ name ] = self.routesFor( router,
+                                                               domain )
+        self.dirty = set()
+
+    def table( self, router ):
+        "Return dict of prefix -> route for router."
+        self.refresh()
+        routes = {}
+        for name, entries in self.cache[ router ].items():
+            if name in self.domains:
+                routes.update( entries )
+        return routes
+
+    def tables( self ):
+        """Return per-router route lists in 'ip route' syntax,
+           dev routes first so that gateways resolve in ip -batch."""
+        self.refresh()
+        result = {}
+        for router in sorted( self.routers ):
+            table = self.table( router )
+            self.installed[ router ] = table
+            result[ router ] = sorted(
+                table.values(), key=lambda r: ( ' via ' in r, r ) )
+        return result
+
+    def updates( self ):
+        """Return routes changed since the last tables()/updates() call.
+           returns: dict of router -> ( routes to replace,
+                                        prefixes to delete )"""
+        self.refresh()
+        result = {}
+        for router in sorted( self.routers ):
+            old = self.installed.get( router, {} )
+            new = self.table( router )
+            replace = sorted( route for prefix, route in new.items()
+                              if old.get( prefix ) != route )
+            delete = sorted( prefix for prefix in old if prefix not in new )
+            if replace or delete:
+                result[ router ] = ( replace, delete )
+            self.installed[ router ] = new
+        return result
+
+    # Installation
+
+    def install( self, net ):
+        "Install all tables on a running network, one batch per router."
+        for router, routes in self.tables().items():
+            ipBatch( net[ router ], [ 'route replace ' + r for r in routes ] )
+
+    def apply( self, net ):
+        "Install only the changes since the last install() or apply()."
+        for router, ( replace, delete ) in self.updates().items():
+            ipBatch( net[ router ], [ 'route del ' + p for p in delete ] +
+                     [ 'route replace ' + r for r in replace ] )
+
+
+def routeTopo( topo, ecmp=False ):
+    """Compute routes for topo and store them as the routers' routes
+       parameter, so LinuxRouter.config() installs them at build time.
+       returns: the RouteEngine, for later incremental updates"""
+    engine = RouteEngine( topo, ecmp=ecmp )
+    for router, routes in engine.tables().items():
+        topo.nodeInfo( router )[ 'routes' ] = routes
+    return engine
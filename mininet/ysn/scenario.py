@@ -0,0 +1,198 @@
+"""
+scenario.py: timed actions on a running network, without a CLI
+
+A scenario is a list of actions, each at a time in seconds from the
+start, run in that order against a running network ( runScript() in
+ysn/scripts.py gets one to the point where the CLI would start ):
+
+    { "actions": [
+        { "at": 0, "do": "traffic", "src": "h1", "dst": "h5",
+          "seconds": 10 },
+        { "at": 1, "do": "ping", "src": "h3", "dst": "h7" },
+        { "at": 2, "do": "link", "a": "r2", "b": "s4", "state": "down" },
+        { "at": 2, "do": "shape", "a": "r1", "b": "r2",
+          "shape": "wan-lossy" },
+        { "at": 2, "do": "verify", "expect": "unreachable" },
+        { "at": 3, "do": "route", "node": "h2",
+          "route": "del 10.1.3.0/24 via 10.1.4.1" },
+        { "at": 4, "do": "cmd", "node": "r2", "cmd": "ip route",
+          "expect": "10.1.4.0/24" },
+        { "at": 5, "do": "wait" } ] }
+
+    traffic   iperf flow ( proto, seconds, bw ), in the background
+    ping      RTT probe ( rate, seconds ) that must get replies, or with
+              "expect": "unreachable" must not; "background": true
+              lets it run on
+    link      configLinkStatus( a, b, state )
+    shape     shape the links between a and b ( profile name or dict,
+              see ysn/shaping.py; none removes it )
+    route     ip route <route> on node, which must print nothing
+    cmd       cmd on node, whose output must contain expect if given
+    verify    data-plane check ( ysn/verify.py ) that must find every
+              pair reachable and no loop, or with "expect":
+              "unreachable" at least one unreachable pair
+    wait      wait for the background actions to finish
+
+Actions run when due; one that starts late ( because the one before it
+was still running ) says so in lateMs.  Every action writes one JSON
+line to the result stream as soon as it is done ( background ones when
+they finish ), so a killed run still leaves its results behind.
+"""
+
+import json
+from time import sleep, time
+
+from mininet.log import info, warn
+
+from ysn.latency import Probe
+from ysn.shaping import setShape
+from ysn.throughput import Flow, startServers, stopServers
+from ysn.topogen import loadSpec
+from ysn.verify import Snapshot, Model
+
+
+def loadScenario( path ):
+    "Actions of a JSON or YAML scenario file, in start order."
+    spec = loadSpec( path )
+    actions = spec[ 'actions' ] if isinstance( spec, dict ) else spec
+    for action in actions:
+        if action.get( 'do' ) not in Scenario.ACTIONS:
+            raise Exception( 'Unknown scenario action %s in %s' %
+                             ( action.get( 'do' ), path ) )
+    # Stable: actions due at the same time keep their file order
+    return sorted( actions, key=lambda a: a.get( 'at', 0 ) )
+
+
+class Scenario( object ):
+    "Run timed actions on a running network and stream their results."
+
+    ACTIONS = ( 'traffic', 'ping', 'link', 'shape', 'route', 'cmd',
+                'verify', 'wait' )
+
+    def __init__( self, net, actions, stream=None ):
+        """net: running Mininet
+           actions: action dicts, in start order ( see loadScenario() )
+           stream: file for JSON result lines ( optional )"""
+        self.net = net
+        self.actions = actions
+        self.stream = stream
+        self.start = None
+        self.pending = []  # ( action, lateMs, Flow or Probe ) running
+        self.servers = {}  # ( host, proto ) -> iperf server
+        self.results = []
+
+    def emit( self, action, ok, **result ):
+        "Record and stream the result of an action."
+        result.update( at=action.get( 'at', 0 ), do=action[ 'do' ], ok=ok,
+                       t=round( time() - self.start, 3 ) )
+        self.results.append( result )
+        if not ok:
+            warn( '*** Scenario action failed: %s\n' % json.dumps(
+                result, sort_keys=True ) )
+        if self.stream:
+            self.stream.write( json.dumps( result, sort_keys=True ) + '\n' )
+            self.stream.flush()
+
+    def run( self ):
+        """Run every action when due, then wait for the background ones.
+           returns: True if every action succeeded"""
+        info( '*** Running %d scenario actions\n' % len( self.actions ) )
+        self.start = time()
+        try:
+            for action in self.actions:
+                due = self.start + action.get( 'at', 0 )
+                sleep( max( 0, due - time() ) )
+                late = round( max( 0, time() - due ) * 1000, 1 )
+                try:
+                    getattr( self, 'do_' + action[ 'do' ] )( action, late )
+                except Exception as e:  # pylint: disable=broad-except
+                    self.emit( action, False, lateMs=late, error=str( e ) )
+            self.collect()
+        finally:
+            stopServers( self.servers.values() )
+        return all( r[ 'ok' ] for r in self.results )
+
+    def background( self, action, late, item ):
+        "Start a Flow or Probe and keep it until the next wait."
+        item.start()
+        self.pending.append( ( action, late, item ) )
+
+    def do_traffic( self, action, late ):
+        "Start an iperf flow in the background."
+        src, dst = self.net[ action[ 'src' ] ], self.net[ action[ 'dst' ] ]
+        proto = action.get( 'proto', 'tcp' )
+        if ( dst, proto ) not in self.servers:
+            self.servers[ dst, proto ] = startServers( [ dst ],
+                                                       [ proto ] )[ 0 ]
+        flow = Flow( src, dst, proto, action.get( 'seconds', 5 ),
+                     action.get( 'bw', '10M' ) )
+        self.background( action, late, flow )
+
+    def do_ping( self, action, late ):
+        "Probe RTTs, in the foreground unless asked otherwise."
+        probe = Probe( self.net[ action[ 'src' ] ],
+                       self.net[ action[ 'dst' ] ],
+                       action.get( 'rate', 10 ), action.get( 'seconds', 1 ) )
+        self.background( action, late, probe )
+        if not action.get( 'background' ):
+            self.collect( [ probe ] )
+
+    def do_link( self, action, late ):
+        "Take a link down or up."
+        self.net.configLinkStatus( action[ 'a' ], action[ 'b' ],
+                                   action.get( 'state', 'down' ) )
+        self.emit( action, True, lateMs=late )
+
+    def do_shape( self, action, late ):
+        "Change the shape of the links between two nodes."
+        links = setShape( self.net, action[ 'a' ], action[ 'b' ],
+                          action.get( 'shape' ) )
+        self.emit( action, bool( links ), lateMs=late, links=len( links ) )
+
+    def do_route( self, action, late ):
+        "Change a route with ip route."
+        out = self.net[ action[ 'node' ] ].cmd(
+            'ip route ' + action[ 'route' ] ).strip()
+        self.emit( action, not out, lateMs=late, output=out )
+
+    def do_cmd( self, action, late ):
+        "Run a command on a node."
+        out = self.net[ action[ 'node' ] ].cmd( action[ 'cmd' ] )
+        expect = action.get( 'expect' )
+        self.emit( action, expect is None or expect in out, lateMs=late,
+                   output=out.strip() )
+
+    def do_verify( self, action, late ):
+        "Check reachability without sending packets."
+        result = Model( Snapshot.capture( self.net ) ).verify(
+            action.get( 'hosts' ) )
+        bad = [ '%s->%s' % ( p[ 'src' ], p[ 'dst' ] )
+                for p in result[ 'pairs' ] if p[ 'status' ] != 'reachable' ]
+        if action.get( 'expect' ) == 'unreachable':
+            ok = bool( bad )
+        else:
+            ok = not bad and not result[ 'loops' ]
+        self.emit( action, ok, lateMs=late, pairs=len( result[ 'pairs' ] ),
+                   unreachable=bad, loops=len( result[ 'loops' ] ),
+                   seconds=result[ 'stats' ][ 'verifySeconds' ] )
+
+    def do_wait( self, action, late ):
+        "Wait for the background actions to finish."
+        self.emit( action, True, lateMs=late, finished=self.collect() )
+
+    def collect( self, items=None ):
+        """Finish background actions ( or just items ) and report them.
+           returns: number finished"""
+        done = [ p for p in self.pending if items is None or p[ 2 ] in items ]
+        for entry in done:
+            self.pending.remove( entry )
+            action, late, item = entry
+            item.finish()
+            result = item.asDict()
+            if isinstance( item, Probe ):
+                ok = ( result[ 'received' ] > 0 ) != (
+                    action.get( 'expect' ) == 'unreachable' )
+            else:
+                ok = result.pop( 'ok' )
+            self.emit( action, ok, lateMs=late, **result )
+        return len( done )
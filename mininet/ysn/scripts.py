@@ -0,0 +1,151 @@
+"""
+scripts.py: run ysn scripts and spec files under a measurement tool
+
+Measurement tools need a running network, but every ysn script builds
+its network inline in run() and then blocks in CLI( net ).  runScript()
+loads an unmodified script and substitutes its CLI with a callback, so
+the tool runs exactly where an operator would get the prompt and the
+script still tears the network down itself.  Generated topologies
+( JSON/YAML specs, see ysn/topogen.py ) are built and torn down here.
+
+loadTopo() reads a script's NetworkTopo without running the script:
+module-level statements such as c0 = Controller( 'c0' ) would start
+controllers, and, while the script runs ( e.g. under ysn_live.py ), a
+second copy of its switch classes would make every switch look changed.
+"""
+
+import ast
+import imp
+import os
+import sys
+
+from mininet.log import info
+from mininet.node import Host
+
+from ysn.topogen import GeneratedTopo
+from ysn.routing import routeTopo
+from ysn.startup import ParallelMininet
+from ysn.shaping import applyShaping
+from ysn.warm import WarmMininet, useWarmStart
+
+
+def scriptName( path ):
+    "Module name of a loaded ysn script."
+    return 'ysn_' + os.path.splitext(
+        os.path.basename( path ) )[ 0 ].replace( '-', '_' )
+
+def loadScript( path, name=None ):
+    "Import a ysn script as a module without running it."
+    return imp.load_source( name or scriptName( path ), path )
+
+def isConstant( stmt ):
+    "Is stmt an assignment of a literal, e.g. R1_ROUTES = [ ... ]?"
+    if not isinstance( stmt, ast.Assign ):
+        return False
+    try:
+        ast.literal_eval( stmt.value )
+    except ( ValueError, TypeError ):
+        return False
+    return True
+
+def scriptTopo( path ):
+    """The NetworkTopo class of a ysn script as the file now reads, from
+       its imports, literal constants and definitions only.  If the
+       script is loaded already, the rest ( switch classes, controllers,
+       ... ) is the loaded module's."""
+    with open( path ) as f:
+        tree = ast.parse( f.read(), path )
+    module = sys.modules.get( scriptName( path ) )
+    if module and ( os.path.splitext( os.path.abspath( module.__file__ ) )[ 0 ]
+                    != os.path.splitext( os.path.abspath( path ) )[ 0 ] ):
+        module = None
+    namespace = ( dict( vars( module ) ) if module else
+                  { '__name__': scriptName( path ), '__file__': path } )
+    body = []
+    for stmt in tree.body:
+        if isinstance( stmt, ( ast.ClassDef, ast.FunctionDef ) ):
+            if not module or stmt.name == 'NetworkTopo':
+                body.append( stmt )
+        elif isinstance( stmt, ( ast.Import, ast.ImportFrom ) ) or \
+                isConstant( stmt ):
+            body.append( stmt )
+    tree.body = body
+    exec( compile( tree, path, 'exec' ), namespace )
+    return namespace[ 'NetworkTopo' ]
+
+def loadTopo( target, ecmp=False, **params ):
+    """The topology of a ysn script ( its NetworkTopo ) or spec file, built
+       but not started.
+       params: GeneratedTopo parameters overriding the spec file"""
+    if target.endswith( '.py' ):
+        return scriptTopo( target )()
+    topo = GeneratedTopo( spec=target, **params )
+    routeTopo( topo, ecmp=ecmp )
+    return topo
+
+def runScript( script, callback, **kwargs ):
+    """Run script's run(), calling callback( net ) instead of CLI( net ).
+       script: path or module
+       kwargs: passed to run(), for scripts that take options
+       returns: callback's return value"""
+    if not hasattr( script, 'run' ):
+        script = loadScript( script )
+    result = []
+
+    def prompt( net, *_args, **_kwargs ):
+        "Stand-in for CLI()."
+        result.append( callback( net ) )
+
+    script.CLI = prompt
+    script.run( **kwargs )
+    return result[ 0 ] if result else None
+
+def useHostClass( script, host ):
+    "Make a loaded ysn script build its hosts with class host."
+    makeNet = script.Mininet
+
+    def makeHostNet( *args, **kwargs ):
+        "The script's network, with our hosts."
+        kwargs[ 'host' ] = host
+        return makeNet( *args, **kwargs )
+
+    script.Mininet = makeHostNet
+    return script
+
+def runSpec( path, callback, ecmp=False, controller=None, state=None,
+             host=None, **params ):
+    """Build a generated topology, call callback( net ) and stop it.
+       controller: controller class, for switches that need one
+       state: keep the network in this state file for a warm start
+              ( see ysn/warm.py )
+       host: host class, e.g. LightHost ( see ysn/lighthost.py )
+       params: GeneratedTopo parameters overriding the spec file"""
+    if state and host:
+        raise Exception( 'Warm starts keep ordinary hosts only' )
+    topo = GeneratedTopo( spec=path, **params )
+    routeTopo( topo, ecmp=ecmp )
+    if state:
+        net = WarmMininet( topo=topo, controller=controller, state=state )
+    else:
+        net = ParallelMininet( topo=topo, controller=controller,
+                               host=host or Host )
+    net.start()
+    applyShaping( net )
+    try:
+        return callback( net )
+    finally:
+        net.stop()
+
+def withNetwork( target, callback, **params ):
+    """Run callback( net ) on a ysn script ( .py ) or a spec file.
+       params: passed to runSpec() for spec files; state ( warm start
+               file ) and host ( host class ) apply to scripts too"""
+    info( '*** Running on %s\n' % target )
+    if target.endswith( '.py' ):
+        script = loadScript( target )
+        if params.get( 'state' ):
+            useWarmStart( script, params[ 'state' ] )
+        if params.get( 'host' ):
+            useHostClass( script, params[ 'host' ] )
+        return runScript( script, callback )
+    return runSpec( target, callback, **params )
@@ -0,0 +1,232 @@
+"""
+shaping.py: bandwidth, delay, jitter, loss and queue profiles for links
+
+Plain ysn links forward at memory speed, so the r1-r2 link that stands
+in for the WAN between MX-104 and KBT is no slower than a host's
+access link.  A link ( or one interface, through params1/params2 ) gets
+a shape in the topology:
+
+    self.addLink( r1, r2, ..., shape='wan' )
+    self.addLink( s5, h2, shape={ 'profile': 'lan', 'loss': 1 } )
+
+either a profile name from PROFILES or a dict of TCLink-style
+parameters ( bw in Mbit/s, delay, jitter, loss in percent,
+max_queue_size in packets ), optionally on top of a profile.  Both
+interfaces of a link are shaped, so the round trip carries the delay
+twice.
+
+applyShaping( net ) installs every shape with one tc -batch per node,
+all nodes at once ( Mininet's TCLink costs several tc round-trips per
+interface ), and once shapes are edited ( setShape() ) brings the
+running qdiscs in line with them.  Each shaped interface gets
+
+    root   htb, with one class at the rate            ( if bw is set )
+    child  netem delay/jitter/loss/limit              ( if any is set )
+
+measureLink() checks what a shaped link between two routers or hosts
+actually achieves: TCP rate with iperf and RTT with ping, next to what
+its shape asks for.
+"""
+
+import re
+
+from mininet.log import info, warn
+from mininet.util import quietRun
+
+from ysn.router import batchCmd
+from ysn.startup import Scheduler
+from ysn.throughput import Flow, startServers, stopServers
+from ysn.latency import Probe
+
+# Shapes by name; tune these to the links being modeled
+PROFILES = { 'wan': { 'bw': 100, 'delay': '10ms', 'jitter': '1ms',
+                      'max_queue_size': 1000 },
+             'wan-lossy': { 'bw': 100, 'delay': '10ms', 'jitter': '2ms',
+                            'loss': 0.5, 'max_queue_size': 1000 },
+             'metro': { 'bw': 1000, 'delay': '1ms' },
+             'lan': { 'bw': 1000 },
+             'access': { 'bw': 100, 'max_queue_size': 100 } }
+
+# tc handles of the root htb, its class and the netem below it
+ROOT, CLASS, NETEM = '5:', '5:1', '10:'
+
+
+def resolveShape( shape ):
+    "TCLink-style parameters of a shape ( profile name or dict ), or {}."
+    if not shape:
+        return {}
+    if not isinstance( shape, dict ):
+        shape = { 'profile': shape }
+    params = dict( PROFILES[ shape[ 'profile' ] ] ) if 'profile' in shape \
+        else {}
+    params.update( ( k, v ) for k, v in shape.items() if k != 'profile' )
+    return params
+
+def netemArgs( params ):
+    "netem arguments for params, or '' if none apply."
+    args = []
+    if params.get( 'delay' ):
+        args.append( 'delay %s' % params[ 'delay' ] )
+        if params.get( 'jitter' ):
+            args.append( params[ 'jitter' ] )
+    if params.get( 'loss' ):
+        args.append( 'loss %s%%' % params[ 'loss' ] )
+    if params.get( 'max_queue_size' ):
+        args.append( 'limit %d' % params[ 'max_queue_size' ] )
+    return ' '.join( args )
+
+def tcLines( intf, params, old=None ):
+    """tc -batch lines that move intf from shape old to params.
+       params, old: resolved shapes ( see resolveShape() )"""
+    dev = intf.name
+    lines = []
+    if old and ( bool( old.get( 'bw' ) ) != bool( params.get( 'bw' ) ) or
+                 not params ):
+        # The qdisc tree changes shape: start from the default
+        lines.append( 'qdisc del dev %s root' % dev )
+    if not params:
+        return lines
+    netem = netemArgs( params )
+    parent = 'root'
+    if params.get( 'bw' ):
+        bw = float( params[ 'bw' ] )
+        # Burst of 1ms at the rate, and at least a few full packets
+        burst = max( 15000, int( bw * 125 ) )
+        lines += [ 'qdisc replace dev %s root handle %s htb default 1' % (
+                       dev, ROOT ),
+                   'class replace dev %s parent %s classid %s htb rate '
+                   '%gmbit burst %d' % ( dev, ROOT, CLASS, bw, burst ) ]
+        parent = 'parent ' + CLASS
+    if netem:
+        lines.append( 'qdisc replace dev %s %s handle %s netem %s' % (
+            dev, parent, NETEM, netem ) )
+    elif old and netemArgs( old ) and params.get( 'bw' ):
+        lines.append( 'qdisc del dev %s parent %s handle %s' % (
+            dev, CLASS, NETEM ) )
+    return lines
+
+def runLines( byNode ):
+    """Run { node: tc lines } with one tc -batch per node, all nodes at
+       once ( root-namespace interfaces in one batch ).
+       returns: number of nodes touched"""
+    scheduler = Scheduler()
+    rootLines = []
+    for node, lines in sorted( byNode.items(), key=lambda n: n[ 0 ].name ):
+        if not node.inNamespace:
+            rootLines += lines
+        elif lines:
+            scheduler.add( 'tc:' + node.name, node,
+                           batchCmd( lines, tool='tc' ) )
+    outputs = scheduler.run()
+    if rootLines:
+        outputs[ 'tc:root' ] = quietRun( batchCmd( rootLines, tool='tc' ),
+                                         shell=True )
+    for name, output in sorted( outputs.items() ):
+        if output.strip():
+            warn( '*** %s: %s\n' % ( name, output.strip() ) )
+    return len( [ lines for lines in byNode.values() if lines ] )
+
+def shapeOf( intf ):
+    "The shape an interface was given, resolved."
+    return resolveShape( ( getattr( intf, 'params', None ) or {} ).get(
+        'shape' ) )
+
+def applyShaping( net ):
+    """Bring the qdiscs of a started network's interfaces in line with
+       their shapes: install new ones, change or remove changed ones.
+       returns: number of interfaces changed"""
+    byNode, changed = {}, 0
+    for link in net.links:
+        for intf in link.intf1, link.intf2:
+            params, old = shapeOf( intf ), getattr( intf, 'shaped', {} )
+            if params != old:
+                byNode.setdefault( intf.node, [] ).extend(
+                    tcLines( intf, params, old ) )
+                intf.shaped = params
+                changed += 1
+    if changed:
+        info( '*** Shaping %d interfaces on %d nodes\n' % (
+            changed, runLines( byNode ) ) )
+    return changed
+
+def setShape( net, node1, node2, shape ):
+    """Change the shape of the links between two nodes ( None removes
+       it ) on the running network.
+       returns: the links changed"""
+    links = net.linksBetween( net[ node1 ], net[ node2 ] )
+    for link in links:
+        for intf in link.intf1, link.intf2:
+            intf.params[ 'shape' ] = shape
+    applyShaping( net )
+    return links
+
+
+def delayMs( value ):
+    "Milliseconds of a tc time such as '10ms' or '1.5s', or 0."
+    match = re.match( r'([\d.]+)\s*(us|ms|s)?$', str( value or '' ) )
+    if not match:
+        return 0
+    scale = { 'us': .001, 'ms': 1, 's': 1000, None: 1 }[ match.group( 2 ) ]
+    return float( match.group( 1 ) ) * scale
+
+
+class LinkFlow( Flow ):
+    "An iperf flow to a given address of the destination."
+
+    def __init__( self, src, dst, addr, *args, **kwargs ):
+        Flow.__init__( self, src, dst, *args, **kwargs )
+        self.addr = addr
+
+    def clientCmd( self ):
+        cmd = Flow.clientCmd( self )
+        cmd[ cmd.index( '-c' ) + 1 ] = self.addr
+        return cmd
+
+
+class LinkProbe( Probe ):
+    "A ping to a given address of the destination."
+
+    def __init__( self, src, dst, addr, *args, **kwargs ):
+        Probe.__init__( self, src, dst, *args, **kwargs )
+        self.addr = addr
+
+    def pingCmd( self ):
+        return Probe.pingCmd( self )[ :-1 ] + [ self.addr ]
+
+
+def measurable( link ):
+    "Can measureLink() measure link: namespaced ends with addresses?"
+    return all( intf.node.inNamespace and intf.IP()
+                for intf in ( link.intf1, link.intf2 ) )
+
+def measureLink( link, seconds=5 ):
+    """Measure a link's TCP rate ( intf1 to intf2 ) and RTT against its
+       shape.  Both ends must be namespaced nodes with addresses on the
+       link ( e.g. the r1-r2 routers ).
+       returns: dict of expected and achieved values"""
+    intf1, intf2 = link.intf1, link.intf2
+    src, dst = intf1.node, intf2.node
+    shape1, shape2 = shapeOf( intf1 ), shapeOf( intf2 )
+    rates = [ s.get( 'bw' ) for s in ( shape1, shape2 ) if s.get( 'bw' ) ]
+    expectedRtt = delayMs( shape1.get( 'delay' ) ) + \
+        delayMs( shape2.get( 'delay' ) )
+    probe = LinkProbe( src, dst, intf2.IP(), rate=5, seconds=seconds )
+    flow = LinkFlow( src, dst, intf2.IP(), 'tcp', seconds )
+    servers = startServers( [ dst ], [ 'tcp' ] )
+    try:
+        probe.start()
+        probe.finish()
+        flow.start()
+        flow.finish()
+    finally:
+        stopServers( servers )
+    rtts = sorted( probe.rtts.values() )
+    result = { 'link': '%s-%s' % ( intf1.name, intf2.name ),
+               'expectedMbps': min( rates ) if rates else None,
+               'mbps': flow.result[ 'bps' ] / 1e6 if flow.result else None,
+               'expectedRttMs': expectedRtt,
+               'rttMs': rtts[ len( rtts ) // 2 ] if rtts else None,
+               'lossPct': probe.asDict()[ 'lossPct' ] }
+    if result[ 'expectedMbps' ] and result[ 'mbps' ]:
+        result[ 'rateRatio' ] = result[ 'mbps' ] / result[ 'expectedMbps' ]
+    return result
@@ -0,0 +1,271 @@
+"""
+startup.py: concurrent, dependency-ordered node configuration
+
+Mininet configures nodes one at a time, and every address, default
+route, sysctl and route is a blocking round-trip into a node's shell, so
+bring-up grows with the node count.  ParallelMininet instead turns the
+configuration into a small dependency graph per node
+
+    links ( created by build ) -> addresses -> routes and sysctls
+
+and hands it to a Scheduler, which keeps one command outstanding on
+every node at once using the non-blocking sendCmd()/monitor() pattern.
+Wall-clock bring-up then follows the longest chain ( two round-trips
+per node ) rather than the number of nodes.
+
+Nodes whose class overrides config() with something we do not know how
+to batch ( anything but Node and LinuxRouter ) still get their own
+config() called, after the concurrent stages.
+
+With batchLinks=True ( the default ) plain veth links are created in
+bulk as well; see ysn/links.py.  Light hosts ( ysn/lighthost.py ) have
+no shell to send commands to: all of them are configured together,
+from the root namespace, before the others.
+"""
+
+import select
+
+from mininet.net import Mininet
+from mininet.node import Node
+from mininet.link import Link
+from mininet.log import info, warn
+
+from ysn.router import LinuxRouter, batchCmd, sysctlCmd, defaultRouteLines
+from ysn.links import BatchLink, flushLinks
+from ysn.lighthost import LightHost, runBatches
+
+
+class Task( object ):
+    "A shell command to run on a node once its dependencies are done."
+
+    def __init__( self, name, node, cmd, deps=() ):
+        self.name = name
+        self.node = node
+        self.cmd = cmd
+        self.deps = set( deps )
+        self.output = ''
+
+    def __repr__( self ):
+        return '<Task %s on %s>' % ( self.name, self.node.name )
+
+
+class Scheduler( object ):
+    """Run tasks on many nodes concurrently: one outstanding command per
+       node, any number of nodes in flight, dependencies respected."""
+
+    def __init__( self ):
+        self.tasks = {}
+
+    def add( self, name, node, cmd, deps=() ):
+        """Add a task; tasks with an empty cmd complete immediately.
+           returns: task name, for use in deps"""
+        if name in self.tasks:
+            raise Exception( 'Duplicate task %s' % name )
+        self.tasks[ name ] = Task( name, node, cmd, deps )
+        return name
+
+    def depth( self ):
+        "Length of the longest dependency chain."
+        memo = {}
+
+        def chain( name ):
+            if name not in memo:
+                deps = self.tasks[ name ].deps
+                memo[ name ] = 1 + max( [ chain( d ) for d in deps ] or [ 0 ] )
+            return memo[ name ]
+
+        return max( [ chain( name ) for name in self.tasks ] or [ 0 ] )
+
+    def run( self ):
+        """Run all tasks.
+           returns: dict of task name -> output"""
+        pending = dict( self.tasks )
+        done = set()
+        running = {}  # fd -> task
+        poller = select.poll()
+        while pending or running:
+            busy = set( task.node for task in running.values() )
+            for name in sorted( pending ):
+                task = pending[ name ]
+                if not task.deps <= done or task.node in busy:
+                    continue
+                del pending[ name ]
+                if not task.cmd:
+                    done.add( name )
+                    continue
+                task.node.sendCmd( task.cmd )
+                fd = task.node.stdout.fileno()
+                running[ fd ] = task
+                poller.register( fd, select.POLLIN )
+                busy.add( task.node )
+            if not running:
+                if pending and any( t.deps <= done for t in pending.values() ):
+                    # Empty tasks completed; go around again
+                    continue
+                if pending:
+                    raise Exception( 'Unsatisfiable dependencies: %s' %
+                                     sorted( pending ) )
+                break
+            for fd, _event in poller.poll():
+                task = running[ fd ]
+                task.output += task.node.monitor( timeoutms=0 )
+                if not task.node.waiting:
+                    poller.unregister( fd )
+                    del running[ fd ]
+                    done.add( task.name )
+        return dict( ( name, task.output )
+                     for name, task in self.tasks.items() )
+
+
+def addrLines( node, addrs ):
+    """Return the ip -batch lines that set addresses and bring up
+       interfaces.
+       addrs: list of ( intf name, 'ip/len' or None, mac or None )"""
+    lines = []
+    for intf, addr, mac in addrs:
+        if mac:
+            lines.append( 'link set %s address %s' % ( intf, mac ) )
+        if addr:
+            lines += [ 'addr flush dev %s' % intf,
+                       'addr add %s dev %s' % ( addr, intf ) ]
+        lines.append( 'link set %s up' % intf )
+    if node.inNamespace:
+        lines.append( 'link set lo up' )
+    return lines
+
+def addrCmd( node, addrs ):
+    "Return one ip -batch command for addrLines( node, addrs )."
+    return batchCmd( addrLines( node, addrs ) )
+
+
+class ParallelMininet( Mininet ):
+    "Mininet that configures all nodes concurrently."
+
+    def __init__( self, *args, **kwargs ):
+        """batchLinks: create plain veth links in one ip -batch ( True )
+           other arguments are passed to Mininet"""
+        self.pendingAddrs = {}
+        self.batchLinks = kwargs.pop( 'batchLinks', True )
+        self.linkBatch = []  # veth pairs BatchLink defers to configHosts()
+        Mininet.__init__( self, *args, **kwargs )
+
+    def addLink( self, node1, node2, port1=None, port2=None,
+                 cls=None, **params ):
+        "Add a link, deferring interface addressing to configHosts()."
+        if self.built:
+            return Mininet.addLink( self, node1, node2, port1, port2,
+                                    cls, **params )
+        addrs = []
+        for key in 'params1', 'params2':
+            intfParams = dict( params.get( key ) or {} )
+            addrs.append( intfParams.pop( 'ip', None ) )
+            # Skip Intf.config()'s per-interface ifconfig up as well
+            intfParams.setdefault( 'up', None )
+            params[ key ] = intfParams
+        if self.batchLinks and ( cls or self.link ) is Link:
+            cls = BatchLink
+            params[ 'batch' ] = self.linkBatch
+        link = Mininet.addLink( self, node1, node2, port1, port2,
+                                cls, **params )
+        for intf, addr in zip( ( link.intf1, link.intf2 ), addrs ):
+            self.pendingAddrs.setdefault( intf.node, [] ).append(
+                ( intf, addr ) )
+        return link
+
+    def nodeAddrs( self, node ):
+        """Return [ ( intf name, 'ip/len', mac ) ] for node's interfaces
+           and record the addresses on the Intf objects."""
+        addrs = dict( self.pendingAddrs.pop( node, [] ) )
+        macs = {}
+        if node in self.hosts and node.intfs:
+            # Node.config() semantics: node ip/mac go on the default intf
+            intf = node.defaultIntf()
+            ip, mac = node.params.get( 'ip' ), node.params.get( 'mac' )
+            if ip:
+                addrs[ intf ] = ip if '/' in ip else ip + '/8'
+            if mac:
+                macs[ intf ] = intf.mac = mac
+                addrs.setdefault( intf, None )
+        result = []
+        for intf, addr in sorted( addrs.items(), key=lambda i: i[ 0 ].name ):
+            if addr:
+                intf.ip, intf.prefixLen = addr.split( '/' )
+            result.append( ( intf.name, addr, macs.get( intf ) ) )
+        return result
+
+    def routeCmd( self, node ):
+        "Return the command that installs node's routes and sysctls."
+        params = node.params
+        cmds = []
+        cmds.append( batchCmd( defaultRouteLines(
+            params.get( 'defaultRoute' ) ) ) )
+        if isinstance( node, LinuxRouter ):
+            cmds.append( node.configCmd( params.get( 'routes' ),
+                                         params.get( 'sysctls' ) ) )
+        elif params.get( 'sysctls' ):
+            # Plain hosts may carry sysctls too ( e.g. a dual-homed host )
+            cmds.append( sysctlCmd( params[ 'sysctls' ] ) )
+        return '; '.join( c for c in cmds if c )
+
+    def configHosts( self ):
+        "Configure all hosts concurrently, addresses before routes."
+        created = flushLinks( self.linkBatch )
+        if created:
+            info( '*** Created %d links in bulk\n' % created )
+        self.configNodes( self.hosts + [ n for n in self.switches
+                                         if n in self.pendingAddrs ] )
+
+    def configNodes( self, nodes, first='' ):
+        """Configure nodes concurrently, addresses before routes.
+           first: command to run before the addresses in namespaced
+                  nodes"""
+        scheduler = Scheduler()
+        serial = []
+        light = [ node for node in nodes if isinstance( node, LightHost ) ]
+        self.configLight( light )
+        light = set( light )
+        for node in nodes:
+            if node in light:
+                continue
+            cmd = addrCmd( node, self.nodeAddrs( node ) )
+            if first and node.inNamespace:
+                cmd = '%s; %s' % ( first, cmd ) if cmd else first
+            addr = scheduler.add( 'addr:' + node.name, node, cmd )
+            if node not in self.hosts:
+                continue
+            if type( node ).config not in ( Node.config, LinuxRouter.config ):
+                serial.append( node )
+                continue
+            scheduler.add( 'route:' + node.name, node, self.routeCmd( node ),
+                           deps=[ addr ] )
+        info( '*** Configuring %d nodes concurrently ( %d stages )\n' %
+              ( len( nodes ) - len( light ), scheduler.depth() ) )
+        for name, output in sorted( scheduler.run().items() ):
+            if output.strip():
+                warn( '*** %s: %s\n' % ( name, output.strip() ) )
+        for node in serial:
+            node.configDefault()
+
+    def configLight( self, nodes ):
+        """Configure light hosts from the root namespace, all with one
+           shell: no shell of theirs gets started."""
+        batches, serial = [], set()
+        for node in nodes:
+            lines = addrLines( node, self.nodeAddrs( node ) )
+            if type( node ).config != LightHost.config:
+                serial.add( node )
+            else:
+                lines += defaultRouteLines( node.params.get( 'defaultRoute' ) )
+            batches.append( ( node.netns, lines ) )
+        if batches:
+            info( '*** Configuring %d light hosts in bulk\n' % len( batches ) )
+        output = runBatches( batches )
+        if output.strip():
+            warn( '*** Light hosts: %s\n' % output.strip() )
+        for node in nodes:
+            if node in serial:
+                node.configDefault()
+            elif node.params.get( 'sysctls' ):
+                output = node.cmd( sysctlCmd( node.params[ 'sysctls' ] ) )
+                if output.strip():
+                    warn( '*** %s: %s\n' % ( node.name, output.strip() ) )
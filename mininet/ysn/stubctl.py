@@ -0,0 +1,228 @@
+#!/usr/bin/python
+
+"""
+stubctl.py: a small OpenFlow 1.0 learning-switch controller
+
+A stand-in for Maple ( or any reactive controller ) where the real one
+is not installed, e.g. to try ysn/ctlpool.py or ysn/assign.py:
+
+    python ysn/stubctl.py --port 6634 --delay 5
+
+It greets each switch ( HELLO, FEATURES_REQUEST ), answers echoes, and
+handles packet-ins like a learning switch: it learns the source MAC's
+port, installs a flow for a known destination ( idle timeout --idle )
+and floods otherwise.  --delay holds every packet-in for that many ms,
+to stand in for a slow controller.
+
+SIGHUP resets it without a restart: learned MACs and counters are
+dropped and every connected switch's flows are deleted.  Each switch
+connection, reset and ( every --report seconds ) the packet-in count
+goes to stdout.
+"""
+
+import select
+import signal
+import socket
+import struct
+import sys
+from argparse import ArgumentParser
+from time import sleep, time
+
+VERSION = 1
+HEADER = struct.Struct( '!BBHI' )
+( HELLO, ERROR, ECHO_REQUEST, ECHO_REPLY, FEATURES_REQUEST,
+  FEATURES_REPLY ) = 0, 1, 2, 3, 5, 6
+PACKET_IN, PACKET_OUT, FLOW_MOD = 10, 13, 14
+FLOOD, NONE = 0xfffb, 0xffff
+NO_BUFFER = 0xffffffff
+# ofp_match wildcards: everything but the destination MAC
+WILDCARDS = ( ( 1 << 22 ) - 1 ) & ~( 1 << 3 )
+
+
+def message( kind, body=b'', xid=0 ):
+    "An OpenFlow 1.0 message."
+    return HEADER.pack( VERSION, kind, HEADER.size + len( body ),
+                        xid ) + body
+
+def output( port ):
+    "An output action."
+    return struct.pack( '!HHHH', 0, 8, port, 0xffff )
+
+def flowMod( dst, port, bufferId, idle, command=0 ):
+    "Add ( or with command 3, delete ) a flow to dst MAC out of port."
+    match = struct.pack( '!IH6s6sHBxHBBxxIIHH', WILDCARDS if dst else
+                         ( 1 << 22 ) - 1, 0, b'\0' * 6, dst or b'\0' * 6,
+                         0, 0, 0, 0, 0, 0, 0, 0, 0 )
+    return message( FLOW_MOD, match + struct.pack(
+        '!QHHHHIHH', 0, command, idle, 0, 100, bufferId,
+        NONE if command else port, 0 ) + ( output( port ) if port else b'' ) )
+
+def packetOut( bufferId, inPort, port, data ):
+    "Send a packet ( buffered, or data ) out of port."
+    actions = output( port )
+    return message( PACKET_OUT, struct.pack(
+        '!IHH', bufferId, inPort, len( actions ) ) + actions +
+        ( data if bufferId == NO_BUFFER else b'' ) )
+
+
+class Connection( object ):
+    "One switch's connection."
+
+    def __init__( self, sock, addr ):
+        self.sock, self.addr = sock, addr
+        self.buf = b''
+        self.dpid = None
+        self.macs = {}  # MAC -> port
+
+    def send( self, data ):
+        "Send, ignoring a connection that went away."
+        try:
+            self.sock.sendall( data )
+        except socket.error:
+            pass
+
+    def messages( self, data ):
+        "Complete messages ( kind, xid, body ) received so far."
+        self.buf += data
+        while len( self.buf ) >= HEADER.size:
+            _version, kind, length, xid = HEADER.unpack_from( self.buf )
+            if length < HEADER.size or len( self.buf ) < length:
+                break
+            body = self.buf[ HEADER.size:length ]
+            self.buf = self.buf[ length: ]
+            yield kind, xid, body
+
+
+class StubController( object ):
+    "Accept switches and run a learning switch on each."
+
+    def __init__( self, port, delay=0, idle=60, report=10 ):
+        self.listener = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+        self.listener.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR,
+                                  1 )
+        self.listener.bind( ( '0.0.0.0', port ) )
+        self.listener.listen( 64 )
+        self.port = port
+        self.delay = delay / 1000.0
+        self.idle = idle
+        self.report = report
+        self.conns = {}  # socket -> Connection
+        self.packetIns = 0
+        self.resetPending = False
+
+    def log( self, text ):
+        "One line to stdout."
+        sys.stdout.write( '%.3f %s\n' % ( time(), text ) )
+        sys.stdout.flush()
+
+    def reset( self ):
+        "Forget learned MACs and counters and clear the switches' flows."
+        for conn in self.conns.values():
+            conn.macs = {}
+            conn.send( flowMod( None, 0, NO_BUFFER, 0, command=3 ) )
+        self.packetIns = 0
+        self.log( 'reset %d switches' % len( self.conns ) )
+
+    def handle( self, conn, kind, xid, body ):
+        "Answer one message from a switch."
+        if kind == ECHO_REQUEST:
+            conn.send( message( ECHO_REPLY, body, xid ) )
+        elif kind == FEATURES_REPLY:
+            conn.dpid = '%016x' % struct.unpack( '!Q', body[ :8 ] )[ 0 ]
+            self.log( 'switch %s connected from %s:%d' % (
+                ( conn.dpid, ) + conn.addr ) )
+        elif kind == PACKET_IN:
+            self.packetIn( conn, body )
+        elif kind == ERROR:
+            self.log( 'error from %s: %r' % ( conn.dpid, body[ :4 ] ) )
+
+    def packetIn( self, conn, body ):
+        "Learn the source, then forward or flood."
+        self.packetIns += 1
+        if self.delay:
+            sleep( self.delay )
+        bufferId, _total, inPort, _reason = struct.unpack(
+            '!IHHBx', body[ :10 ] )
+        data = body[ 10: ]
+        if len( data ) < 12:
+            return
+        dst, src = data[ :6 ], data[ 6:12 ]
+        conn.macs[ src ] = inPort
+        port = conn.macs.get( dst )
+        if port is not None and port != inPort:
+            conn.send( flowMod( dst, port, bufferId, self.idle ) )
+            if bufferId == NO_BUFFER:
+                conn.send( packetOut( bufferId, inPort, port, data ) )
+        else:
+            conn.send( packetOut( bufferId, inPort, FLOOD, data ) )
+
+    def close( self, sock ):
+        "Drop a switch's connection."
+        conn = self.conns.pop( sock )
+        sock.close()
+        # Readiness probes ( see ysn/ctlpool.py ) never say who they are
+        if conn.dpid:
+            self.log( 'switch %s disconnected' % conn.dpid )
+
+    def serve( self ):
+        "Serve switches until killed."
+        self.log( 'listening on port %d' % self.port )
+        lastReport = time()
+        while True:
+            try:
+                readable = select.select(
+                    [ self.listener ] + list( self.conns ), [], [], 1 )[ 0 ]
+            except ( select.error, OSError ):
+                # Interrupted by SIGHUP
+                readable = []
+            if self.resetPending:
+                self.resetPending = False
+                self.reset()
+            for sock in readable:
+                if sock is self.listener:
+                    client, addr = self.listener.accept()
+                    client.setsockopt( socket.IPPROTO_TCP,
+                                       socket.TCP_NODELAY, 1 )
+                    conn = self.conns[ client ] = Connection( client, addr )
+                    conn.send( message( HELLO ) +
+                               message( FEATURES_REQUEST, xid=1 ) )
+                    continue
+                try:
+                    data = sock.recv( 65536 )
+                except socket.error:
+                    data = b''
+                if not data:
+                    self.close( sock )
+                    continue
+                conn = self.conns[ sock ]
+                for kind, xid, body in list( conn.messages( data ) ):
+                    self.handle( conn, kind, xid, body )
+            if self.report and time() - lastReport >= self.report:
+                lastReport = time()
+                self.log( '%d switches, %d packet-ins' % (
+                    len( self.conns ), self.packetIns ) )
+
+
+def run():
+    "Run the stub controller"
+    parser = ArgumentParser( description='Stub OpenFlow 1.0 controller' )
+    parser.add_argument( '--port', type=int, default=6653 )
+    parser.add_argument( '--delay', type=float, default=0,
+                         help='ms to hold each packet-in' )
+    parser.add_argument( '--idle', type=int, default=60,
+                         help='idle timeout of installed flows' )
+    parser.add_argument( '--report', type=float, default=10,
+                         help='seconds between packet-in counts' )
+    args = parser.parse_args()
+    controller = StubController( args.port, args.delay, args.idle,
+                                 args.report )
+
+    def hangup( _signum, _frame ):
+        "Reset at the next chance."
+        controller.resetPending = True
+
+    signal.signal( signal.SIGHUP, hangup )
+    controller.serve()
+
+if __name__ == '__main__':
+    run()
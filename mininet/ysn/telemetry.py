@@ -0,0 +1,442 @@
+"""
+telemetry.py: streaming counters from switches, routers and hosts
+
+Reading counters with node.cmd() costs a shell round-trip per counter
+and node, which at sub-second intervals disturbs the very forwarding
+numbers being measured.  A Telemetry collector instead reads, every
+interval,
+
+    /proc/<pid>/net/dev  all interface counters of a namespace at once,
+                         <pid> being any process in it: one thread reads
+                         every namespace's from the root namespace, and
+                         nothing runs in the namespaces for it ( the root
+                         namespace's has every OVS switch port )
+    tc -s qdisc show     qdisc counters and backlogs, from a loop in
+                         each namespace with shaped links ( see
+                         ysn/shaping.py ) and only there
+    ovs-ofctl dump-flows per-flow packet and byte counts of each OVS
+                         switch, from the same loop in the root namespace
+
+The loops print a block per interval, read asynchronously by a second
+thread ( pmonitor ) and parsed into samples.  Samples are ( time, series,
+value ), a series being ( node, kind, name, field ), e.g.
+( 'r1', 'intf', 'r1-eth2', 'tx_bytes' ) or ( 's1', 'flow',
+'priority=100,dl_dst=...', 'n_bytes' ), and go to
+
+    Ring     a fixed-size buffer of three preallocated arrays ( times,
+             series ids, values ) that keeps the latest capacity
+             samples for queries such as rate()
+    sinks    CsvSink, JsonlSink or ColumnSink ( one raw array file per
+             column, readable with numpy.fromfile ), written as each
+             block arrives, so a killed run keeps what it sampled
+
+    telemetry = Telemetry( net, interval=.2, sinks=[ CsvSink( 't.csv' ) ] )
+    telemetry.start(); CLI( net ); telemetry.stop()
+    telemetry.ring.rate( ( 'r1', 'intf', 'r1-eth2', 'tx_bytes' ) )
+"""
+
+import csv
+import json
+import os
+import re
+from array import array
+from subprocess import Popen, PIPE, STDOUT
+from threading import Thread, Lock, Event
+from time import sleep, time
+
+from mininet.link import TCIntf
+from mininet.log import info, warn
+from mininet.node import OVSSwitch
+from mininet.util import pmonitor
+
+from ysn.lighthost import netnsId
+from ysn.shaping import shapeOf
+
+# Marks the start of a block; the epoch time follows
+MARK = '@@tick'
+
+# /proc/net/dev columns kept, by position after the interface name
+INTF_FIELDS = { 'rx_bytes': 0, 'rx_packets': 1, 'rx_drop': 3,
+                'tx_bytes': 8, 'tx_packets': 9, 'tx_drop': 11 }
+
+QDISC = re.compile( r'^qdisc (\S+) (\S+) dev (\S+)' )
+QDISC_SENT = re.compile( r'Sent (\d+) bytes (\d+) pkt \(dropped (\d+), '
+                         r'overlimits (\d+)' )
+QDISC_BACKLOG = re.compile( r'backlog (\d+)([KMG]?)b (\d+)p' )
+FLOW_STATS = re.compile( r'\b(n_packets|n_bytes)=(\d+)' )
+FLOW_VOLATILE = re.compile(
+    r'\b(cookie|duration|n_packets|n_bytes|idle_age|hard_age)=[^,\s]*,?\s*' )
+SCALE = { '': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3 }
+
+
+def loopCmd( interval, qdiscs=True, bridges=() ):
+    "Shell loop that prints one block of qdisc and flow counters per interval."
+    reads = []
+    if qdiscs:
+        reads.append( "echo '%s qdisc'; tc -s qdisc show" % MARK )
+    for bridge in bridges:
+        reads.append( "echo '%s flows %s'; ovs-ofctl dump-flows %s" % (
+            MARK, bridge, bridge ) )
+    return ( 'while :; do echo "%s $(date +%%s.%%N)"; %s; sleep %g; '
+             'done' % ( MARK, '; '.join( reads ), interval ) )
+
+def shaped( node ):
+    "Has node interfaces with qdiscs worth sampling?"
+    return any( shapeOf( intf ) or isinstance( intf, TCIntf )
+                for intf in node.intfList() )
+
+def parseDev( lines ):
+    "( intf, field, value ) of /proc/net/dev lines."
+    for line in lines:
+        name, sep, counts = line.partition( ':' )
+        name, counts = name.strip(), counts.split()
+        if not sep or name == 'lo' or len( counts ) < 12 or \
+                not counts[ 0 ].isdigit():
+            continue
+        for field, i in INTF_FIELDS.items():
+            yield name, field, int( counts[ i ] )
+
+def parseQdiscs( lines ):
+    "( dev:handle, field, value ) of tc -s qdisc show lines."
+    name = None
+    for line in lines:
+        qdisc = QDISC.match( line )
+        if qdisc:
+            name = '%s:%s' % ( qdisc.group( 3 ), qdisc.group( 2 ) )
+            continue
+        sent = QDISC_SENT.search( line )
+        if sent and name:
+            for field, value in zip( ( 'bytes', 'packets', 'drops',
+                                       'overlimits' ), sent.groups() ):
+                yield name, field, int( value )
+        backlog = QDISC_BACKLOG.search( line )
+        if backlog and name:
+            yield name, 'backlog_bytes', int( backlog.group( 1 ) ) * \
+                SCALE[ backlog.group( 2 ) ]
+            yield name, 'backlog_packets', int( backlog.group( 3 ) )
+
+def parseFlowStats( lines ):
+    "( flow, field, value ) of ovs-ofctl dump-flows lines."
+    for line in lines:
+        if 'actions=' not in line:
+            continue
+        # The flow is what stays the same between dumps
+        flow = FLOW_VOLATILE.sub( '', line.strip() )
+        for field, value in FLOW_STATS.findall( line ):
+            yield flow, field, int( value )
+
+
+class Ring( object ):
+    "Fixed-size buffer of ( time, series id, value ) samples in arrays."
+
+    def __init__( self, capacity=1 << 20 ):
+        self.capacity = capacity
+        self.times = array( 'd', [ 0.0 ] ) * capacity
+        self.ids = array( 'I', [ 0 ] ) * capacity
+        self.values = array( 'd', [ 0.0 ] ) * capacity
+        self.count = 0  # samples ever appended
+        self.keys = []  # series id -> key
+        self.index = {}  # key -> series id
+        self.lock = Lock()
+
+    def seriesId( self, key ):
+        "Id of a series key, added if new."
+        sid = self.index.get( key )
+        if sid is None:
+            sid = self.index[ key ] = len( self.keys )
+            self.keys.append( key )
+        return sid
+
+    def extend( self, samples ):
+        "Append ( time, series id, value ) samples, oldest ones go."
+        with self.lock:
+            for t, sid, value in samples:
+                i = self.count % self.capacity
+                self.times[ i ], self.ids[ i ], self.values[ i ] = \
+                    t, sid, value
+                self.count += 1
+
+    def __len__( self ):
+        return min( self.count, self.capacity )
+
+    def samples( self, key=None, since=None ):
+        "( time, key, value ) kept, oldest first, of one series or all."
+        sid = self.index.get( key ) if key is not None else None
+        if key is not None and sid is None:
+            return []
+        with self.lock:
+            start = max( 0, self.count - self.capacity )
+            rows = []
+            for n in range( start, self.count ):
+                i = n % self.capacity
+                if ( sid is None or self.ids[ i ] == sid ) and (
+                        since is None or self.times[ i ] >= since ):
+                    rows.append( ( self.times[ i ], self.ids[ i ],
+                                   self.values[ i ] ) )
+        return [ ( t, self.keys[ s ], v ) for t, s, v in rows ]
+
+    def latest( self, key ):
+        "Latest ( time, value ) of a series, or None."
+        rows = self.samples( key )
+        return ( rows[ -1 ][ 0 ], rows[ -1 ][ 2 ] ) if rows else None
+
+    def rate( self, key, seconds=None ):
+        "Per-second change of a counter over the last seconds ( or all )."
+        rows = self.samples( key )
+        if seconds and rows:
+            rows = [ r for r in rows if r[ 0 ] >= rows[ -1 ][ 0 ] - seconds ]
+        if len( rows ) < 2 or rows[ -1 ][ 0 ] == rows[ 0 ][ 0 ]:
+            return None
+        return ( rows[ -1 ][ 2 ] - rows[ 0 ][ 2 ] ) / (
+            rows[ -1 ][ 0 ] - rows[ 0 ][ 0 ] )
+
+
+class CsvSink( object ):
+    "Samples as CSV rows: t, node, kind, name, field, value."
+
+    def __init__( self, path ):
+        self.file = open( path, 'w' )
+        self.writer = csv.writer( self.file )
+        self.writer.writerow( [ 't', 'node', 'kind', 'name', 'field',
+                                'value' ] )
+
+    def write( self, t, node, samples ):
+        "One block: ( kind, name, field, value ) samples of node at t."
+        for kind, name, field, value in samples:
+            self.writer.writerow( [ '%.6f' % t, node, kind, name, field,
+                                    value ] )
+        self.file.flush()
+
+    def close( self ):
+        self.file.close()
+
+
+class JsonlSink( object ):
+    "One JSON line per block: t, node and [ kind, name, field, value ]s."
+
+    def __init__( self, path ):
+        self.file = open( path, 'w' )
+
+    def write( self, t, node, samples ):
+        "One block: ( kind, name, field, value ) samples of node at t."
+        self.file.write( json.dumps( { 't': round( t, 6 ), 'node': node,
+                                       'samples': samples } ) + '\n' )
+        self.file.flush()
+
+    def close( self ):
+        self.file.close()
+
+
+class ColumnSink( object ):
+    """Columns in a directory: t.f64, series.u32 and value.f64 ( raw
+       native-endian arrays ) and series.json ( series id -> [ node,
+       kind, name, field ] )."""
+
+    def __init__( self, path ):
+        if not os.path.isdir( path ):
+            os.makedirs( path )
+        self.path = path
+        self.files = dict( ( name, open( os.path.join( path, name ), 'wb' ) )
+                           for name in ( 't.f64', 'series.u32',
+                                         'value.f64' ) )
+        self.keys = []
+        self.index = {}
+
+    def write( self, t, node, samples ):
+        "One block: ( kind, name, field, value ) samples of node at t."
+        ids, new = array( 'I' ), False
+        for kind, name, field, _value in samples:
+            key = ( node, kind, name, field )
+            if key not in self.index:
+                self.index[ key ] = len( self.keys )
+                self.keys.append( key )
+                new = True
+            ids.append( self.index[ key ] )
+        array( 'd', [ t ] * len( samples ) ).tofile( self.files[ 't.f64' ] )
+        ids.tofile( self.files[ 'series.u32' ] )
+        array( 'd', [ float( s[ 3 ] ) for s in samples ] ).tofile(
+            self.files[ 'value.f64' ] )
+        for f in self.files.values():
+            f.flush()
+        if new:
+            with open( os.path.join( self.path, 'series.json' ), 'w' ) as f:
+                json.dump( self.keys, f )
+
+    def close( self ):
+        for f in self.files.values():
+            f.close()
+
+
+class Telemetry( object ):
+    "Sample every namespace's counters into a Ring and sinks."
+
+    def __init__( self, net, interval=.5, capacity=1 << 20, flows=True,
+                  qdiscs=True, sinks=() ):
+        """net: running Mininet
+           interval: seconds between samples
+           capacity: samples the ring keeps
+           flows: sample OVS flow counters
+           qdiscs: sample the qdisc counters of nodes with shaped links
+           sinks: CsvSink, JsonlSink or ColumnSink objects"""
+        self.net = net
+        self.interval = interval
+        self.flows = flows
+        self.qdiscs = qdiscs
+        self.sinks = list( sinks )
+        self.ring = Ring( capacity )
+        self.switches = set( s.name for s in net.switches )
+        self.devs = {}  # namespace -> its /proc/<pid>/net/dev
+        self.popens = {}  # namespace -> qdisc and flow loop
+        self.holders = []
+        self.threads = []
+        self.stopping = Event()
+        self.lock = Lock()
+        self.blocks = 0
+
+    def start( self ):
+        """Find every namespace's interface counters, and start the qdisc
+           and flow loops and the threads that read them."""
+        self.devs[ 'root' ] = '/proc/net/dev'
+        rootShaped = False
+        for node in self.net.hosts + self.net.switches:
+            if not node.inNamespace:
+                rootShaped = rootShaped or shaped( node )
+                continue
+            self.devs[ node.name ] = '/proc/%d/net/dev' % self.nodePid( node )
+            if self.qdiscs and shaped( node ):
+                self.popens[ node.name ] = node.popen(
+                    [ 'sh', '-c', loopCmd( self.interval ) ],
+                    stdout=PIPE, stderr=STDOUT )
+        bridges = [ s.name for s in self.net.switches
+                    if isinstance( s, OVSSwitch ) ] if self.flows else []
+        if bridges or self.qdiscs and rootShaped:
+            # Root-namespace qdiscs and flows in one loop
+            self.popens[ 'root' ] = Popen(
+                [ 'sh', '-c', loopCmd( self.interval,
+                                       self.qdiscs and rootShaped,
+                                       bridges ) ],
+                stdout=PIPE, stderr=STDOUT )
+        info( '*** Sampling %d namespaces every %gs, %d loops\n' % (
+            len( self.devs ), self.interval, len( self.popens ) ) )
+        self.threads = [ Thread( target=self.sampleDevs ) ]
+        if self.popens:
+            self.threads.append( Thread( target=self.loop ) )
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def nodePid( self, node ):
+        "Pid of a process in node's namespace, started if need be."
+        if node.shell:
+            return node.shell.pid
+        # A light host ( ysn/lighthost.py ) without a shell: hold a
+        # process there, which costs nothing per interval
+        holder = node.popen( [ 'sleep', 'infinity' ] )
+        self.holders.append( holder )
+        netns = 'net:[%d]' % netnsId( node )
+        while os.readlink( '/proc/%d/ns/net' % holder.pid ) != netns:
+            if holder.poll() is not None:
+                raise Exception( 'Cannot hold a process in %s' % node )
+            sleep( .01 )
+        return holder.pid
+
+    def stop( self ):
+        "Stop the loops and the readers, and close the sinks."
+        self.stopping.set()
+        for popen in list( self.popens.values() ) + self.holders:
+            popen.terminate()
+        for thread in self.threads:
+            thread.join()
+        for popen in list( self.popens.values() ) + self.holders:
+            popen.wait()
+        for sink in self.sinks:
+            sink.close()
+        info( '*** Sampled %d blocks, %d samples of %d series\n' % (
+            self.blocks, self.ring.count, len( self.ring.keys ) ) )
+
+    def owner( self, name, intf ):
+        "Node of an interface ( or qdisc ) sampled in namespace name."
+        if name != 'root':
+            return name
+        # Switch ports are named after their switch
+        node = intf.split( '-' )[ 0 ]
+        return node if node in self.switches else 'root'
+
+    def sampleDevs( self ):
+        "Read every namespace's interface counters each interval."
+        due = time()
+        while not self.stopping.is_set():
+            for name, path in sorted( self.devs.items() ):
+                t = time()
+                try:
+                    with open( path ) as f:
+                        lines = f.read().splitlines()
+                except ( IOError, OSError ):
+                    # Its process is gone: the node was stopped
+                    continue
+                byNode = {}
+                for intf, field, value in parseDev( lines ):
+                    byNode.setdefault( self.owner( name, intf ), [] ).append(
+                        ( 'intf', intf, field, value ) )
+                self.record( t, byNode )
+            self.countBlock()
+            due += self.interval
+            self.stopping.wait( max( 0, due - time() ) )
+
+    def loop( self ):
+        "Collect each loop's lines into blocks until the loops exit."
+        blocks = {}  # name -> ( time, lines ) being read
+        for name, line in pmonitor( dict( self.popens ), timeoutms=1000 ):
+            if name is None:
+                continue
+            if line.startswith( MARK + ' ' ) and \
+                    line.split()[ 1 ].replace( '.', '' ).isdigit():
+                if name in blocks:
+                    self.block( name, *blocks[ name ] )
+                blocks[ name ] = ( float( line.split()[ 1 ] ), [] )
+            elif name in blocks:
+                blocks[ name ][ 1 ].append( line.rstrip( '\n' ) )
+        # The loops are gone: store what their last blocks got
+        for name, ( t, lines ) in sorted( blocks.items() ):
+            if lines:
+                self.block( name, t, lines )
+
+    def block( self, name, t, lines ):
+        "Parse one block of a loop's qdisc and flow counters and store it."
+        sections, current = {}, None
+        for line in lines:
+            if line.startswith( MARK + ' ' ):
+                current = line[ len( MARK ) + 1: ].strip()
+                sections[ current ] = []
+            elif current:
+                sections[ current ].append( line )
+        byNode = {}
+        for qdisc, field, value in parseQdiscs( sections.get( 'qdisc', [] ) ):
+            byNode.setdefault( self.owner( name, qdisc ), [] ).append(
+                ( 'qdisc', qdisc, field, value ) )
+        for section, text in sections.items():
+            if section.startswith( 'flows ' ):
+                bridge = section.split()[ 1 ]
+                byNode.setdefault( bridge, [] ).extend(
+                    ( 'flow', flow, field, value )
+                    for flow, field, value in parseFlowStats( text ) )
+        self.record( t, byNode )
+        self.countBlock()
+
+    def countBlock( self ):
+        "Count a block; both reader threads do."
+        with self.lock:
+            self.blocks += 1
+
+    def record( self, t, byNode ):
+        "Store { node: [ ( kind, name, field, value ) ] } sampled at t."
+        with self.lock:
+            for node, samples in sorted( byNode.items() ):
+                self.ring.extend( ( t, self.ring.seriesId(
+                    ( node, kind, name, field ) ), value )
+                    for kind, name, field, value in samples )
+                for sink in self.sinks:
+                    try:
+                        sink.write( t, node, samples )
+                    except ( IOError, OSError ) as e:
+                        warn( '*** Telemetry sink: %s\n' % e )
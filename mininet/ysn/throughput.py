@@ -0,0 +1,164 @@
+"""
+throughput.py: concurrent iperf flows between host pairs
+
+net.iperf() measures one pair at a time and blocks in each node's shell.
+Here every destination gets one TCP and one UDP iperf server, and each
+flow is a separate iperf client process started with popen(), so any
+number of flows ( up to a concurrency limit ) run at once, including
+several from the same host.  Clients report in CSV ( iperf -y C ), which
+for UDP includes the server's view: received rate, jitter and loss.
+"""
+
+from time import sleep, time
+
+from mininet.log import warn
+
+from ysn.bench import runWaves
+
+PORT = 5001
+
+
+class Flow( object ):
+    "One iperf flow and, once run, its result."
+
+    def __init__( self, src, dst, proto='tcp', seconds=5, bw='10M',
+                  port=PORT, pathClass=None ):
+        """src, dst: hosts
+           proto: 'tcp' or 'udp'
+           seconds: duration
+           bw: UDP target rate ( iperf -b )
+           pathClass: label for reporting"""
+        self.src, self.dst = src, dst
+        self.proto = proto
+        self.seconds = seconds
+        self.bw = bw
+        self.port = port
+        self.pathClass = pathClass
+        self.proc = None
+        self.result = None
+
+    def clientCmd( self ):
+        "iperf client command line."
+        cmd = [ 'iperf', '-y', 'C', '-c', self.dst.IP(), '-p', str( self.port ),
+                '-t', str( self.seconds ) ]
+        if self.proto == 'udp':
+            cmd += [ '-u', '-b', str( self.bw ) ]
+        return cmd
+
+    def start( self ):
+        "Start the client."
+        self.proc = self.src.popen( self.clientCmd() )
+
+    def finish( self ):
+        "Wait for the client and parse its report."
+        out, _err = self.proc.communicate()
+        if not isinstance( out, str ):
+            out = out.decode( 'utf-8', 'replace' )
+        self.result = parseReport( out, self.proto )
+        if self.result is None:
+            warn( '*** No iperf report for %s -> %s: %s\n' %
+                  ( self.src, self.dst, out.strip() ) )
+        return self.result
+
+    def asDict( self ):
+        "Flow description and result as a flat dict."
+        d = { 'src': self.src.name, 'dst': self.dst.name,
+              'srcIp': self.src.IP(), 'dstIp': self.dst.IP(),
+              'proto': self.proto, 'seconds': self.seconds,
+              'path': self.pathClass, 'ok': self.result is not None }
+        d.update( self.result or {} )
+        return d
+
+
+def parseReport( text, proto='tcp' ):
+    """Parse iperf -y C client output.
+       returns: dict with bytes and bps ( and for UDP jitter, lost,
+                total, lossPct, as reported by the server ), or None"""
+    rows = [ line.split( ',' ) for line in text.splitlines()
+             if line.count( ',' ) >= 8 ]
+    if not rows:
+        return None
+    if proto == 'udp':
+        # The server report has the extra loss columns
+        reports = [ r for r in rows if len( r ) >= 14 ]
+        if not reports:
+            return None
+        r = reports[ -1 ]
+        return { 'bytes': int( r[ 7 ] ), 'bps': float( r[ 8 ] ),
+                 'jitterMs': float( r[ 9 ] ), 'lost': int( r[ 10 ] ),
+                 'total': int( r[ 11 ] ), 'lossPct': float( r[ 12 ] ) }
+    r = rows[ -1 ]
+    return { 'bytes': int( r[ 7 ] ), 'bps': float( r[ 8 ] ) }
+
+
+def waitListening( node, port, proto, timeout=5 ):
+    "Wait until node has an iperf server bound to port."
+    flag = '-lnu' if proto == 'udp' else '-lnt'
+    deadline = time() + timeout
+    while ':%d ' % port not in node.cmd( 'ss %s' % flag ):
+        if time() > deadline:
+            warn( '*** %s: no %s server on port %d\n' % ( node, proto, port ) )
+            return False
+        sleep( .1 )
+    return True
+
+def startServers( hosts, protos, port=PORT ):
+    """Start one iperf server per host and protocol.
+       returns: list of server processes"""
+    servers = []
+    for host in hosts:
+        for proto in protos:
+            cmd = [ 'iperf', '-s', '-p', str( port ) ]
+            if proto == 'udp':
+                cmd.append( '-u' )
+            servers.append( host.popen( cmd ) )
+    for host in hosts:
+        for proto in protos:
+            waitListening( host, port, proto )
+    return servers
+
+def stopServers( servers ):
+    "Stop the servers started by startServers()."
+    for server in servers:
+        server.terminate()
+        server.wait()
+
+def runFlows( flows, concurrency=None ):
+    """Run flows, at most concurrency at a time ( default: all at once ).
+       returns: list of ( flows, seconds ) per wave"""
+    servers = startServers(
+        sorted( set( f.dst for f in flows ), key=lambda h: h.name ),
+        sorted( set( f.proto for f in flows ) ) )
+    try:
+        return runWaves( flows, concurrency )
+    finally:
+        stopServers( servers )
+
+
+def aggregate( waves ):
+    """Summarize waves of finished flows: totals per protocol and per
+       path class.  A wave's aggregate rate is the sum of its concurrent
+       flows' rates."""
+    byProto, byPath = {}, {}
+    for wave, _seconds in waves:
+        for flow in wave:
+            if flow.result is None:
+                continue
+            for key, table in ( ( flow.proto, byProto ),
+                                ( '%s/%s' % ( flow.proto, flow.pathClass ),
+                                  byPath ) ):
+                entry = table.setdefault( key, { 'flows': 0, 'bytes': 0,
+                                                 'bps': 0.0 } )
+                entry[ 'flows' ] += 1
+                entry[ 'bytes' ] += flow.result[ 'bytes' ]
+                entry[ 'bps' ] += flow.result[ 'bps' ]
+    for table in byProto, byPath:
+        for entry in table.values():
+            entry[ 'meanBps' ] = entry[ 'bps' ] / entry[ 'flows' ]
+    return { 'waves': [ { 'flows': len( wave ), 'seconds': round( s, 3 ),
+                          'bps': sum( f.result[ 'bps' ] for f in wave
+                                      if f.result ) }
+                        for wave, s in waves ],
+             'protocols': byProto, 'paths': byPath,
+             'failed': sum( 1 for wave, _s in waves for f in wave
+                            if f.result is None ) }
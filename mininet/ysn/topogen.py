@@ -0,0 +1,228 @@
+"""
+topogen.py: parametric generator for ysn-style topologies
+
+The hand-written ysn topologies all follow one pattern: LinuxRouters
+joined by WAN links, each router owning a few /24 "subnets" that are
+chains of L2 switches with hosts hanging off them.  GeneratedTopo builds
+that pattern from a handful of parameters (or a JSON/YAML spec file) and
+allocates every address, interface name and default route itself, so
+the same layout scales from the 8 hosts of ysn_5.py to thousands.
+
+Naming follows the ysn scripts: routers r1..rN, switches s1..sN and
+hosts h1..hN, numbered globally; router ports are named rX-eth1,
+rX-eth2, ... in the order the links are created.
+
+Example spec ( JSON ), as in ysn_gen.json: the routers, subnets and
+switch chains of ysn_5.py, but with generated addresses and without h2's
+second link to s5:
+
+  { "routers": 2, "subnets": [ 1, 3 ], "hosts": 2, "depth": [ 1, 2, 1, 1 ],
+    "switch": "ovsk", "switchOpts": { "failMode": "standalone" } }
+"""
+
+import json
+
+from mininet.topo import Topo
+from mininet.node import OVSKernelSwitch, OVSSwitch, OVSBridge, UserSwitch
+from mininet.nodelib import LinuxBridge
+from mininet.util import ipAdd, netParse
+
+from ysn.router import LinuxRouter
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+SWITCHES = { 'ovsk': OVSKernelSwitch,
+             'ovs': OVSSwitch,
+             'ovsbr': OVSBridge,
+             'user': UserSwitch,
+             'lxbr': LinuxBridge }
+
+# Parameters accepted by GeneratedTopo ( and by spec files )
+DEFAULTS = { 'routers': 2,
+             'subnets': 2,
+             'hosts': 2,
+             'depth': 1,
+             'wan': 'chain',
+             'switch': 'ovsk',
+             'switchOpts': { 'failMode': 'standalone' },
+             'lanPool': '10.0.0.0/8',
+             'lanPrefix': 24,
+             'wanPool': '192.168.0.0/16',
+             'wanShape': None,
+             'lanShape': None }
+
+
+def loadSpec( path ):
+    """Load a JSON or YAML file, such as a topology spec.
+       returns: its contents"""
+    with open( path ) as f:
+        text = f.read()
+    if path.endswith( ( '.yaml', '.yml' ) ):
+        if yaml is None:
+            raise Exception( 'PyYAML is required to read %s' % path )
+        return yaml.safe_load( text )
+    return json.loads( text )
+
+
+class Subnet( object ):
+    "Addressing and membership of one generated L2 subnet."
+
+    def __init__( self, router, prefix, prefixLen ):
+        self.router = router
+        self.prefix = prefix
+        self.prefixLen = prefixLen
+        self.switches = []
+        self.hosts = []
+
+    def addr( self, i ):
+        "Return the i-th address of the subnet in ip/prefixLen form."
+        return '%s/%d' % ( ipAdd( i, self.prefixLen, self.prefix ),
+                           self.prefixLen )
+
+    def gateway( self ):
+        "The router always takes the first address."
+        return ipAdd( 1, self.prefixLen, self.prefix )
+
+    def __str__( self ):
+        return self.addr( 0 )
+
+
+class GeneratedTopo( Topo ):
+    "ysn-style routers, subnets and hosts generated from parameters."
+
+    def build( self, spec=None, **params ):
+        """spec: path of a JSON/YAML spec file ( optional )
+           routers: number of LinuxRouters
+           subnets: subnets per router ( int, or list with one
+             entry per router )
+           hosts: hosts per subnet
+           depth: length of the L2 switch chain in each subnet ( int,
+             or list with one entry per subnet, in router order )
+           wan: router interconnect, 'chain' or 'ring'
+           switch: switch class or name ( see SWITCHES )
+           switchOpts: extra options for every switch
+           lanPool, lanPrefix: pool carved into subnets of lanPrefix
+           wanPool: pool carved into /30 router-to-router links
+           wanShape, lanShape: shape ( see ysn/shaping.py ) of the
+             router-to-router links and of the subnet links"""
+        opts = dict( DEFAULTS )
+        if spec:
+            fromFile = loadSpec( spec )
+            unknown = set( fromFile ) - set( DEFAULTS )
+            if unknown:
+                raise Exception( 'Unknown topology parameters in %s: %s' %
+                                 ( spec, ', '.join( sorted( unknown ) ) ) )
+            opts.update( fromFile )
+        opts.update( params )
+        self.opts = opts
+        self.subnets = []
+        self.wans = []
+        self.routerPorts = {}
+        self.routerIps = {}
+        self.counts = { 's': 0, 'h': 0 }
+        self.switchCls = opts[ 'switch' ]
+        if not isinstance( self.switchCls, type ):
+            self.switchCls = SWITCHES[ self.switchCls ]
+        self.lanBase, _ = netParse( opts[ 'lanPool' ] )
+        self.wanBase, _ = netParse( opts[ 'wanPool' ] )
+
+        routers = [ self.addNode( 'r%d' % ( i + 1 ), cls=LinuxRouter )
+                    for i in range( opts[ 'routers' ] ) ]
+        self.buildWan( routers, opts[ 'wan' ] )
+        perRouter = opts[ 'subnets' ]
+        if not isinstance( perRouter, list ):
+            perRouter = [ perRouter ] * len( routers )
+        depths = opts[ 'depth' ]
+        if not isinstance( depths, list ):
+            depths = [ depths ] * sum( perRouter )
+        elif len( depths ) != sum( perRouter ):
+            raise Exception( 'depth lists %d subnets, not %d' %
+                             ( len( depths ), sum( perRouter ) ) )
+        depths = iter( depths )
+        for router, count in zip( routers, perRouter ):
+            for _ in range( count ):
+                self.buildSubnet( router, opts[ 'hosts' ], next( depths ) )
+        # As in the ysn scripts, a router's ip is that of its first port:
+        # Mininet would otherwise give it 10.0.0.N/8 on rX-eth1
+        for router in routers:
+            if router in self.routerIps:
+                self.setNodeInfo( router, dict( self.nodeInfo( router ),
+                                                ip=self.routerIps[ router ] ) )
+
+    def nextName( self, kind ):
+        "Allocate the next global switch ( s ) or host ( h ) name."
+        self.counts[ kind ] += 1
+        return '%s%d' % ( kind, self.counts[ kind ] )
+
+    def routerPort( self, router, ip ):
+        "Allocate the next rX-ethN interface name on router, for ip."
+        port = self.routerPorts.get( router, 0 ) + 1
+        self.routerIps.setdefault( router, ip )
+        self.routerPorts[ router ] = port
+        return '%s-eth%d' % ( router, port )
+
+    def shapeOpts( self, key ):
+        "Link options for the shape under key, if there is one."
+        return { 'shape': self.opts[ key ] } if self.opts[ key ] else {}
+
+    def buildWan( self, routers, wan ):
+        "Join routers with /30 links, as a chain or a ring."
+        pairs = list( zip( routers, routers[ 1: ] ) )
+        if wan == 'ring' and len( routers ) > 2:
+            pairs.append( ( routers[ -1 ], routers[ 0 ] ) )
+        elif wan not in ( 'chain', 'ring' ):
+            raise Exception( 'Unknown wan layout %s' % wan )
+        for r1, r2 in pairs:
+            base = self.wanBase + 4 * len( self.wans )
+            ip1, ip2 = ipAdd( 1, 30, base ), ipAdd( 2, 30, base )
+            self.addLink( r1, r2,
+                          intfName1=self.routerPort( r1, ip1 + '/30' ),
+                          intfName2=self.routerPort( r2, ip2 + '/30' ),
+                          params1={ 'ip': ip1 + '/30' },
+                          params2={ 'ip': ip2 + '/30' },
+                          **self.shapeOpts( 'wanShape' ) )
+            self.wans.append( ( r1, ip1, r2, ip2 ) )
+
+    def buildSubnet( self, router, hosts, depth ):
+        """Add one subnet behind router: a chain of depth switches with
+           hosts spread round-robin along the chain."""
+        prefixLen = self.opts[ 'lanPrefix' ]
+        size = 1 << ( 32 - prefixLen )
+        # Leave room for the network, gateway and broadcast addresses
+        if hosts > size - 3:
+            raise Exception( '%d hosts do not fit in a /%d subnet' %
+                             ( hosts, prefixLen ) )
+        if depth < 1:
+            raise Exception( 'Subnets need at least one switch' )
+        subnet = Subnet( router, self.lanBase + size * len( self.subnets ),
+                         prefixLen )
+        for _ in range( depth ):
+            switch = self.addSwitch( self.nextName( 's' ),
+                                     cls=self.switchCls,
+                                     **self.opts[ 'switchOpts' ] )
+            if subnet.switches:
+                self.addLink( subnet.switches[ -1 ], switch,
+                              **self.shapeOpts( 'lanShape' ) )
+            else:
+                self.addLink( router, switch,
+                              intfName1=self.routerPort(
+                                  router, subnet.addr( 1 ) ),
+                              params1={ 'ip': subnet.addr( 1 ) },
+                              **self.shapeOpts( 'lanShape' ) )
+            subnet.switches.append( switch )
+        gateway = 'via ' + subnet.gateway()
+        for i in range( hosts ):
+            host = self.addHost( self.nextName( 'h' ), ip=subnet.addr( i + 2 ),
+                                 defaultRoute=gateway )
+            self.addLink( host, subnet.switches[ i % depth ],
+                          **self.shapeOpts( 'lanShape' ) )
+            subnet.hosts.append( host )
+        self.subnets.append( subnet )
+        return subnet
+
+
+topos = { 'ysngen': GeneratedTopo }
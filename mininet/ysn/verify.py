@@ -0,0 +1,966 @@
+"""
+verify.py: offline data-plane reachability verification
+
+A Snapshot captures the data plane of a running network without sending
+a packet:
+
+    hosts and routers   addresses, MACs, the main routing table,
+                        ip_forward and rp_filter
+    OVS switches        the flow table ( table 0 )
+    links               which interface faces which
+
+and a Model computes from it, for every host pair, whether and over
+which path packets get through, plus forwarding loops and blackholes.
+
+The model splits the IPv4 space into atoms at every prefix boundary of
+every table ( routes, flow nw_dst matches and interface addresses, the
+latter as /32s ).  Each node's table becomes a run list: the addresses
+at which the entry in effect changes, found with one sweep over the
+nested prefixes ( or by painting flows in priority order ).  Atoms that
+every node treats alike are merged into equivalence classes, using an
+XOR of random per-entry keys as the class signature, so building takes
+one pass over the runs rather than one over every atom at every node.
+Forwarding is resolved once per ( node, entry ) and all questions are
+walks over that, so thousands of prefixes verify in well under a
+second.
+
+After verify(), update() swaps in one node's new routes ( or flows ):
+only that table is rebuilt, and the signatures change only on the
+atoms where its entry in effect changed.  recheck() then re-traces just
+the pairs from or to those addresses and looks for loops among those
+atoms ( see ysn/watch.py ).
+
+Switches with ip,nw_dst flows ( e.g. the proactive routers of
+ysn/proactive.py ) forward at L3; all other switches are taken to
+bridge ( NORMAL, or a controller doing L2 ).  Interfaces on L2 switch
+islands and on point-to-point links form broadcast domains, in which
+next hops are resolved by address ( routers ) or by MAC ( flows ).
+
+Snapshots can be saved as JSON and verified later on any machine:
+
+    snap = Snapshot.capture( net ); snap.dump( 'snap.json' )
+    report = Model( Snapshot.load( 'snap.json' ) ).verify()
+"""
+
+import json
+import re
+from bisect import bisect_left, bisect_right
+from random import Random
+from time import time
+
+from mininet.node import OVSSwitch
+from mininet.util import quietRun
+
+from ysn.router import LinuxRouter
+from ysn.routing import RouteEngine, isRouter, prefixOf
+from ysn.startup import Scheduler
+
+SEP = '@@'
+
+# Captured in one round-trip per node
+NODE_CMD = ( "ip -o -4 addr show; echo '@@'; ip -o link show; echo '@@'; "
+             "ip -o -4 route show table main; echo '@@'; "
+             "grep -H . /proc/sys/net/ipv4/ip_forward "
+             "/proc/sys/net/ipv4/conf/*/rp_filter" )
+
+DROPS = ( 'blackhole', 'unreachable', 'prohibit', 'throw' )
+
+FULL = 1 << 32
+
+
+# Addresses
+
+def ipInt( ip ):
+    "Dotted quad to integer."
+    a, b, c, d = [ int( x ) for x in ip.split( '.' ) ]
+    return ( a << 24 ) | ( b << 16 ) | ( c << 8 ) | d
+
+def intIp( n ):
+    "Integer to dotted quad."
+    return '%d.%d.%d.%d' % ( n >> 24, ( n >> 16 ) & 255, ( n >> 8 ) & 255,
+                             n & 255 )
+
+def prefixRange( prefix ):
+    "Return [ lo, hi ) of 'a.b.c.d/len', 'a.b.c.d' or 'default'."
+    if prefix == 'default':
+        return 0, FULL
+    ip, _, plen = prefix.partition( '/' )
+    plen = int( plen ) if plen else 32
+    lo = ipInt( ip ) & ( ( 0xffffffff << ( 32 - plen ) ) & 0xffffffff )
+    return lo, lo + ( 1 << ( 32 - plen ) )
+
+def rangePrefixes( lo, hi ):
+    "Cover [ lo, hi ) with the fewest prefixes."
+    prefixes = []
+    while lo < hi:
+        size = lo & -lo if lo else FULL
+        while size > hi - lo:
+            size >>= 1
+        prefixes.append( '%s/%d' % ( intIp( lo ),
+                                     32 - size.bit_length() + 1 ) )
+        lo += size
+    return prefixes
+
+def mergeRanges( ranges ):
+    "Sorted union of [ lo, hi ) ranges."
+    merged = []
+    for lo, hi in sorted( ranges ):
+        if merged and lo <= merged[ -1 ][ 1 ]:
+            merged[ -1 ] = ( merged[ -1 ][ 0 ], max( hi, merged[ -1 ][ 1 ] ) )
+        else:
+            merged.append( ( lo, hi ) )
+    return merged
+
+def subtractRanges( ranges, cut ):
+    "Parts of merged ranges outside the merged ranges cut."
+    result = []
+    for lo, hi in ranges:
+        for clo, chi in cut:
+            if chi <= lo or clo >= hi:
+                continue
+            if clo > lo:
+                result.append( ( lo, clo ) )
+            lo = max( lo, chi )
+            if lo >= hi:
+                break
+        if lo < hi:
+            result.append( ( lo, hi ) )
+    return result
+
+
+# Parsing
+
+def parseAddrs( text ):
+    "ip -o -4 addr show -> { intf: [ 'ip/len' ] }."
+    addrs = {}
+    for line in text.splitlines():
+        tokens = line.split()
+        if 'inet' in tokens:
+            intf = tokens[ 1 ].split( '@' )[ 0 ]
+            addrs.setdefault( intf, [] ).append(
+                tokens[ tokens.index( 'inet' ) + 1 ] )
+    return addrs
+
+def parseLinks( text ):
+    "ip -o link show -> { intf: mac }."
+    macs = {}
+    for line in text.splitlines():
+        tokens = line.split()
+        if len( tokens ) > 1 and 'link/ether' in tokens:
+            macs[ tokens[ 1 ].rstrip( ':' ).split( '@' )[ 0 ] ] = tokens[
+                tokens.index( 'link/ether' ) + 1 ]
+    return macs
+
+def parseRoute( line ):
+    """Parse one line of ip -o route.
+       returns: ( prefix, type, [ ( via or None, dev ) ], metric ) or None"""
+    tokens = line.replace( '\\', ' ' ).split()
+    if not tokens:
+        return None
+    kind = 'unicast'
+    if tokens[ 0 ] in DROPS + ( 'unicast', 'local', 'broadcast',
+                                'multicast', 'anycast' ):
+        kind = tokens.pop( 0 )
+    prefix, hops, metric, via, dev = tokens.pop( 0 ), [], 0, None, None
+    i = 0
+    while i < len( tokens ):
+        key = tokens[ i ]
+        value = tokens[ i + 1 ] if i + 1 < len( tokens ) else None
+        if key == 'nexthop':
+            if dev or via:
+                hops.append( ( via, dev ) )
+            via, dev = None, None
+            i += 1
+            continue
+        if key == 'via':
+            via = value
+        elif key == 'dev':
+            dev = value
+        elif key == 'metric':
+            metric = int( value )
+        elif key in ( 'onlink', 'linkdown', 'pervasive', 'dead' ):
+            i += 1
+            continue
+        i += 2
+    if dev or via:
+        hops.append( ( via, dev ) )
+    return prefix, kind, hops, metric
+
+def bestRoutes( routes ):
+    "The lowest-metric route of each prefix, sorted by prefix."
+    best = {}
+    for route in routes:
+        if route and ( route[ 0 ] not in best or
+                       route[ 3 ] < best[ route[ 0 ] ][ 3 ] ):
+            best[ route[ 0 ] ] = route
+    return [ best[ p ] for p in sorted( best ) ]
+
+def parseRoutes( text ):
+    "ip -o -4 route -> list of parseRoute() results, lowest metric only."
+    return bestRoutes( parseRoute( line ) for line in text.splitlines() )
+
+def parseSysctls( text ):
+    "grep -H output -> ( ip_forward, { conf name: rp_filter } )."
+    forwarding, rpf = False, {}
+    for line in text.splitlines():
+        path, _, value = line.partition( ':' )
+        if path.endswith( '/ip_forward' ):
+            forwarding = value.strip() == '1'
+        elif path.endswith( '/rp_filter' ):
+            rpf[ path.split( '/' )[ -2 ] ] = int( value )
+    return forwarding, rpf
+
+FLOW_DST = re.compile( r'\bnw_dst=([\d./]+)' )
+FLOW_PRIORITY = re.compile( r'\bpriority=(\d+)' )
+FLOW_TABLE = re.compile( r'\btable=(\d+)' )
+FLOW_OUTPUT = re.compile( r'output:(\d+)' )
+FLOW_DLDST = re.compile( r'mod_dl_dst:([0-9a-fA-F:]{17})|'
+                         r'set_field:([0-9a-fA-F:]{17})->eth_dst' )
+
+def parseFlows( text ):
+    """ovs-ofctl dump-flows -> list of
+       ( priority, nw_dst or None, [ out ports ], dl_dst or None,
+         bridges ( NORMAL/FLOOD ) )"""
+    flows = []
+    for line in text.splitlines():
+        if 'actions=' not in line:
+            continue
+        match, _, actions = line.partition( 'actions=' )
+        table = FLOW_TABLE.search( match )
+        if table and table.group( 1 ) != '0':
+            continue
+        priority = FLOW_PRIORITY.search( match )
+        dst = FLOW_DST.search( match )
+        dlDst = FLOW_DLDST.search( actions )
+        flows.append( ( int( priority.group( 1 ) ) if priority else 32768,
+                        dst.group( 1 ) if dst else None,
+                        [ int( p ) for p in FLOW_OUTPUT.findall( actions ) ],
+                        ( dlDst.group( 1 ) or dlDst.group( 2 ) ).lower()
+                        if dlDst else None,
+                        'NORMAL' in actions or 'FLOOD' in actions ) )
+    return flows
+
+
+def nestedRuns( entries ):
+    """Runs of a longest-prefix-match table: entries are CIDR ranges, so
+       any two are nested or disjoint and the innermost one wins ( an
+       address entry over a route of the same range ).
+       returns: ( [ start address ], [ entry id, 1-based or 0 ] )"""
+    order = sorted( range( len( entries ) ),
+                    key=lambda i: ( entries[ i ][ 0 ], -entries[ i ][ 1 ],
+                                    entries[ i ][ 2 ][ 0 ] == 'local' ) )
+    addrs, eids, stack = [ 0 ], [ 0 ], []
+
+    def emit( addr, eid ):
+        if addrs[ -1 ] == addr:
+            eids[ -1 ] = eid
+        elif eids[ -1 ] != eid:
+            addrs.append( addr )
+            eids.append( eid )
+
+    for i in order:
+        lo, hi, _action = entries[ i ]
+        while stack and stack[ -1 ][ 0 ] <= lo:
+            end = stack.pop()[ 0 ]
+            emit( end, stack[ -1 ][ 1 ] if stack else 0 )
+        emit( lo, i + 1 )
+        stack.append( ( hi, i + 1 ) )
+    while stack:
+        end = stack.pop()[ 0 ]
+        if end < FULL:
+            emit( end, stack[ -1 ][ 1 ] if stack else 0 )
+    return addrs, eids
+
+def paintedRuns( entries ):
+    """Runs of a table whose later entries win wherever they overlap
+       ( flows in increasing priority ).
+       returns: ( [ start address ], [ entry id, 1-based or 0 ] )"""
+    bounds = sorted( set( [ 0 ] + [ e[ 0 ] for e in entries ] +
+                          [ e[ 1 ] for e in entries if e[ 1 ] < FULL ] ) )
+    vector = [ 0 ] * len( bounds )
+    for i, ( lo, hi, _action ) in enumerate( entries ):
+        a = bisect_left( bounds, lo )
+        b = bisect_left( bounds, hi ) if hi < FULL else len( bounds )
+        vector[ a:b ] = [ i + 1 ] * ( b - a )
+    addrs, eids = [], []
+    for addr, eid in zip( bounds, vector ):
+        if not eids or eids[ -1 ] != eid:
+            addrs.append( addr )
+            eids.append( eid )
+    return addrs, eids
+
+
+class Snapshot( object ):
+    "The data-plane state of a network, as plain JSON-friendly data."
+
+    def __init__( self, data ):
+        """data: { 'nodes': { name: { 'addrs', 'macs', 'routes',
+                                     'forwarding', 'rpFilter' } },
+                   'switches': { name: { 'ports', 'addrs', 'macs',
+                                         'flows' } },
+                   'links': [ [ node1, intf1, node2, intf2 ] ] }"""
+        self.data = data
+
+    @classmethod
+    def capture( cls, net ):
+        "Capture a running network, one concurrent round-trip per node."
+        scheduler = Scheduler()
+        for node in net.hosts:
+            scheduler.add( node.name, node, NODE_CMD )
+        outputs = scheduler.run()
+        nodes = {}
+        for node in net.hosts:
+            parts = outputs[ node.name ].split( SEP )
+            parts += [ '' ] * ( 4 - len( parts ) )
+            forwarding, rpf = parseSysctls( parts[ 3 ] )
+            nodes[ node.name ] = {
+                'addrs': parseAddrs( parts[ 0 ] ),
+                'macs': parseLinks( parts[ 1 ] ),
+                'routes': parseRoutes( parts[ 2 ] ),
+                'forwarding': forwarding, 'rpFilter': rpf,
+                'router': isinstance( node, LinuxRouter ) }
+        ovs = [ s for s in net.switches if isinstance( s, OVSSwitch ) ]
+        dumps = quietRun( '; '.join(
+            "echo '%s %s'; ovs-ofctl dump-flows %s" % ( SEP, s.name, s.name )
+            for s in ovs ), shell=True ) if ovs else ''
+        flows = {}
+        for chunk in dumps.split( SEP + ' ' )[ 1: ]:
+            name, _, text = chunk.partition( '\n' )
+            flows[ name.strip() ] = parseFlows( text )
+        switches = {}
+        for switch in net.switches:
+            intfs = [ i for i in switch.intfList() if i.name != 'lo' ]
+            switches[ switch.name ] = {
+                'ports': dict( ( i.name, switch.ports[ i ] ) for i in intfs ),
+                'addrs': dict( ( i.name, [ '%s/%s' % ( i.IP(),
+                                                       i.prefixLen ) ] )
+                               for i in intfs if i.IP() and i.prefixLen ),
+                'macs': dict( ( i.name, i.MAC() ) for i in intfs
+                              if i.MAC() ),
+                'flows': flows.get( switch.name ) }
+        links = [ [ l.intf1.node.name, l.intf1.name,
+                    l.intf2.node.name, l.intf2.name ] for l in net.links ]
+        return cls( { 'nodes': nodes, 'switches': switches,
+                      'links': links } )
+
+    @classmethod
+    def fromTopo( cls, topo ):
+        """Predict the data plane of a Topo before it is built: addresses,
+           connected routes, defaultRoute, LinuxRouter routes and the
+           sysctls parameter ( switches are taken to bridge )."""
+        engine = RouteEngine( topo )
+        nodes, switches, links = {}, {}, []
+        for name in topo.nodes():
+            info = topo.nodeInfo( name )
+            if name in engine.switches:
+                switches[ name ] = { 'ports': {}, 'addrs': {}, 'macs': {},
+                                     'flows': None }
+                continue
+            sysctls = info.get( 'sysctls' ) or {}
+            nodes[ name ] = {
+                'addrs': {}, 'macs': {}, 'routes': [],
+                'forwarding': isRouter( info ) or str(
+                    sysctls.get( 'net.ipv4.ip_forward' ) ) == '1',
+                'rpFilter': dict( ( key.split( '.' )[ -2 ], int( value ) )
+                                  for key, value in sysctls.items()
+                                  if key.endswith( '.rp_filter' ) ),
+                'router': isRouter( info ) }
+        for src, dst, opts in engine.links:
+            ends = engine.endpoints( src, dst, opts )
+            links.append( [ ends[ 0 ][ 0 ], ends[ 0 ][ 1 ],
+                            ends[ 1 ][ 0 ], ends[ 1 ][ 1 ] ] )
+            for ( node, intf, addr ), port in zip(
+                    ends, ( opts.get( 'port1' ), opts.get( 'port2' ) ) ):
+                if node in switches:
+                    switches[ node ][ 'ports' ][ intf ] = port
+                elif addr:
+                    nodes[ node ][ 'addrs' ][ intf ] = [ addr ]
+        for name, node in nodes.items():
+            info = topo.nodeInfo( name )
+            routes = [ '%s dev %s' % ( prefixOf( addrs[ 0 ] ), intf )
+                       for intf, addrs in node[ 'addrs' ].items() ]
+            default = info.get( 'defaultRoute' )
+            if default:
+                if ' ' not in default:
+                    # A bare address is a gateway, anything else a device
+                    default = ( 'via ' if re.match( r'[\d.]+$', default )
+                                else 'dev ' ) + default
+                routes.append( 'default ' + default )
+            routes += info.get( 'routes' ) or []
+            node[ 'routes' ] = parseRoutes( '\n'.join( routes ) )
+        return cls( { 'nodes': nodes, 'switches': switches,
+                      'links': links } )
+
+    @classmethod
+    def load( cls, path ):
+        "Read a snapshot written by dump()."
+        with open( path ) as f:
+            return cls( json.load( f ) )
+
+    def dump( self, path ):
+        "Write the snapshot as JSON."
+        with open( path, 'w' ) as f:
+            json.dump( self.data, f, indent=1, sort_keys=True )
+
+
+class Model( object ):
+    "Equivalence-class forwarding model of a Snapshot."
+
+    def __init__( self, snapshot ):
+        self.snap = snapshot.data
+        self.hosts, self.pairResults, self.loopRanges = [], {}, {}
+        self.build()
+
+    def build( self ):
+        "( Re )build the whole model from the snapshot."
+        start = time()
+        self.nodes = sorted( self.snap[ 'nodes' ] )
+        # Switches with L3 flows are forwarding nodes too
+        self.l3switches = sorted(
+            name for name, s in self.snap[ 'switches' ].items()
+            if any( f[ 1 ] and f[ 2 ] for f in s[ 'flows' ] or [] ) )
+        self.l3 = self.nodes + self.l3switches
+        self.forwarders = set( n for n in self.l3 if self.forwards( n ) )
+        self.buildDomains()
+        self.buildEntries()
+        self.buildClasses()
+        self.buildSeconds = time() - start
+
+    # Topology
+
+    def buildDomains( self ):
+        "Group L3 interfaces into broadcast domains."
+        l3 = set( self.l3 )
+        l2 = set( self.snap[ 'switches' ] ) - l3
+        parent = dict( ( s, s ) for s in l2 )
+
+        def find( s ):
+            while parent[ s ] != s:
+                parent[ s ] = parent[ parent[ s ] ]
+                s = parent[ s ]
+            return s
+
+        self.peer = {}
+        for n1, i1, n2, i2 in self.snap[ 'links' ]:
+            self.peer[ ( n1, i1 ) ] = ( n2, i2 )
+            self.peer[ ( n2, i2 ) ] = ( n1, i1 )
+            if n1 in l2 and n2 in l2:
+                parent[ find( n1 ) ] = find( n2 )
+        self.domainOf = {}  # ( node, intf ) -> domain
+        for n1, i1, n2, i2 in self.snap[ 'links' ]:
+            if n1 in l2 and n2 in l2:
+                continue
+            if n1 in l2 or n2 in l2:
+                domain = 'sw:' + find( n1 if n1 in l2 else n2 )
+            else:
+                domain = 'p2p:%s:%s' % ( n1, i1 )
+            for end in ( n1, i1 ), ( n2, i2 ):
+                if end[ 0 ] in l3:
+                    self.domainOf[ end ] = domain
+        self.owners, self.macOwners = {}, {}
+        for node in self.l3:
+            info = self.info( node )
+            for intf, addrs in info.get( 'addrs', {} ).items():
+                domain = self.domainOf.get( ( node, intf ) )
+                for addr in addrs:
+                    self.owners.setdefault( domain, {} )[
+                        addr.split( '/' )[ 0 ] ] = ( node, intf )
+            for intf, mac in info.get( 'macs', {} ).items():
+                self.macOwners.setdefault(
+                    self.domainOf.get( ( node, intf ) ), {} )[
+                    mac.lower() ] = ( node, intf )
+
+    def info( self, node ):
+        "Snapshot entry of a node or switch."
+        return self.snap[ 'nodes' ].get( node ) or \
+            self.snap[ 'switches' ][ node ]
+
+    # Tables
+
+    def buildEntries( self ):
+        """Turn every table into ( lo, hi, action ) entries, where action
+           is ( 'local', ) | ( 'drop', reason ) | ( 'fwd', [ ( via, dev ) ] )
+           | ( 'out', [ ( intf, dl_dst ) ] ), and into runs: the
+           addresses where the entry in effect changes."""
+        self.entries, self.runs = {}, {}
+        for node in self.nodes:
+            self.setRoutes( node )
+        for switch in self.l3switches:
+            self.setFlows( switch )
+
+    def setRoutes( self, node ):
+        "( Re )build a node's entries and runs from its snapshot."
+        info = self.snap[ 'nodes' ][ node ]
+        connected = self.connected( info[ 'routes' ] )
+        entries = []
+        for prefix, kind, hops, _metric in info[ 'routes' ]:
+            lo, hi = prefixRange( prefix )
+            if kind in DROPS:
+                entries.append( ( lo, hi, ( 'drop', kind ) ) )
+            elif kind == 'unicast':
+                entries.append( ( lo, hi, ( 'fwd', [
+                    ( via, dev or self.devFor( connected, via ) )
+                    for via, dev in hops ] ) ) )
+        # The local table is looked up first: addresses win over routes
+        for addrs in info[ 'addrs' ].values():
+            for addr in addrs:
+                lo = ipInt( addr.split( '/' )[ 0 ] )
+                entries.append( ( lo, lo + 1, ( 'local', ) ) )
+        self.entries[ node ] = entries
+        self.runs[ node ] = nestedRuns( entries )
+
+    def setFlows( self, switch ):
+        "( Re )build an L3 switch's entries and runs from its flows."
+        info = self.snap[ 'switches' ][ switch ]
+        byPort = dict( ( p, i ) for i, p in info[ 'ports' ].items() )
+        entries = []
+        for _priority, dst, ports, dlDst, _bridges in sorted(
+                info[ 'flows' ] or [], key=lambda f: f[ 0 ] ):
+            if not dst:
+                continue
+            lo, hi = prefixRange( dst )
+            outs = [ ( byPort[ p ], dlDst ) for p in ports if p in byPort ]
+            entries.append( ( lo, hi, ( 'out', outs ) if outs else
+                              ( 'drop', 'flow-drop' ) ) )
+        self.entries[ switch ] = entries
+        self.runs[ switch ] = paintedRuns( entries )
+
+    @staticmethod
+    def connected( routes ):
+        """Index of a node's connected ( dev-only ) routes, built once per
+           table: [ ( size, lo, hi, dev ) ], narrowest first."""
+        index = []
+        for prefix, kind, hops, _metric in routes:
+            if kind == 'unicast' and len( hops ) == 1 and not hops[ 0 ][ 0 ]:
+                lo, hi = prefixRange( prefix )
+                index.append( ( hi - lo, lo, hi, hops[ 0 ][ 1 ] ) )
+        return sorted( index )
+
+    @staticmethod
+    def devFor( connected, via ):
+        """Interface the kernel would resolve gateway via to: the dev of
+           the longest connected route containing it.
+           connected: the node's connected() index"""
+        if not via:
+            return None
+        ip = ipInt( via )
+        for _size, lo, hi, dev in connected:
+            if lo <= ip < hi:
+                return dev
+        return None
+
+    def buildClasses( self ):
+        """Split the address space into atoms and give each atom two
+           signatures: how every node treats it ( its class ) and how
+           every forwarding node treats it ( its routed class ).
+           A signature is the XOR of a random 64-bit key per ( node,
+           entry in effect ), updated along the runs."""
+        self.rng, self.entryKeys, self.keys = Random( 0 ), {}, {}
+        self.actions = {}
+        delta = {}  # address -> ( signature change, routed change )
+        for node in self.l3:
+            self.setKeys( node )
+            forwards = node in self.forwarders
+            for addr, change in self.changes( node, ( [ 0 ], [ 0 ] ),
+                                              [ 0 ] ):
+                both, routed = delta.get( addr, ( 0, 0 ) )
+                delta[ addr ] = ( both ^ change,
+                                  routed ^ change if forwards else routed )
+        delta.setdefault( 0, ( 0, 0 ) )
+        self.starts = sorted( delta )
+        self.atomSig, self.atomRouted = [], []
+        both = routed = 0
+        for addr in self.starts:
+            change, routedChange = delta[ addr ]
+            both ^= change
+            routed ^= routedChange
+            self.atomSig.append( both )
+            self.atomRouted.append( routed )
+
+    def setKeys( self, node ):
+        """Key every entry of node's table; entries that survive a
+           rebuild keep their key."""
+        keys = [ 0 ]
+        for lo, hi, action in self.entries[ node ]:
+            ident = ( node, lo, hi, repr( action ) )
+            if ident not in self.entryKeys:
+                self.entryKeys[ ident ] = self.rng.getrandbits( 64 )
+            keys.append( self.entryKeys[ ident ] )
+        self.keys[ node ] = keys
+
+    def changes( self, node, oldRuns, oldKeys ):
+        """Where node's signature contribution changed from oldRuns to its
+           current runs.
+           returns: [ ( address, XOR change from the previous address ) ]"""
+        ( oldAddrs, oldEids ), keys = oldRuns, self.keys[ node ]
+        addrs, eids = self.runs[ node ]
+        i = j = 0
+        prev, result = 0, []
+        for addr in sorted( set( oldAddrs ) | set( addrs ) ):
+            while i + 1 < len( oldAddrs ) and oldAddrs[ i + 1 ] <= addr:
+                i += 1
+            while j + 1 < len( addrs ) and addrs[ j + 1 ] <= addr:
+                j += 1
+            diff = oldKeys[ oldEids[ i ] ] ^ keys[ eids[ j ] ]
+            if diff != prev:
+                result.append( ( addr, diff ^ prev ) )
+                prev = diff
+        return result
+
+    def atomRange( self, atom ):
+        "[ lo, hi ) of an atom."
+        hi = self.starts[ atom + 1 ] if atom + 1 < len( self.starts ) else FULL
+        return self.starts[ atom ], hi
+
+    def atomOf( self, addr ):
+        "Atom containing an address ( an integer )."
+        return bisect_right( self.starts, addr ) - 1
+
+    def classOf( self, ip ):
+        "Equivalence class ( signature ) of an address."
+        return self.atomSig[ self.atomOf( ipInt( ip ) ) ]
+
+    def classPrefixes( self, ec ):
+        "The prefixes making up a class."
+        prefixes = []
+        for atom, sig in enumerate( self.atomSig ):
+            if sig == ec:
+                prefixes += rangePrefixes( *self.atomRange( atom ) )
+        return prefixes
+
+    def routedAtoms( self, atoms ):
+        "Group atoms by routed class: { routed signature: [ atom ] }."
+        groups = {}
+        for atom in atoms:
+            groups.setdefault( self.atomRouted[ atom ], [] ).append( atom )
+        return groups
+
+    # Forwarding
+
+    def lookup( self, node, addr ):
+        "Entry id ( 1-based, 0 for none ) in effect at node for addr."
+        addrs, eids = self.runs[ node ]
+        return eids[ bisect_right( addrs, addr ) - 1 ]
+
+    def actionAt( self, node, addr ):
+        """What node does with packets to addr ( an integer ).
+           returns: ( 'local', ) | ( 'drop', reason ) |
+                    ( 'next', [ ( node, in intf, out intf ) ], drops )"""
+        eid = self.lookup( node, addr )
+        if not eid:
+            return ( 'drop', 'controller' if node in self.l3switches
+                     else 'no-route' )
+        action = self.entries[ node ][ eid - 1 ][ 2 ]
+        if action[ 0 ] in ( 'local', 'drop' ):
+            return action
+        # Connected routes resolve the destination itself
+        direct = action[ 0 ] == 'fwd' and any( not via
+                                               for via, _dev in action[ 1 ] )
+        cache = self.actions.setdefault( node, {} )
+        key = ( eid, addr if direct else None )
+        result = cache.get( key )
+        if result is None:
+            result = cache[ key ] = self.resolve( node, action, addr )
+        return result
+
+    def resolve( self, node, action, addr ):
+        "Resolve next hops to the neighbouring nodes."
+        hops, drops = [], []
+        for target, dev in action[ 1 ]:
+            if action[ 0 ] == 'fwd':
+                domain = self.domainOf.get( ( node, dev ) )
+                owner = self.owners.get( domain, {} ).get(
+                    target or intIp( addr ) )
+            else:
+                peer = self.peer.get( ( node, dev ) )
+                if peer and peer[ 0 ] in self.l3:
+                    owner = peer
+                else:
+                    domain = self.domainOf.get( ( node, dev ) )
+                    owner = self.macOwners.get( domain, {} ).get( target )
+            if owner is None:
+                drops.append( 'no-neighbour' )
+            else:
+                hops.append( ( owner[ 0 ], owner[ 1 ], dev ) )
+        return ( 'next', hops, drops )
+
+    def forwards( self, node ):
+        "Does node forward packets that are not its own?"
+        return ( node in self.l3switches or
+                 self.snap[ 'nodes' ][ node ][ 'forwarding' ] )
+
+    def rpfOk( self, node, intf, src ):
+        "Would node's rp_filter accept a packet from src on intf?"
+        if node in self.l3switches or src is None:
+            return True
+        rpf = self.snap[ 'nodes' ][ node ][ 'rpFilter' ]
+        mode = max( rpf.get( 'all', 0 ), rpf.get( intf, 0 ) )
+        if not mode:
+            return True
+        action = self.actionAt( node, ipInt( src ) )
+        if action[ 0 ] != 'next' or not action[ 1 ]:
+            return action[ 0 ] == 'local'
+        return mode == 2 or intf in [ out for _n, _i, out in action[ 1 ] ]
+
+    def sourceAddr( self, node, intf ):
+        "Address a node would use as the source on intf."
+        addrs = self.info( node ).get( 'addrs', {} ).get( intf )
+        return addrs[ 0 ].split( '/' )[ 0 ] if addrs else None
+
+    def trace( self, src, dst ):
+        """Follow every path from node src towards address dst.
+           returns: list of ( outcome, path ), outcome being 'reachable'
+                    or the reason the packet is lost"""
+        addr = ipInt( dst )
+        outcomes = []
+        stack = [ ( src, None, [ src ], None ) ]
+        while stack:
+            node, inIntf, path, srcAddr = stack.pop()
+            if inIntf is not None and not self.rpfOk( node, inIntf,
+                                                      srcAddr ):
+                outcomes.append( ( 'rp_filter', path ) )
+                continue
+            action = self.actionAt( node, addr )
+            if action[ 0 ] == 'local':
+                outcomes.append( ( 'reachable', path ) )
+                continue
+            if action[ 0 ] == 'drop':
+                outcomes.append( ( action[ 1 ], path ) )
+                continue
+            if node != src and not self.forwards( node ):
+                outcomes.append( ( 'not-forwarding', path ) )
+                continue
+            outcomes += [ ( reason, path ) for reason in action[ 2 ] ]
+            for nxt, nxtIntf, outIntf in action[ 1 ]:
+                if nxt in path:
+                    outcomes.append( ( 'loop', path + [ nxt ] ) )
+                    continue
+                stack.append( ( nxt, nxtIntf, path + [ nxt ],
+                                srcAddr or self.sourceAddr( node, outIntf ) ) )
+        return outcomes
+
+    def loops( self, atom ):
+        "Forwarding loops for the addresses of an atom, as node lists."
+        addr = self.starts[ atom ]
+        graph = {}
+        for node in self.forwarders:
+            action = self.actionAt( node, addr )
+            if action[ 0 ] == 'next':
+                graph[ node ] = [ n for n, _i, _o in action[ 1 ]
+                                  if n in self.forwarders ]
+        found, state = [], {}
+        for root in sorted( graph ):
+            if root in state:
+                continue
+            state[ root ] = 1
+            stack = [ ( root, iter( graph[ root ] ) ) ]
+            while stack:
+                node, children = stack[ -1 ]
+                for child in children:
+                    if state.get( child ) == 1:
+                        cycle = [ n for n, _c in stack ]
+                        found.append( cycle[ cycle.index( child ): ] +
+                                      [ child ] )
+                    elif child not in state:
+                        state[ child ] = 1
+                        stack.append( ( child, iter( graph.get( child,
+                                                                [] ) ) ) )
+                        break
+                else:
+                    state[ node ] = 2
+                    stack.pop()
+        return found
+
+    # Reporting
+
+    def endHosts( self ):
+        "Nodes that are not routers, i.e. the hosts to check pairwise."
+        return [ n for n in self.nodes
+                 if not self.snap[ 'nodes' ][ n ].get(
+                     'router', self.forwards( n ) ) ]
+
+    def hostAddrs( self, node ):
+        "A node's addresses, loopback excluded."
+        return sorted( addr.split( '/' )[ 0 ] for intf, addrs in
+                       self.snap[ 'nodes' ][ node ][ 'addrs' ].items()
+                       for addr in addrs if intf != 'lo' )
+
+    def tracePair( self, src, dst, addr ):
+        "Trace src to one address of dst and summarise the outcome."
+        outcomes = self.trace( src, addr )
+        reasons = sorted( set( o for o, _p in outcomes ) )
+        ok = [ p for o, p in outcomes if o == 'reachable' ]
+        status = ( 'reachable' if reasons == [ 'reachable' ]
+                   else 'partial' if ok
+                   else ','.join( reasons ) or 'no-route' )
+        return { 'src': src, 'dst': dst, 'addr': addr, 'status': status,
+                 'path': ok[ 0 ] if ok else
+                 ( outcomes[ 0 ][ 1 ] if outcomes else [ src ] ),
+                 'lost': [ { 'reason': o, 'at': p[ -1 ] }
+                           for o, p in outcomes if o != 'reachable' ] }
+
+    def pairs( self, hosts=None ):
+        "Trace every host to every address of every other host."
+        hosts = hosts or self.endHosts()
+        return [ self.tracePair( src, dst, addr )
+                 for src in hosts for dst in hosts if src != dst
+                 for addr in self.hostAddrs( dst ) ]
+
+    def findLoops( self, atoms ):
+        "Loops among atoms, checked once per routed class: { cycle: atoms }."
+        found = {}
+        for group in self.routedAtoms( atoms ).values():
+            for cycle in self.loops( group[ 0 ] ):
+                found.setdefault( tuple( cycle ), [] ).extend( group )
+        return found
+
+    def loopList( self ):
+        "The current loops as report entries."
+        return [ { 'cycle': list( cycle ),
+                   'prefixes': sum( [ rangePrefixes( lo, hi )
+                                      for lo, hi in ranges ], [] )[ :8 ] }
+                 for cycle, ranges in sorted( self.loopRanges.items() )
+                 if ranges ]
+
+    @staticmethod
+    def blackholes( pairs ):
+        "Distinct places where pairs lose packets, loops aside."
+        holes = sorted( set( ( lost[ 'at' ], p[ 'addr' ], lost[ 'reason' ] )
+                             for p in pairs for lost in p[ 'lost' ]
+                             if lost[ 'reason' ] not in ( 'loop',
+                                                          'rp_filter' ) ) )
+        return [ { 'at': at, 'addr': addr, 'reason': reason }
+                 for at, addr, reason in holes ]
+
+    def verify( self, hosts=None ):
+        """Check all pairs, and look for loops in every class; the results
+           are kept for recheck().
+           returns: report dict"""
+        start = time()
+        self.hosts = hosts or self.endHosts()
+        pairs = self.pairs( self.hosts )
+        self.pairResults = dict( ( ( p[ 'src' ], p[ 'addr' ] ), p )
+                                 for p in pairs )
+        self.loopRanges = dict(
+            ( cycle, mergeRanges( [ self.atomRange( a ) for a in atoms ] ) )
+            for cycle, atoms in self.findLoops(
+                range( len( self.starts ) ) ).items() )
+        return {
+            'pairs': pairs, 'loops': self.loopList(),
+            'blackholes': self.blackholes( pairs ),
+            'stats': { 'nodes': len( self.l3 ),
+                       'entries': sum( len( e ) for e in
+                                       self.entries.values() ),
+                       'atoms': len( self.starts ),
+                       'classes': len( set( self.atomSig ) ),
+                       'routedClasses': len( set( self.atomRouted ) ),
+                       'buildSeconds': round( self.buildSeconds, 4 ),
+                       'verifySeconds': round( time() - start, 4 ) } }
+
+    # Changes
+
+    def update( self, node, routes=None, flows=None ):
+        """Replace a node's routes ( or a switch's flows ) and update the
+           signatures of the atoms they touch.
+           returns: [ ( lo, hi ) ] address ranges whose treatment changed"""
+        if flows is not None:
+            info = self.snap[ 'switches' ][ node ]
+            wasL3 = node in self.l3switches
+            info[ 'flows' ] = flows
+            if wasL3 != any( f[ 1 ] and f[ 2 ] for f in flows ):
+                # The switch starts or stops routing: domains change too
+                self.build()
+                return [ ( 0, FULL ) ]
+            if not wasL3:
+                return []
+        else:
+            self.snap[ 'nodes' ][ node ][ 'routes' ] = routes
+        oldRuns, oldKeys = self.runs[ node ], self.keys[ node ]
+        if flows is not None:
+            self.setFlows( node )
+        else:
+            self.setRoutes( node )
+        self.setKeys( node )
+        self.actions.pop( node, None )
+        forwards = node in self.forwarders
+        ranges, acc, lo = [], 0, None
+        for addr, change in self.changes( node, oldRuns, oldKeys ):
+            self.split( addr )
+            # Apply the running change to the atoms up to this boundary
+            if acc:
+                for atom in range( self.atomOf( lo ), self.atomOf( addr ) ):
+                    self.atomSig[ atom ] ^= acc
+                    if forwards:
+                        self.atomRouted[ atom ] ^= acc
+                ranges.append( ( lo, addr ) )
+            acc ^= change
+            lo = addr
+        if acc:
+            for atom in range( self.atomOf( lo ), len( self.starts ) ):
+                self.atomSig[ atom ] ^= acc
+                if forwards:
+                    self.atomRouted[ atom ] ^= acc
+            ranges.append( ( lo, FULL ) )
+        return mergeRanges( ranges )
+
+    def split( self, addr ):
+        "Make addr the start of an atom."
+        atom = self.atomOf( addr )
+        if self.starts[ atom ] != addr:
+            self.starts.insert( atom + 1, addr )
+            self.atomSig.insert( atom + 1, self.atomSig[ atom ] )
+            self.atomRouted.insert( atom + 1, self.atomRouted[ atom ] )
+
+    def recheck( self, ranges ):
+        """Re-verify only what ranges ( from update() ) can affect: pairs
+           from or to an address in them, and loops among their atoms.
+           returns: { 'pairs': pairs whose status changed, with 'was',
+                      'loops': new loops, 'cleared': loops gone,
+                      'blackholes': in the changed pairs,
+                      'prefixes', 'seconds' }"""
+        start = time()
+        ranges = mergeRanges( ranges )
+
+        def touched( ip ):
+            "Is an address in one of the ranges?"
+            addr = ipInt( ip )
+            i = bisect_right( ranges, ( addr, FULL ) ) - 1
+            return i >= 0 and ranges[ i ][ 0 ] <= addr < ranges[ i ][ 1 ]
+
+        moved = set( n for n in self.hosts
+                     if any( touched( a ) for a in self.hostAddrs( n ) ) )
+        changed = []
+        for key, old in sorted( self.pairResults.items() ):
+            src, addr = key
+            if src not in moved and not touched( addr ):
+                continue
+            new = self.tracePair( src, old[ 'dst' ], addr )
+            self.pairResults[ key ] = new
+            if ( new[ 'status' ], new[ 'path' ] ) != ( old[ 'status' ],
+                                                       old[ 'path' ] ):
+                changed.append( dict( new, was=old[ 'status' ] ) )
+        atoms = []
+        for lo, hi in ranges:
+            atoms += range( self.atomOf( lo ), self.atomOf( hi - 1 ) + 1 )
+        found = self.findLoops( atoms )
+        before = set( c for c, r in self.loopRanges.items() if r )
+        for cycle, old in list( self.loopRanges.items() ):
+            self.loopRanges[ cycle ] = subtractRanges( old, ranges )
+        for cycle, inside in found.items():
+            self.loopRanges[ cycle ] = mergeRanges(
+                self.loopRanges.get( cycle, [] ) +
+                [ self.atomRange( a ) for a in inside ] )
+        # A loop is gone only once none of its ranges is left anywhere
+        after = set( c for c, r in self.loopRanges.items() if r )
+        return {
+            'prefixes': sum( [ rangePrefixes( lo, hi )
+                               for lo, hi in ranges ], [] ),
+            'pairs': changed,
+            'loops': [ { 'cycle': list( c ), 'prefixes': sum(
+                [ rangePrefixes( *self.atomRange( a ) )
+                  for a in found[ c ] ], [] )[ :8 ] }
+                       for c in sorted( found ) if c not in before ],
+            'cleared': [ { 'cycle': list( c ) }
+                         for c in sorted( before - after ) ],
+            'blackholes': self.blackholes( changed ),
+            'seconds': time() - start }
@@ -0,0 +1,282 @@
+"""
+warm.py: keep a built topology between runs and restore it quickly
+
+Building a ysn topology creates namespaces, veths, OVS bridges, routes
+and sysctls, and for short benchmark runs scheduled back to back that
+build dominates.  WarmMininet keeps the kernel objects instead:
+
+    save     right after the first ( cold ) start, the network's state
+             ( see Snapshot in ysn/verify.py: addresses, MACs, routes,
+             OVS ports and flows ) and the topology's fingerprint go
+             to the state file, and every node namespace is pinned
+             with 'ip netns attach'
+    stop     controllers stop and node shells exit, but namespaces,
+             veths and bridges stay
+    restore  if the topology is unchanged and the namespaces and
+             bridges survived, new node shells enter the pinned
+             namespaces, links wrap the surviving veths, and only nodes
+             ( or switches ) whose state no longer matches the saved
+             one are reconfigured ( or restarted and their flows
+             replaced )
+
+Anything else ( a changed topology, a missing namespace or bridge, a
+switch that is not OVS ) falls back to a cold build after discarding
+what was kept.  Sysctls live in the namespaces and are kept as they
+were at the end of the last run.
+
+    net = WarmMininet( topo=topo, state='/tmp/ysn_5.warm' )
+    ...
+    net.stop()                 # keeps everything for the next run
+    discardState( '/tmp/ysn_5.warm' )  # tears it down for good
+"""
+
+import hashlib
+import json
+import os
+
+from mininet.link import Link
+from mininet.log import info, warn
+from mininet.node import Node, OVSSwitch
+from mininet.util import quietRun
+
+from ysn.router import batchCmd, writeBatch
+from ysn.startup import ParallelMininet
+from ysn.verify import Snapshot, SEP
+
+# First command on a node whose state no longer matches
+FLUSH_CMD = 'ip -4 route flush table main'
+
+
+def fingerprint( topo ):
+    "Hash of a topo's nodes, links and options."
+    def name( obj ):
+        "Classes by name, anything else as text."
+        return getattr( obj, '__name__', str( obj ) )
+    desc = json.dumps( [ [ ( n, topo.nodeInfo( n ) ) for n in topo.nodes() ],
+                         topo.links( sort=True, withInfo=True ) ],
+                       sort_keys=True, default=name )
+    return hashlib.sha1( desc.encode( 'utf-8' ) ).hexdigest()
+
+def inNetns( cls, netns ):
+    "Subclass of node class cls whose shell enters named namespace netns."
+
+    class WarmNode( cls ):
+        "A node restored into its kept namespace."
+
+        def _popen( self, cmd, **params ):
+            if not self.shell and cmd[ :1 ] == [ 'mnexec' ]:
+                # The shell: no new namespace, enter the kept one
+                cmd = [ 'ip', 'netns', 'exec', netns, 'mnexec',
+                        cmd[ 1 ].replace( 'n', '' ) ] + cmd[ 2: ]
+            return cls._popen( self, cmd, **params )
+
+    WarmNode.__name__ = cls.__name__
+    return WarmNode
+
+
+class WarmLink( Link ):
+    "A Link whose veth pair survived the last run."
+
+    @classmethod
+    def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
+                      node1=None, node2=None, deleteIntfs=True ):
+        "Nothing to create."
+        return None
+
+
+def netnsList():
+    "Names of the pinned namespaces."
+    return set( line.split()[ 0 ] for line in
+                quietRun( 'ip netns list' ).splitlines() if line.strip() )
+
+def bridgePorts( bridges ):
+    "{ bridge: sorted port names } of OVS bridges, in one shell."
+    if not bridges:
+        return {}
+    out = quietRun( '; '.join( "echo '%s %s'; ovs-vsctl list-ports %s" %
+                               ( SEP, b, b ) for b in bridges ), shell=True )
+    ports = {}
+    for chunk in out.split( SEP + ' ' )[ 1: ]:
+        name, _, text = chunk.partition( '\n' )
+        ports[ name.strip() ] = sorted( text.split() )
+    return ports
+
+def loadState( path ):
+    "Saved state, or None."
+    if not path or not os.path.exists( path ):
+        return None
+    with open( path ) as f:
+        return json.load( f )
+
+def discardState( path ):
+    "Tear down what a state file kept and remove the file."
+    state = loadState( path )
+    if not state:
+        return
+    info( '*** Discarding kept network %s\n' % path )
+    lines = [ 'netns delete %s' % ns for ns in
+              sorted( set( state[ 'netns' ].values() ) & netnsList() ) ]
+    cmds = [ batchCmd( lines ) ] + [
+        'ovs-vsctl --if-exists del-br %s' % b for b in state[ 'bridges' ] ]
+    quietRun( '; '.join( c for c in cmds if c ), shell=True )
+    os.remove( path )
+
+
+class WarmMininet( ParallelMininet ):
+    "ParallelMininet that keeps its network between runs."
+
+    def __init__( self, *args, **kwargs ):
+        """state: state file ( required )
+           keep: keep the network at stop() ( True )
+           other arguments are passed to ParallelMininet"""
+        self.statePath = kwargs.pop( 'state' )
+        self.keep = kwargs.pop( 'keep', True )
+        self.saved, self.warm, self.stale = None, False, None
+        ParallelMininet.__init__( self, *args, **kwargs )
+
+    def netnsName( self, name ):
+        "Pinned namespace of a node."
+        return 'ysn-%s-%s' % ( self.fingerprint[ :8 ], name )
+
+    def build( self ):
+        "Restore the kept network if it survived, else build it."
+        self.fingerprint = fingerprint( self.topo )
+        saved = loadState( self.statePath )
+        if saved:
+            bridges = saved[ 'bridges' ]
+            self.warm = ( saved[ 'fingerprint' ] == self.fingerprint and
+                          set( saved[ 'netns' ].values() ) <= netnsList()
+                          and set( bridges ) <= set( quietRun(
+                              'ovs-vsctl list-br' ).split() ) )
+            if not self.warm:
+                warn( '*** Kept network is stale, building afresh\n' )
+                discardState( self.statePath )
+            else:
+                self.saved = saved
+                info( '*** Restoring kept network\n' )
+        ParallelMininet.build( self )
+
+    def addHost( self, name, cls=None, **params ):
+        "Add a host, in its kept namespace when restoring."
+        if self.warm and name in self.saved[ 'netns' ]:
+            cls = inNetns( cls or self.host, self.saved[ 'netns' ][ name ] )
+        return ParallelMininet.addHost( self, name, cls, **params )
+
+    def addLink( self, node1, node2, port1=None, port2=None,
+                 cls=None, **params ):
+        "Add a link, wrapping the kept veth pair when restoring."
+        if not self.warm or self.built:
+            return ParallelMininet.addLink( self, node1, node2, port1, port2,
+                                            cls, **params )
+        link = ParallelMininet.addLink( self, node1, node2, port1, port2,
+                                        WarmLink, **params )
+        for intf in link.intf1, link.intf2:
+            intf.mac = self.saved[ 'macs' ].get( intf.name, intf.mac )
+        return link
+
+    def staleNodes( self ):
+        """Compare the kept network with the saved state.
+           returns: ( stale host names, stale switch names )"""
+        # Round-trip through JSON, as the saved state was
+        live = json.loads( json.dumps( Snapshot.capture( self ).data ) )
+        saved = self.saved[ 'snapshot' ]
+        keys = ( 'addrs', 'macs', 'routes' )
+        hosts = [ h.name for h in self.hosts
+                  if [ live[ 'nodes' ][ h.name ][ k ] for k in keys ] !=
+                  [ saved[ 'nodes' ][ h.name ][ k ] for k in keys ] ]
+        ports = bridgePorts( self.saved[ 'bridges' ] )
+        switches = [ s.name for s in self.switches
+                     if live[ 'switches' ][ s.name ][ 'flows' ] !=
+                     saved[ 'switches' ][ s.name ][ 'flows' ] or
+                     ports.get( s.name ) != sorted(
+                         saved[ 'switches' ][ s.name ][ 'ports' ] ) ]
+        return hosts, switches
+
+    def configHosts( self ):
+        "Reconfigure only the restored nodes that no longer match."
+        if not self.warm:
+            return ParallelMininet.configHosts( self )
+        hosts, switches = self.stale = self.staleNodes()
+        stale = [ self[ n ] for n in hosts ]
+        for node in self.hosts + self.switches:
+            if node not in stale:
+                # Record the addresses on the Intfs, nothing to run
+                self.nodeAddrs( node )
+        info( '*** Restored %d nodes, reconfiguring %d, restarting %d '
+              'switches\n' % ( len( self.hosts ), len( hosts ),
+                               len( switches ) ) )
+        if stale:
+            self.configNodes( stale, first=FLUSH_CMD )
+        return None
+
+    def start( self ):
+        "Start controllers and the switches that need it, then save."
+        if not self.warm:
+            ParallelMininet.start( self )
+            if self.keep:
+                self.save()
+            return
+        switches = self.switches
+        self.switches = [ s for s in switches if s.name in self.stale[ 1 ] ]
+        try:
+            ParallelMininet.start( self )
+        finally:
+            self.switches = switches
+        for name in self.stale[ 1 ]:
+            path = writeBatch( [ self.saved[ 'flows' ][ name ] ],
+                               suffix='.flows' )
+            quietRun( 'ovs-ofctl replace-flows %s %s; rm -f %s' % (
+                name, path, path ), shell=True )
+
+    def save( self ):
+        "Pin the node namespaces and save the state of the fresh network."
+        if not all( isinstance( s, OVSSwitch ) for s in self.switches ):
+            warn( '*** Only OVS switches can be kept; not keeping\n' )
+            self.keep = False
+            return
+        hosts = [ h for h in self.hosts if h.inNamespace ]
+        netns = dict( ( h.name, self.netnsName( h.name ) ) for h in hosts )
+        output = quietRun( batchCmd( [ 'netns attach %s %s' % (
+            netns[ h.name ], h.pid ) for h in hosts ] ), shell=True )
+        if output.strip():
+            warn( '*** Pinning namespaces: %s\n' % output.strip() )
+        snap = Snapshot.capture( self )
+        bridges = sorted( s.name for s in self.switches )
+        flows = {}
+        for bridge in bridges:
+            # Just the flows, in a form replace-flows takes back
+            dump = quietRun( 'ovs-ofctl dump-flows --no-stats %s' % bridge )
+            flows[ bridge ] = '\n'.join( line.strip()
+                                         for line in dump.splitlines()
+                                         if 'actions=' in line )
+        macs = {}
+        for kind in 'nodes', 'switches':
+            for entry in snap.data[ kind ].values():
+                macs.update( entry[ 'macs' ] )
+        with open( self.statePath, 'w' ) as f:
+            json.dump( { 'fingerprint': self.fingerprint, 'netns': netns,
+                         'bridges': bridges, 'snapshot': snap.data,
+                         'flows': flows, 'macs': macs }, f )
+
+    def stop( self ):
+        "Keep the network for the next run, or stop it and discard it."
+        if not self.keep:
+            ParallelMininet.stop( self )
+            discardState( self.statePath )
+            return
+        info( '*** Keeping the network for a warm start\n' )
+        for controller in self.controllers:
+            controller.stop()
+        for node in self.hosts + self.switches:
+            # Only the shell goes: namespaces, veths and bridges stay
+            Node.terminate( node )
+
+
+def useWarmStart( script, state, keep=True ):
+    "Make a loaded ysn script build its network as a WarmMininet."
+    def makeNet( *args, **kwargs ):
+        "The script's network, kept in state."
+        return WarmMininet( state=state, keep=keep, *args, **kwargs )
+
+    script.Mininet = makeNet
+    return script
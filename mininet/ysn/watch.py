@@ -0,0 +1,148 @@
+"""
+watch.py: keep a verification Model in step with a running network
+
+Operators change routes and flows at the CLI ( e.g. the
+"ip route del 10.1.3.0/24 via 10.1.4.1" of ysn_5.py ), and every change
+invalidates the last reachability check.  A Watcher subscribes to the
+changes instead of polling for them:
+
+    routers       ip -o monitor route in each router's namespace; every
+                  netlink event is applied to that router's table
+    OVS switches  ovs-ofctl monitor watch:, and the switch's table 0 is
+                  re-read after each batch of flow-mods
+
+After each batch of events only the changed tables are rebuilt, only
+the address ranges they changed are re-verified ( Model.update() and
+Model.recheck() in ysn/verify.py ), and the callback gets the pairs
+whose status changed plus any loops that appeared or went away.
+
+    watcher = Watcher( net, model, callback=printChange )
+    watcher.start(); CLI( net ); watcher.stop()
+"""
+
+from subprocess import Popen, PIPE, STDOUT
+from threading import Thread
+from time import time
+
+from mininet.log import info, warn
+from mininet.node import OVSSwitch
+from mininet.util import pmonitor, quietRun
+
+from ysn.verify import parseRoute, bestRoutes, parseFlows, mergeRanges
+
+# Quiet time that ends a batch of events, in ms
+BATCH_MS = 5
+
+
+def routeKey( route ):
+    "What identifies a route in the main table: prefix and metric."
+    return route[ 0 ], route[ 3 ]
+
+
+class Watcher( object ):
+    "Apply a running network's route and flow changes to a Model."
+
+    def __init__( self, net, model, callback=None, nodes=None ):
+        """net: running Mininet
+           model: Model of net, verify()'d
+           callback: called with each recheck() report ( plus 'events',
+                     'nodes' and 'seconds' from first event to report )
+           nodes: node names to watch ( default: forwarding nodes )"""
+        self.net = net
+        self.model = model
+        self.callback = callback or ( lambda report: None )
+        self.nodes = nodes or sorted( n for n in model.forwarders
+                                      if n in model.snap[ 'nodes' ] )
+        self.tables = {}  # node -> { ( prefix, metric ): route }
+        self.popens = {}
+        self.thread = None
+        self.reports = []
+
+    def start( self ):
+        "Start the monitors and the event thread."
+        for name in self.nodes:
+            node = self.net[ name ]
+            self.tables[ name ] = dict(
+                ( routeKey( r ), r ) for r in
+                map( parseRoute, node.cmd(
+                    'ip -o -4 route show table main' ).splitlines() )
+                if r )
+            self.popens[ name ] = node.popen(
+                [ 'ip', '-o', '-4', 'monitor', 'route' ],
+                stdout=PIPE, stderr=STDOUT )
+        for name in sorted( self.model.snap[ 'switches' ] ):
+            if isinstance( self.net[ name ], OVSSwitch ):
+                self.popens[ name ] = Popen(
+                    [ 'ovs-ofctl', 'monitor', name, 'watch:' ],
+                    stdout=PIPE, stderr=STDOUT )
+        info( '*** Watching %d routers and %d switches\n' % (
+            len( self.nodes ), len( self.popens ) - len( self.nodes ) ) )
+        self.thread = Thread( target=self.loop )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop( self ):
+        "Stop the monitors and wait for the event thread."
+        for popen in self.popens.values():
+            popen.terminate()
+        if self.thread:
+            self.thread.join()
+        for popen in self.popens.values():
+            popen.wait()
+
+    def loop( self ):
+        "Collect events until the monitors exit, applying each batch."
+        routes, flows, events, first = set(), set(), 0, None
+        for name, line in pmonitor( dict( self.popens ),
+                                    timeoutms=BATCH_MS ):
+            if name is None:
+                if events:
+                    self.apply( routes, flows, events, first )
+                    routes, flows, events = set(), set(), 0
+                continue
+            if name in self.tables:
+                if not self.routeEvent( name, line ):
+                    continue
+                routes.add( name )
+            elif 'event=' in line:
+                flows.add( name )
+            else:
+                if 'ovs-ofctl' in line or 'error' in line.lower():
+                    warn( '*** %s: %s' % ( name, line ) )
+                continue
+            if not events:
+                first = time()
+            events += 1
+
+    def routeEvent( self, name, line ):
+        """Apply one ip monitor line to a router's table.
+           returns: True if the main table changed"""
+        deleted = line.startswith( 'Deleted ' )
+        tokens = line.split()
+        if deleted:
+            tokens.pop( 0 )
+        if 'table' in tokens and 'main' not in tokens:
+            return False
+        route = parseRoute( ' '.join( tokens ) )
+        if not route:
+            return False
+        table = self.tables[ name ]
+        if deleted:
+            return table.pop( routeKey( route ), None ) is not None
+        table[ routeKey( route ) ] = route
+        return True
+
+    def apply( self, routes, flows, events, first ):
+        "Update the model for a batch of changes and report."
+        ranges = []
+        for name in sorted( routes ):
+            ranges += self.model.update(
+                name, routes=bestRoutes( self.tables[ name ].values() ) )
+        for name in sorted( flows ):
+            ranges += self.model.update( name, flows=parseFlows( quietRun(
+                'ovs-ofctl dump-flows %s' % name ) ) )
+        report = self.model.recheck( mergeRanges( ranges ) )
+        report.update( events=events, nodes=sorted( routes | flows ),
+                       seconds=time() - first )
+        self.reports.append( report )
+        self.callback( report )
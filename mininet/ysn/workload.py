@@ -0,0 +1,287 @@
+"""
+workload.py: flow mixes over a topology, and their completion times
+
+Throughput tools ( ysn/throughput.py ) run a few long flows; the tail of
+the flow completion time ( FCT ) of many short ones, e.g. from h1 and h2
+to h5..h8 behind r2, is what a loaded r1-r2 link hurts first.  A
+Workload drives a traffic matrix of entries
+
+    { "src": [ "h1", "h2" ], "dst": [ "h5", "h6", "h7", "h8" ],
+      "rate": 20, "sizes": "websearch" }
+
+each with Poisson flow arrivals at rate flows per second, every flow
+going from a random src to a random dst and its size drawn from a
+heavy-tailed distribution:
+
+    websearch           web search traffic ( DCTCP ), most flows a few
+                        packets, most bytes in flows of MBs
+    datamining          data mining traffic ( VL2 ), more skewed still
+    pareto:MEAN[:ALPHA] Pareto sizes with that mean ( alpha 1.2 )
+    fixed:BYTES         every flow the same size
+
+The whole schedule is drawn up front ( seed it to repeat a run ).
+Every host then runs one flow agent ( ysn/flowagent.py ), an event loop
+that serves the flows sent to it and starts its own on time, however
+many are in flight, so thousands of flows cost one process per host
+rather than one per flow.  Each flow's FCT comes back with its size
+bucket and path class ( see ysn/bench.py ), and fctTable() gives FCT
+distributions per path and bucket.
+"""
+
+import json
+import os
+import random
+import sys
+from subprocess import PIPE, STDOUT
+from tempfile import mkstemp
+from time import time
+
+from mininet.log import info, warn
+from mininet.util import pmonitor
+
+from ysn import flowagent
+from ysn.bench import PathClasses, distribution
+from ysn.throughput import waitListening
+from ysn.topogen import loadSpec
+
+# The flow agent, run by the current interpreter
+AGENT = os.path.splitext( os.path.abspath( flowagent.__file__ ) )[ 0 ] + '.py'
+
+PORT = 5700
+MSS = 1460
+
+# Flow size CDFs in MSS-sized packets, as published with DCTCP and VL2
+SIZES = {
+    'websearch': [ ( 6, 0 ), ( 6, .15 ), ( 13, .2 ), ( 19, .3 ), ( 33, .4 ),
+                   ( 53, .53 ), ( 133, .6 ), ( 667, .7 ), ( 1333, .8 ),
+                   ( 3333, .9 ), ( 6667, .97 ), ( 20000, 1 ) ],
+    'datamining': [ ( 1, 0 ), ( 1, .5 ), ( 2, .6 ), ( 3, .7 ), ( 7, .8 ),
+                    ( 267, .9 ), ( 2107, .95 ), ( 66667, .99 ),
+                    ( 666667, 1 ) ]
+}
+
+# Upper bounds of the FCT size buckets, in bytes
+BUCKETS = ( 10000, 100000, 1000000, 10000000 )
+
+
+def sampleCdf( cdf, u ):
+    "Value at quantile u of a piecewise linear CDF [ ( value, p ) ]."
+    for ( v1, p1 ), ( v2, p2 ) in zip( cdf, cdf[ 1: ] ):
+        if u <= p2:
+            if p2 == p1:
+                return v2
+            return v1 + ( v2 - v1 ) * ( u - p1 ) / ( p2 - p1 )
+    return cdf[ -1 ][ 0 ]
+
+def sizeSampler( spec, rng, maxSize=None ):
+    """Flow size generator for a size spec ( see above ).
+       maxSize: cap on sizes, in bytes
+       returns: function() -> bytes"""
+    kind, _, arg = spec.partition( ':' )
+    if kind in SIZES:
+        cdf = SIZES[ kind ]
+
+        def draw():
+            "Empirical size."
+            return sampleCdf( cdf, rng.random() ) * MSS
+    elif kind == 'pareto':
+        mean, _, alpha = arg.partition( ':' )
+        alpha = float( alpha or 1.2 )
+        scale = float( mean ) * ( alpha - 1 ) / alpha
+
+        def draw():
+            "Pareto size."
+            return scale / ( 1 - rng.random() ) ** ( 1 / alpha )
+    elif kind == 'fixed':
+
+        def draw():
+            "Fixed size."
+            return float( arg )
+    else:
+        raise Exception( 'Unknown flow size distribution %s' % spec )
+
+    def sample():
+        "One flow size, capped."
+        size = max( int( draw() ), 1 )
+        return min( size, maxSize ) if maxSize else size
+
+    return sample
+
+def human( size ):
+    "Byte count as 10K, 1M, ..."
+    for unit, scale in ( ( 'G', 1e9 ), ( 'M', 1e6 ), ( 'K', 1e3 ) ):
+        if size >= scale:
+            return '%g%s' % ( size / scale, unit )
+    return '%d' % size
+
+def bucketOf( size, buckets=BUCKETS ):
+    "Size bucket label of a flow, e.g. '10K-100K'."
+    lower = 0
+    for upper in buckets:
+        if size < upper:
+            return '%s-%s' % ( human( lower ), human( upper ) ) if lower \
+                else '<%s' % human( upper )
+        lower = upper
+    return '>=%s' % human( lower )
+
+def parseEntry( text, rate, sizes ):
+    "Matrix entry of SRC[,SRC]:DST[,DST][:RATE[:SIZES]]."
+    parts = text.split( ':', 3 )
+    if len( parts ) < 2:
+        raise Exception( 'Bad matrix entry %s' % text )
+    return { 'src': parts[ 0 ].split( ',' ), 'dst': parts[ 1 ].split( ',' ),
+             'rate': float( parts[ 2 ] ) if len( parts ) > 2 else rate,
+             'sizes': parts[ 3 ] if len( parts ) > 3 else sizes }
+
+def loadMatrix( path ):
+    "Entries of a JSON or YAML traffic matrix file."
+    spec = loadSpec( path )
+    return spec[ 'matrix' ] if isinstance( spec, dict ) else spec
+
+
+class Workload( object ):
+    "A traffic matrix run as Poisson flow arrivals, with each flow's FCT."
+
+    def __init__( self, net, matrix, seconds=10, rate=10, sizes='websearch',
+                  seed=None, port=PORT, timeout=30, maxSize=None ):
+        """net: running Mininet
+           matrix: entries ( see above ); rate and sizes default to the
+                   arguments of the same name
+           seconds: how long flows keep arriving
+           timeout: seconds before a flow counts as failed
+           maxSize: cap on flow sizes, in bytes"""
+        self.net = net
+        self.matrix = [ dict( { 'rate': rate, 'sizes': sizes }, **entry )
+                        for entry in matrix ]
+        self.seconds = seconds
+        self.seed = seed
+        self.port = port
+        self.timeout = timeout
+        self.maxSize = maxSize
+        self.flows = []
+
+    def schedule( self ):
+        """Draw every flow: arrival time, endpoints and size.
+           returns: [ { 'id', 'at', 'src', 'dst', 'size', 'bucket',
+                        'path' } ] in arrival order"""
+        rng = random.Random( self.seed )
+        paths = PathClasses( self.net )
+        flows = []
+        for entry in self.matrix:
+            size = sizeSampler( entry[ 'sizes' ], rng, self.maxSize )
+            at = rng.expovariate( entry[ 'rate' ] )
+            while at < self.seconds:
+                src = rng.choice( entry[ 'src' ] )
+                dsts = [ d for d in entry[ 'dst' ] if d != src ]
+                if not dsts:
+                    raise Exception( '%s has nowhere to send to' % src )
+                dst = rng.choice( dsts )
+                s = size()
+                flows.append( { 'at': at, 'src': src, 'dst': dst, 'size': s,
+                                'bucket': bucketOf( s ),
+                                'path': paths( self.net[ src ],
+                                               self.net[ dst ] ) } )
+                at += rng.expovariate( entry[ 'rate' ] )
+        flows.sort( key=lambda f: f[ 'at' ] )
+        for i, flow in enumerate( flows ):
+            flow[ 'id' ] = i
+        return flows
+
+    def startAgents( self, flows ):
+        """Start a flow agent on every host that sends or receives.
+           returns: { host name: ( popen, schedule file or None ) }"""
+        sends = dict( ( f[ 'dst' ], [] ) for f in flows )
+        for f in flows:
+            sends.setdefault( f[ 'src' ], [] ).append(
+                [ f[ 'id' ], f[ 'at' ], self.net[ f[ 'dst' ] ].IP(),
+                  self.port, f[ 'size' ] ] )
+        agents = {}
+        for name, mine in sorted( sends.items() ):
+            cmd = [ sys.executable, AGENT, '--port', str( self.port ),
+                    '--timeout', str( self.timeout ) ]
+            path = None
+            if mine:
+                fd, path = mkstemp( prefix='ysn-', suffix='.flows' )
+                with os.fdopen( fd, 'w' ) as f:
+                    json.dump( mine, f )
+                cmd += [ '--schedule', path ]
+            agents[ name ] = ( self.net[ name ].popen(
+                cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT ), path )
+        for name in agents:
+            waitListening( self.net[ name ], self.port, 'tcp' )
+        return agents
+
+    def run( self ):
+        """Run the workload.
+           returns: the flows of schedule(), with 'ok', 'fctMs' and
+                    'lagMs' ( how late the flow started )"""
+        flows = self.schedule()
+        if not flows:
+            warn( '*** No flows arrive within %gs\n' % self.seconds )
+            return flows
+        senders = set( f[ 'src' ] for f in flows )
+        agents = self.startAgents( flows )
+        info( '*** Running %d flows from %d hosts for %gs\n' % (
+            len( flows ), len( senders ), self.seconds ) )
+        for popen, _path in agents.values():
+            popen.stdin.write( b'go\n' )
+            popen.stdin.flush()
+        deadline = time() + self.seconds + self.timeout + 5
+        results, done = {}, set()
+        popens = dict( ( name, a[ 0 ] ) for name, a in agents.items() )
+        for name, line in pmonitor( popens, timeoutms=500 ):
+            if name and line.strip():
+                try:
+                    record = json.loads( line )
+                except ValueError:
+                    warn( '*** %s: %s\n' % ( name, line.strip() ) )
+                    continue
+                if record.get( 'done' ):
+                    done.add( name )
+                else:
+                    results[ record[ 'id' ] ] = record
+            if done >= senders or time() > deadline:
+                break
+        for popen, path in agents.values():
+            # The agents exit when their stdin closes
+            popen.stdin.close()
+            if path:
+                os.remove( path )
+        for popen, _path in agents.values():
+            popen.wait()
+        for flow in flows:
+            record = results.get( flow[ 'id' ], {} )
+            flow[ 'ok' ] = bool( record.get( 'ok' ) )
+            flow[ 'fctMs' ] = ( round( record[ 'fct' ] * 1000, 3 )
+                                if record.get( 'fct' ) is not None else None )
+            flow[ 'lagMs' ] = ( round( record[ 'lag' ] * 1000, 3 )
+                                if 'lag' in record else None )
+        self.flows = flows
+        return flows
+
+
+def fctTable( flows ):
+    """FCT distributions ( ms ) per path class and size bucket, plus
+       'all' for every path.
+       returns: { path: { bucket: distribution + flows, failed, meanMs } }"""
+    groups = {}
+    for flow in flows:
+        for path in flow[ 'path' ], 'all':
+            groups.setdefault( path, {} ).setdefault(
+                flow[ 'bucket' ], [] ).append( flow )
+    table = {}
+    for path, buckets in groups.items():
+        for bucket, members in buckets.items():
+            fcts = [ f[ 'fctMs' ] for f in members if f[ 'ok' ] ]
+            d = distribution( fcts )
+            d.update( flows=len( members ),
+                      failed=len( members ) - len( fcts ),
+                      meanMs=sum( fcts ) / len( fcts ) if fcts else None,
+                      bytes=sum( f[ 'size' ] for f in members ) )
+            table.setdefault( path, {} )[ bucket ] = d
+    return table
+
+def bucketOrder( bucket ):
+    "Sort key of size bucket labels, smallest first."
+    labels = [ bucketOf( 0 ) ] + [ bucketOf( b ) for b in BUCKETS ]
+    return labels.index( bucket ) if bucket in labels else len( labels )
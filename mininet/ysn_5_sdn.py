@@ -2,13 +2,20 @@
 
 """
 SDN topology of ysn_5.py
+
+Run with --proactive to install the L3 flows of s6/s7 ( and NORMAL on
+the other switches ) up front instead of leaving every new flow to the
+controller; see ysn/proactive.py.
 """
 
+import sys
+
 from mininet.topo import Topo
 from mininet.net import Mininet
 from mininet.node import Node, Controller, RemoteController
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
+from ysn.proactive import installProactive
 
 class NetworkTopo( Topo ): 
 
@@ -50,7 +57,7 @@ class NetworkTopo( Topo ):
 
 		self.addLink(h2,s5,intfName1='h2-eth1',params1={'ip':'10.1.4.4/24'})
 
-def run():
+def run( proactive=False ):
 	topo = NetworkTopo()
 	net = Mininet( topo=topo, controller = RemoteController('c1'))
 	net.start()
@@ -62,9 +69,11 @@ def run():
 	print net['h6'].cmd('route add default gw 10.1.3.1')       
 	print net['h7'].cmd('route add default gw 10.1.4.1')
 	print net['h8'].cmd('route add default gw 10.1.4.1')
+	if proactive:
+		installProactive( net )
 	CLI( net )
 	net.stop()
 
 if __name__ == '__main__':
 	setLogLevel('info')
-	run()
+	run( proactive='--proactive' in sys.argv )
@@ -3,28 +3,30 @@
 
 from mininet.topo import Topo
 from mininet.net import Mininet
-from mininet.node import Node, OVSKernelSwitch, RemoteController, Controller, OVSBridge
+from mininet.node import OVSKernelSwitch, RemoteController, Controller, OVSBridge
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
+from ysn.router import LinuxRouter
+from ysn.shaping import applyShaping
 
-class LinuxRouter( Node ):
-    "A Node with IP forwarding enabled."
+# Static routes, installed in bulk by LinuxRouter.config()
+R1_ROUTES = [ '192.32.2.0/24 dev r1-eth2',
+              '10.1.2.0/24 via 192.32.2.8',
+              '10.1.3.0/24 via 192.32.2.8',
+              '10.1.4.0/24 via 192.32.2.8' ]
+R2_ROUTES = [ '192.31.2.0/24 dev r2-eth1',
+              '10.1.1.0/24 via 192.31.2.1' ]
 
-    def config( self, **params ):
-        super( LinuxRouter, self).config( **params )
-        # Enable forwarding on the router
-        self.cmd( 'sysctl net.ipv4.ip_forward=1' )
-
-    def terminate( self ):
-        self.cmd( 'sysctl net.ipv4.ip_forward=0' )
-        super( LinuxRouter, self ).terminate()
+# The r1-r2 link stands in for the WAN ( see ysn/shaping.py )
+WAN_SHAPE = 'wan'
 
 
 class NetworkTopo( Topo ):
     "A simple topology of a router with three subnets (one host in each)."
 
     def build( self, **_opts ):
-        r1 = self.addNode( 'r1', cls=LinuxRouter, ip='10.1.1.1/24')
+        r1 = self.addNode( 'r1', cls=LinuxRouter, ip='10.1.1.1/24',
+                           routes=R1_ROUTES )
         # TODO: Rename this to s1
         s1 = self.addSwitch('s1', cls=OVSKernelSwitch, failMode='standalone')
         self.addLink(r1, s1, intfName1='r1-eth1', params1={'ip': '10.1.1.1/24'})
@@ -34,8 +36,10 @@ class NetworkTopo( Topo ):
         self.addLink( h2, s1)        
 
         # router2
-        r2 = self.addNode( 'r2', cls=LinuxRouter, ip='192.32.2.8/24' )
-        self.addLink( r1, r2, intfName1='r1-eth2', intfName2='r2-eth1', params1={'ip' : '192.31.2.1/24'}, params2={'ip' : '192.32.2.8/24'})
+        r2 = self.addNode( 'r2', cls=LinuxRouter, ip='192.32.2.8/24',
+                           routes=R2_ROUTES )
+        self.addLink( r1, r2, intfName1='r1-eth2', intfName2='r2-eth1', params1={'ip' : '192.31.2.1/24'}, params2={'ip' : '192.32.2.8/24'},
+                      shape=WAN_SHAPE )
 
         # subnet 10.1.2.0/24
         s2 = self.addSwitch('s2', cls=OVSKernelSwitch, failMode='standalone')
@@ -80,14 +84,8 @@ def run():
     net['s4'].start([c1])
     net['s5'].start([c1])            
     net.start()
-    print net['r1'].cmd('ip route add 192.32.2.0/24 dev r1-eth2')
-    print net['r1'].cmd('ip route add 10.1.2.0/24 via 192.32.2.8')
-    print net['r1'].cmd('ip route add 10.1.3.0/24 via 192.32.2.8')
-    print net['r1'].cmd('ip route add 10.1.4.0/24 via 192.32.2.8')            
-    print net['r2'].cmd('ip route add 192.31.2.0/24 dev r2-eth1')
-    print net['r2'].cmd('ip route add 10.1.1.0/24 via 192.31.2.1')
-
-    
+    applyShaping( net )
+
     info( '*** Routing Table on MX-104\n' )
     print net[ 'r1' ].cmd( 'route' )
     info( '*** Routing Table on KBT\n' )
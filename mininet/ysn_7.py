@@ -3,9 +3,12 @@
 
 from mininet.topo import Topo
 from mininet.net import Mininet
-from mininet.node import Node, OVSKernelSwitch, RemoteController, Controller, OVSBridge, OVSSwitch
+from mininet.node import OVSKernelSwitch, RemoteController, Controller, OVSBridge, OVSSwitch
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
+from ysn.router import LinuxRouter, applySysctls
+from ysn.shaping import applyShaping
+from ysn.multipath import nexthops, multipathRoutes, multipathSysctls
 
 
 c0 = Controller( 'c0', port=6633 )
@@ -17,37 +20,68 @@ class MultiSwitch( OVSSwitch ):
     "Custom Switch() subclass that connects to different controllers"
     def start( self, controllers ):
         print "starting ", self.name
-        return OVSSwitch.start( self, [ cmap[ self.name ] ] )
-
-class LinuxRouter( Node ):
-    "A Node with IP forwarding enabled."
-
-    def config( self, **params ):
-        super( LinuxRouter, self).config( **params )
-        # Enable forwarding on the router
-        self.cmd( 'sysctl net.ipv4.ip_forward=1' )
-
-    def terminate( self ):
-        self.cmd( 'sysctl net.ipv4.ip_forward=0' )
-        super( LinuxRouter, self ).terminate()
+        # cmap may be rebalanced at runtime ( see ysn/assign.py )
+        if self.name in cmap:
+            controllers = [ cmap[ self.name ] ]
+        return OVSSwitch.start( self, controllers )
+
+# Static routes, installed in bulk by LinuxRouter.config()
+R1_ROUTES = [ '192.32.2.0/24 dev r1-eth2',
+              '10.1.2.0/24 via 192.32.2.8',
+              '10.1.3.0/24 via 192.32.2.8',
+              '10.1.4.0/24 via 192.32.2.8' ]
+R2_ROUTES = [ '192.31.2.0/24 dev r2-eth1',
+              '10.1.1.0/24 via 192.31.2.1' ]
+
+# The r1-r2 link stands in for the WAN ( see ysn/shaping.py )
+WAN_SHAPE = 'wan'
+
+# 10.1.1.0/24 and 10.1.4.0/24 are joined both over r1-r2 and through the
+# dual-homed h2; use both paths, hashing flows by MULTIPATH ( 'l3', 'l4',
+# or None for single-path routing; see ysn/multipath.py )
+MULTIPATH = 'l4'
+R1_MULTIPATH = { '10.1.4.0/24': [ ( '192.32.2.8', 'r1-eth2' ),
+                                  ( '10.1.1.3', 'r1-eth1' ) ] }
+R2_MULTIPATH = { '10.1.1.0/24': [ ( '192.31.2.1', 'r2-eth1' ),
+                                  ( '10.1.4.4', 'r2-eth4' ) ] }
+H2_NEXTHOPS = [ ( '10.1.1.1', 'h2-eth0' ), ( '10.1.4.1', 'h2-eth1' ) ]
+
+# h2 is dual-homed: let it forward and accept asymmetric traffic
+H2_SYSCTLS = { 'net.ipv4.ip_forward': 1,
+               'net.ipv4.conf.default.rp_filter': 0,
+               'net.ipv4.conf.all.rp_filter': 0,
+               'net.ipv4.conf.h2-eth0.rp_filter': 0,
+               'net.ipv4.conf.h2-eth1.rp_filter': 0 }
 
 
 class NetworkTopo( Topo ):
     "A simple topology of a router with three subnets (one host in each)."
 
     def build( self, **_opts ):
-        r1 = self.addNode( 'r1', cls=LinuxRouter, ip='10.1.1.1/24')
+        r1 = self.addNode( 'r1', cls=LinuxRouter, ip='10.1.1.1/24',
+                           routes=multipathRoutes( R1_ROUTES, R1_MULTIPATH,
+                                                   MULTIPATH ),
+                           sysctls=multipathSysctls( MULTIPATH,
+                                                     R1_MULTIPATH ) )
         # TODO: Rename this to s1
         s1 = self.addSwitch('s1', cls=MultiSwitch) #, failMode='standalone')
         self.addLink(r1, s1, intfName1='r1-eth1', params1={'ip': '10.1.1.1/24'})
         h1 = self.addHost( 'h1', ip='10.1.1.2/24', defaultRoute='via 10.1.1.1' )
-        h2 = self.addHost( 'h2', ip='10.1.1.3/24', defaultRoute='via 10.1.1.1' )
+        h2 = self.addHost( 'h2', ip='10.1.1.3/24',
+                           defaultRoute=nexthops( H2_NEXTHOPS, MULTIPATH ),
+                           sysctls=dict( multipathSysctls( MULTIPATH ),
+                                         **H2_SYSCTLS ) )
         self.addLink( h1, s1)
         self.addLink( h2, s1)        
 
         # router2
-        r2 = self.addNode( 'r2', cls=LinuxRouter, ip='192.32.2.8/24' )
-        self.addLink( r1, r2, intfName1='r1-eth2', intfName2='r2-eth1', params1={'ip' : '192.31.2.1/24'}, params2={'ip' : '192.32.2.8/24'})
+        r2 = self.addNode( 'r2', cls=LinuxRouter, ip='192.32.2.8/24',
+                           routes=multipathRoutes( R2_ROUTES, R2_MULTIPATH,
+                                                   MULTIPATH ),
+                           sysctls=multipathSysctls( MULTIPATH,
+                                                     R2_MULTIPATH ) )
+        self.addLink( r1, r2, intfName1='r1-eth2', intfName2='r2-eth1', params1={'ip' : '192.31.2.1/24'}, params2={'ip' : '192.32.2.8/24'},
+                      shape=WAN_SHAPE )
 
         # subnet 10.1.2.0/24
         s2 = self.addSwitch('s2', cls=MultiSwitch, failMode='standalone')
@@ -88,18 +122,8 @@ def run():
         net.addController(c)
     net.build()      
     net.start()
-    print net['r1'].cmd('ip route add 192.32.2.0/24 dev r1-eth2')
-    print net['r1'].cmd('ip route add 10.1.2.0/24 via 192.32.2.8')
-    print net['r1'].cmd('ip route add 10.1.3.0/24 via 192.32.2.8')
-    print net['r1'].cmd('ip route add 10.1.4.0/24 via 192.32.2.8')            
-    print net['r2'].cmd('ip route add 192.31.2.0/24 dev r2-eth1')
-    print net['r2'].cmd('ip route add 10.1.1.0/24 via 192.31.2.1')
-
-    net['h2'].cmd('sysctl net.ipv4.ip_forward=1')
-    net['h2'].cmd('echo 0 > /proc/sys/net/ipv4/conf/default/rp_filter')
-    net['h2'].cmd('echo 0 > /proc/sys/net/ipv4/conf/all/rp_filter')
-    net['h2'].cmd('echo 0 > /proc/sys/net/ipv4/conf/h2-eth0/rp_filter')
-    net['h2'].cmd('echo 0 > /proc/sys/net/ipv4/conf/h2-eth1/rp_filter')                
+    applySysctls( net['h2'], net['h2'].params[ 'sysctls' ] )
+    applyShaping( net )
 
     info( '*** Routing Table on MX-104\n' )
     print net[ 'r1' ].cmd( 'route' )
@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+"""
+ysn_assign.py: balance MultiSwitch switches across controllers
+
+Brings up ysn_7.py or ysn_8.py ( any script whose switches follow a
+module-level cmap ) and lets an Assigner ( see ysn/assign.py ) move
+switches between its controllers by packet-in rate while traffic runs,
+and with --failover off controllers that stop listening.  Reports the
+flow-setup latency of each controller before and after, the moves made
+and where every switch ended up.
+
+    sudo python ysn_assign.py ysn_8.py --load --seconds 20 --failover \\
+        --json assign.json
+
+Without --load the traffic is up to you: --cli opens the CLI with the
+assigner running.
+"""
+
+from argparse import ArgumentParser
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output
+from ysn.scripts import loadScript, runScript
+from ysn.bench import selectPairs, PathClasses, metadata, writeJson
+from ysn.throughput import Flow, runFlows
+from ysn.assign import Assigner, controllerLatency
+
+
+def cell( value, fmt='%.3f' ):
+    "Format a table cell, which may be missing."
+    return fmt % value if value is not None else '-'
+
+def balance( net, cmap, args ):
+    "Run the assigner under load ( or the CLI ) and measure around it."
+    before = controllerLatency( net, cmap, args.samples )
+    assigner = Assigner( net, cmap, interval=args.interval,
+                         threshold=args.threshold, minRate=args.min_rate,
+                         failover=args.failover )
+    assigner.start()
+    try:
+        if args.cli:
+            CLI( net )
+        elif args.load:
+            pairs = selectPairs( net, args.pairs, PathClasses( net ) )
+            # New one-second connections keep packet-ins coming
+            runFlows( [ Flow( src, dst, 'tcp', 1 ) for src, dst in pairs
+                        for _ in range( args.seconds ) ],
+                      args.concurrency or len( pairs ) )
+        else:
+            assigner.stopped.wait( args.seconds )
+    finally:
+        assigner.stop()
+    after = controllerLatency( net, cmap, args.samples )
+    return { 'before': before, 'after': after, 'moves': assigner.moves,
+             'status': assigner.status() }
+
+def report( result ):
+    "Print moves, then latency and load per controller."
+    for move in result[ 'moves' ]:
+        output( '%8.3fs %-6s %-6s -> %-6s %s\n' % (
+            move[ 't' ], move[ 'switch' ], move[ 'from' ], move[ 'to' ],
+            move[ 'reason' ] ) )
+    output( '%-8s %-20s %10s %12s %12s\n' % (
+        'ctrl', 'switches', 'pkt-in/s', 'setup p50 ms', 'after p50 ms' ) )
+    for name, status in sorted( result[ 'status' ].items() ):
+        before = result[ 'before' ].get( name, {} ).get( 'p50' )
+        after = result[ 'after' ].get( name, {} ).get( 'p50' )
+        output( '%-8s %-20s %10.1f %12s %12s%s\n' % (
+            name, ','.join( status[ 'switches' ] ) or '-',
+            status[ 'packetInRate' ], cell( before ), cell( after ),
+            ' ( not listening )' if status[ 'dead' ] else '' ) )
+
+def run():
+    "Run the controller assignment"
+    parser = ArgumentParser( description='Controller load balancing' )
+    parser.add_argument( 'target', nargs='?', default='ysn_8.py',
+                         help='ysn script with a cmap' )
+    parser.add_argument( '--seconds', type=int, default=10 )
+    parser.add_argument( '--interval', type=float, default=1,
+                         help='seconds between checks' )
+    parser.add_argument( '--threshold', type=float, default=.25,
+                         help='load spread that triggers moves' )
+    parser.add_argument( '--min-rate', type=float, default=10,
+                         help='packet-ins/s below which nothing moves' )
+    parser.add_argument( '--failover', action='store_true',
+                         help='move switches off dead controllers' )
+    parser.add_argument( '--load', action='store_true',
+                         help='run iperf connections as load' )
+    parser.add_argument( '--pairs', default='all',
+                         help="load pairs: 'all', 'cross' or src:dst,..." )
+    parser.add_argument( '--concurrency', type=int,
+                         help='load flows at once ( default: one per '
+                              'pair )' )
+    parser.add_argument( '--samples', type=int, default=3,
+                         help='flow setups timed per switch' )
+    parser.add_argument( '--cli', action='store_true',
+                         help='open the CLI instead of waiting' )
+    parser.add_argument( '--json', help='write results to this file' )
+    args = parser.parse_args()
+
+    script = loadScript( args.target )
+    if not getattr( script, 'cmap', None ):
+        parser.error( '%s has no cmap' % args.target )
+    result = runScript( script,
+                        lambda net: balance( net, script.cmap, args ) )
+    report( result )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), result )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
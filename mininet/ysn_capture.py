@@ -0,0 +1,130 @@
+#!/usr/bin/python
+
+"""
+ysn_capture.py: per-flow capture on many interfaces of a ysn topology
+
+Brings up a ysn script ( or generated topology spec ) and captures on
+the chosen interfaces ( every router interface by default ) through
+kernel rings, one agent per node ( see ysn/capture.py ), while the CLI,
+--seconds of waiting or a flow mix ( see ysn/workload.py ) runs.  Prints
+the biggest flows with their retransmits and RTTs, and what every ring
+saw and dropped:
+
+    sudo python ysn_capture.py ysn_5.py --intfs r1-eth2 h2-eth1 --cli
+    sudo python ysn_capture.py ysn_5.py --matrix h1,h2:h5,h6 --rate 50 \\
+        --pcap /tmp/cap --sample 10 --json cap.json
+"""
+
+from argparse import ArgumentParser
+from time import sleep
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import metadata, writeJson, writeCsv
+from ysn.capture import Capture, FIELDS, routerIntfs, flowRow, topFlows
+from ysn.workload import Workload, parseEntry
+
+
+def capture( net, args ):
+    "Capture while the CLI, the wait or the workload runs."
+    cap = Capture( net, args.intfs or routerIntfs( net ), args.snaplen,
+                   args.ring, args.pcap, args.sample, args.pcap_max )
+    cap.start()
+    try:
+        if args.matrix:
+            matrix = [ parseEntry( e, args.rate, args.sizes )
+                       for e in args.matrix ]
+            Workload( net, matrix, args.seconds, args.rate, args.sizes,
+                      args.seed ).run()
+        elif args.cli:
+            CLI( net )
+        else:
+            sleep( args.seconds )
+    finally:
+        cap.stop()
+    return cap
+
+def fmt( value ):
+    "A millisecond figure, or '-'."
+    return '-' if value is None else '%.2f' % value
+
+def report( cap, top ):
+    "Print the biggest flows and the ring counters."
+    output( '%-9s %-4s %-44s %8s %10s %5s %8s %8s\n' % (
+        'intf', 'prot', 'flow ( fwd / rev )', 'packets', 'bytes', 'retx',
+        'rtt ms', 'rev rtt' ) )
+    for flow in topFlows( cap.flows, top ):
+        row = flowRow( flow )
+        ends = '%s:%s > %s:%s' % ( row[ 'src' ], row[ 'sport' ],
+                                   row[ 'dst' ], row[ 'dport' ] )
+        output( '%-9s %-4s %-44s %8d %10d %5d %8s %8s\n' % (
+            row[ 'intf' ], row[ 'proto' ], ends,
+            row[ 'packets' ] + row[ 'revPackets' ],
+            row[ 'bytes' ] + row[ 'revBytes' ],
+            row[ 'retrans' ] + row[ 'revRetrans' ],
+            fmt( row[ 'rttMeanMs' ] ), fmt( row[ 'revRttMeanMs' ] ) ) )
+    output( '%-9s %-8s %10s %8s %8s\n' % (
+        'intf', 'node', 'packets', 'drops', 'flows' ) )
+    for intf in sorted( cap.stats ):
+        s = cap.stats[ intf ]
+        output( '%-9s %-8s %10d %8d %8d\n' % (
+            intf, s[ 'node' ], s[ 'packets' ], s[ 'drops' ], s[ 'flows' ] ) )
+
+def run():
+    "Run the capture"
+    parser = ArgumentParser( description='Ring-buffer per-flow capture' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--intfs', nargs='+', metavar='INTF',
+                         help='interfaces ( default: every router one )' )
+    parser.add_argument( '--snaplen', type=int, default=128,
+                         help='bytes kept of each packet' )
+    parser.add_argument( '--ring', type=int, default=4,
+                         help='ring size per interface, MB' )
+    parser.add_argument( '--pcap', metavar='DIR',
+                         help='write sampled pcaps here' )
+    parser.add_argument( '--sample', type=int, default=1,
+                         help='keep every Nth packet in the pcaps' )
+    parser.add_argument( '--pcap-max', type=int, default=64,
+                         help='MB per pcap at most' )
+    parser.add_argument( '--seconds', type=float, default=10,
+                         help='how long to capture ( or run the matrix )' )
+    parser.add_argument( '--cli', action='store_true',
+                         help='capture while the CLI runs' )
+    parser.add_argument( '--matrix', nargs='+', metavar='ENTRY',
+                         help='run this flow mix while capturing: '
+                         'SRC[,SRC]:DST[,DST][:RATE[:SIZES]]' )
+    parser.add_argument( '--rate', type=float, default=10,
+                         help='flow arrivals per second per entry' )
+    parser.add_argument( '--sizes', default='websearch',
+                         help='flow size distribution' )
+    parser.add_argument( '--seed', type=int )
+    parser.add_argument( '--top', type=int, default=10,
+                         help='flows to print' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--json', help='write flows to this JSON file' )
+    parser.add_argument( '--csv', help='write per-flow rows to this CSV' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    cap = withNetwork( args.target, lambda net: capture( net, args ),
+                       **params )
+    if not cap:
+        return
+    report( cap, args.top )
+    rows = [ flowRow( f ) for f in cap.flows ]
+    if args.json:
+        writeJson( args.json, metadata( target=args.target,
+                                        intfs=args.intfs,
+                                        snaplen=args.snaplen,
+                                        sample=args.sample,
+                                        seconds=args.seconds,
+                                        matrix=args.matrix ),
+                   rows, cap.stats )
+    if args.csv:
+        writeCsv( args.csv, rows, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,90 @@
+#!/usr/bin/python
+
+"""
+ysn_ctlpool.py: manage the controllers kept warm between runs
+
+Pooled controllers ( Maple in ysn_8.py, see ysn/ctlpool.py ) stay up
+after a run so the next one skips their start-up.  This lists them,
+resets or stops them, starts a pooled stub controller, and checks
+whether anything on a port is ready for OpenFlow:
+
+    python ysn_ctlpool.py                       # list
+    python ysn_ctlpool.py --stub 6634 --delay 5 # stub in Maple's place
+    python ysn_ctlpool.py --reset 6634
+    python ysn_ctlpool.py --probe 6634
+    python ysn_ctlpool.py --stop                # all, or --stop 6634
+"""
+
+import sys
+from argparse import ArgumentParser
+from time import time
+
+from mininet.log import setLogLevel, output, error
+from ysn.ctlpool import ( POOL_DIR, STUB_COMMAND, poolEntries, stopPool,
+                          resetEntry, launchEntry, loadEntry, waitReady,
+                          ofReady )
+
+
+def listPool( pool ):
+    "Print the pooled controllers."
+    entries = poolEntries( pool )
+    output( '%-6s %-6s %-8s %10s %-6s %s\n' % (
+        'port', 'name', 'pid', 'up s', 'ready', 'command' ) )
+    for e in entries:
+        output( '%-6d %-6s %-8d %10.0f %-6s %s\n' % (
+            e[ 'port' ], e[ 'name' ], e[ 'pid' ], time() - e[ 'started' ],
+            'yes' if ofReady( '127.0.0.1', e[ 'port' ] ) else 'no',
+            e[ 'cmd' ] ) )
+    return entries
+
+def run():
+    "Manage the controller pool"
+    parser = ArgumentParser( description='Warm controller pool' )
+    parser.add_argument( '--pool', default=POOL_DIR,
+                         help='pool directory ( default %s )' % POOL_DIR )
+    parser.add_argument( '--stop', type=int, nargs='*', metavar='PORT',
+                         help='stop pooled controllers ( default: all )' )
+    parser.add_argument( '--reset', type=int, metavar='PORT',
+                         help="reset a pooled controller's state" )
+    parser.add_argument( '--stub', type=int, metavar='PORT',
+                         help='start a pooled stub controller' )
+    parser.add_argument( '--delay', type=float, default=0,
+                         help='ms the stub holds each packet-in' )
+    parser.add_argument( '--probe', type=int, metavar='PORT',
+                         help='wait for OpenFlow on 127.0.0.1:PORT' )
+    parser.add_argument( '--timeout', type=float, default=10 )
+    args = parser.parse_args()
+
+    if args.stop is not None:
+        output( 'stopped %d controllers\n' % stopPool( args.pool,
+                                                       args.stop ) )
+    elif args.reset:
+        entry = loadEntry( args.pool, args.reset )
+        if not entry:
+            error( 'No pooled controller on port %d\n' % args.reset )
+            sys.exit( 1 )
+        if not resetEntry( entry ):
+            error( '%s has no reset signal\n' % entry[ 'name' ] )
+            sys.exit( 1 )
+    elif args.stub:
+        if loadEntry( args.pool, args.stub ):
+            error( 'Port %d is already pooled\n' % args.stub )
+            sys.exit( 1 )
+        entry = launchEntry( args.pool, 'stub', '%s --port %d --delay %g' % (
+            STUB_COMMAND, args.stub, args.delay ), args.stub, reset='HUP' )
+        output( 'stub pid %d ready in %.3fs\n' % (
+            entry[ 'pid' ], waitReady( '127.0.0.1', args.stub,
+                                       args.timeout ) ) )
+    elif args.probe:
+        try:
+            output( 'ready after %.3fs\n' % waitReady(
+                '127.0.0.1', args.probe, args.timeout ) )
+        except Exception as e:  # pylint: disable=broad-except
+            error( '%s\n' % e )
+            sys.exit( 1 )
+    else:
+        listPool( args.pool )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
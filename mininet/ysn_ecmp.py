@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+"""
+ysn_ecmp.py: aggregate throughput with and without multipath routes
+
+Runs a ysn script ( ysn_5.py, ysn_7.py or ysn_8.py ) once per ECMP hash
+policy ( see ysn/multipath.py ), with 'none' meaning the single-path
+routes, and each time drives concurrent TCP flows across the routers
+while counting what every multipath node sends to each multipath
+prefix over each next hop.  By default the flows run between hosts on
+different multipath prefixes ( those of the script's *_MULTIPATH
+routes ), the only traffic the extra paths can carry.  Reports the
+aggregate rate per policy, its gain over the single path, and how each
+node split its traffic between paths.
+
+    sudo python ysn_ecmp.py ysn_5.py --policies none l3 l4 --seconds 10 \\
+        --json ecmp.json --csv ecmp.csv
+
+l3 hashes on addresses only, so all flows between the same two hosts
+take one path; l4 adds ports, so they spread.
+"""
+
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output, info
+from ysn.scripts import loadScript, runScript
+from ysn.bench import selectPairs, PathClasses, metadata, writeJson, writeCsv
+from ysn.throughput import Flow, runFlows, aggregate
+from ysn.multipath import HASH_POLICIES, PathCounters, multipathPairs
+
+FIELDS = [ 'policy', 'node', 'prefix', 'dev', 'bytes', 'packets', 'share' ]
+
+
+def scriptPrefixes( script ):
+    "Prefixes of a script's multipath routes ( its *_MULTIPATH dicts )."
+    return sorted( set( prefix for name in dir( script )
+                        if name.endswith( '_MULTIPATH' )
+                        for prefix in getattr( script, name ) ) )
+
+def benchmark( net, args, prefixes ):
+    """Run the flows once, counting bytes per next hop.
+       prefixes: the script's multipath prefixes"""
+    paths = PathClasses( net )
+    pairs = ( multipathPairs( net, prefixes ) if args.pairs == 'multipath'
+              else selectPairs( net, args.pairs, paths ) )
+    flows = [ Flow( src, dst, 'tcp', args.seconds, pathClass=paths( src,
+                                                                    dst ) )
+              for src, dst in pairs for _ in range( args.streams ) ]
+    counters = PathCounters( net )
+    counters.start()
+    total = aggregate( runFlows( flows ) )
+    return { 'bps': total[ 'protocols' ].get( 'tcp', {} ).get( 'bps', 0.0 ),
+             'flows': len( flows ), 'failed': total[ 'failed' ],
+             'paths': counters.stop() }
+
+def report( results ):
+    "Print the rate per policy and each node's split."
+    base = results.get( 'none' )
+    output( '%-8s %6s %12s %8s\n' % ( 'policy', 'flows', 'Mbits/sec',
+                                      'gain' ) )
+    for policy, r in sorted( results.items() ):
+        gain = ( '%.2fx' % ( float( r[ 'bps' ] ) / base[ 'bps' ] )
+                 if base and base[ 'bps' ] else '-' )
+        output( '%-8s %6d %12.2f %8s\n' % (
+            policy, r[ 'flows' ], r[ 'bps' ] / 1e6, gain ) )
+        for path in r[ 'paths' ]:
+            output( '         %-6s %-14s %-10s %12d bytes %6s\n' % (
+                path[ 'node' ], path[ 'prefix' ], path[ 'dev' ],
+                path[ 'bytes' ],
+                '%.0f%%' % ( path[ 'share' ] * 100 )
+                if path[ 'share' ] is not None else '-' ) )
+
+def run():
+    "Run the multipath benchmark"
+    parser = ArgumentParser( description='ECMP throughput benchmark' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script with MULTIPATH routes' )
+    parser.add_argument( '--policies', nargs='+',
+                         default=[ 'none', 'l3', 'l4' ],
+                         choices=[ 'none' ] + sorted( HASH_POLICIES ) )
+    parser.add_argument( '--pairs', default='multipath',
+                         help="'multipath', 'all', 'cross' or "
+                         "src:dst,src:dst,..." )
+    parser.add_argument( '--streams', type=int, default=4,
+                         help='flows per pair ( default 4 )' )
+    parser.add_argument( '--seconds', type=int, default=5 )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write per-path results to this file' )
+    args = parser.parse_args()
+
+    results = {}
+    for policy in args.policies:
+        info( '*** Multipath policy %s\n' % policy )
+        # A fresh module each time, so the topology picks up the policy
+        script = loadScript( args.target )
+        if not hasattr( script, 'MULTIPATH' ):
+            parser.error( '%s has no multipath routes' % args.target )
+        script.MULTIPATH = None if policy == 'none' else policy
+        prefixes = scriptPrefixes( script )
+        results[ policy ] = runScript(
+            script, lambda net: benchmark( net, args, prefixes ) )
+    report( results )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results )
+    if args.csv:
+        writeCsv( args.csv, [ dict( path, policy=policy )
+                              for policy, r in sorted( results.items() )
+                              for path in r[ 'paths' ] ], FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
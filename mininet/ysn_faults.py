@@ -0,0 +1,113 @@
+#!/usr/bin/python
+
+"""
+ysn_faults.py: link failures under traffic and failover convergence
+
+Brings up a ysn script ( or generated topology spec ), probes the
+selected host pairs at a high rate and takes links down and up, from a
+schedule file or at random ( see ysn/faults.py ).  Reports, per fault,
+the pairs it cut off, the probes they lost, the time until they were
+reachable again ( the convergence time ) and the time until the kernel
+or controller first changed a route or flow.  Exits with status 1 if a
+pair did not recover.
+
+    sudo python ysn_faults.py ysn_5.py --faults r1r2.json --json static.json
+    sudo python ysn_faults.py ysn_7.py --faults r1r2.json --json sdn.json
+    sudo python ysn_faults.py ysn_8.py --random 5 --seed 1 --down 2
+
+Run the same schedule against a static-route script and an SDN one to
+compare how fast each converges.
+"""
+
+import sys
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import selectPairs, PathClasses, metadata, writeJson, writeCsv
+from ysn.faults import FaultRun, loadFaults, randomFaults, redundantLinks
+
+FIELDS = [ 'at', 'link', 'state', 'lost', 'recoveryMs', 'reactionMs',
+           'changes', 'affectedPairs', 'unrecoveredPairs' ]
+
+
+def cell( value, fmt='%.1f' ):
+    "Format a table cell, which may be missing."
+    return fmt % value if value is not None else '-'
+
+def inject( net, args ):
+    "Inject the faults while probing the selected pairs."
+    if args.faults:
+        faults = loadFaults( args.faults )
+    else:
+        links = ( [ tuple( item.strip().split( ':' ) )
+                    for item in args.links.split( ',' ) ]
+                  if args.links else redundantLinks( net ) )
+        faults = randomFaults( links, args.random, args.down, args.gap,
+                               seed=args.seed )
+    pairs = selectPairs( net, args.pairs, PathClasses( net ) )
+    return FaultRun( net, faults, pairs, args.rate, args.tail ).run()
+
+def report( results ):
+    "Print one line per fault."
+    output( '%8s %-12s %-5s %5s %7s %11s %11s %7s\n' % (
+        'at', 'link', 'state', 'pairs', 'lost', 'recovery ms',
+        'reaction ms', 'changes' ) )
+    for r in results:
+        output( '%8.3f %-12s %-5s %5d %7d %11s %11s %7d\n' % (
+            r[ 'at' ], r[ 'link' ], r[ 'state' ], len( r[ 'affected' ] ),
+            r[ 'lost' ], cell( r[ 'recoveryMs' ] ),
+            cell( r[ 'reactionMs' ] ), r[ 'changes' ] ) )
+        if r[ 'unrecovered' ]:
+            output( '         not recovered: %s\n' %
+                    ' '.join( r[ 'unrecovered' ] ) )
+    down = [ r[ 'recoveryMs' ] for r in results
+             if r[ 'state' ] == 'down' and r[ 'recoveryMs' ] is not None ]
+    if down:
+        output( 'convergence after failures: max %.1f ms, mean %.1f ms\n' % (
+            max( down ), sum( down ) / len( down ) ) )
+
+def run():
+    "Run the fault injection"
+    parser = ArgumentParser( description='Link failure convergence' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--faults', help='JSON/YAML fault schedule' )
+    parser.add_argument( '--random', type=int, default=3,
+                         help='random failures, without --faults '
+                              '( default 3 )' )
+    parser.add_argument( '--links',
+                         help='a:b,a:b,... to fail at random ( default: '
+                              'links with redundancy at both ends )' )
+    parser.add_argument( '--down', type=float, default=3,
+                         help='seconds a random failure lasts' )
+    parser.add_argument( '--gap', type=float, default=3,
+                         help='seconds between random failures' )
+    parser.add_argument( '--seed', type=int )
+    parser.add_argument( '--pairs', default='cross',
+                         help="'all', 'cross' or src:dst,src:dst,..." )
+    parser.add_argument( '--rate', type=int, default=100,
+                         help='probes per second per pair ( default 100 )' )
+    parser.add_argument( '--tail', type=float, default=3,
+                         help='seconds to probe after the last fault' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write per-fault results here' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    results = withNetwork( args.target, lambda net: inject( net, args ),
+                           **params )
+    report( results )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results )
+    if args.csv:
+        writeCsv( args.csv, [ dict( r, affectedPairs=len( r[ 'affected' ] ),
+                                    unrecoveredPairs=len(
+                                        r[ 'unrecovered' ] ) )
+                              for r in results ], FIELDS )
+    sys.exit( 1 if any( r[ 'unrecovered' ] for r in results ) else 0 )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
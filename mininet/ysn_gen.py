@@ -0,0 +1,62 @@
+#!/usr/bin/python
+
+"""
+ysn_gen.py: ysn-style topology generated from a spec file or parameters
+
+    sudo python ysn_gen.py --spec ysn_gen.json
+    sudo python ysn_gen.py --routers 4 --subnets 8 --hosts 16 --depth 2
+
+See ysn/topogen.py for the meaning of each parameter; static routes
+between the routers are computed by ysn/routing.py.
+"""
+
+from argparse import ArgumentParser
+
+from mininet.net import Mininet
+from mininet.log import setLogLevel, info
+from mininet.cli import CLI
+from ysn.topogen import GeneratedTopo
+from ysn.routing import routeTopo
+from ysn.startup import ParallelMininet
+
+
+def parseArgs():
+    "Parse command line; options left unset fall back to the spec/defaults."
+    parser = ArgumentParser( description='Generated ysn topology' )
+    parser.add_argument( '--spec', help='JSON or YAML topology spec' )
+    parser.add_argument( '--routers', type=int )
+    parser.add_argument( '--subnets', type=int, help='subnets per router' )
+    parser.add_argument( '--hosts', type=int, help='hosts per subnet' )
+    parser.add_argument( '--depth', type=int, help='switches per subnet' )
+    parser.add_argument( '--wan', choices=[ 'chain', 'ring' ] )
+    parser.add_argument( '--switch', help='ovsk, ovs, ovsbr, user or lxbr' )
+    parser.add_argument( '--ecmp', action='store_true',
+                         help='install all equal-cost next hops' )
+    parser.add_argument( '--serial', action='store_true',
+                         help='configure nodes one at a time' )
+    parser.add_argument( '--no-cli', action='store_true',
+                         help='exit after bring-up' )
+    return parser.parse_args()
+
+def run():
+    "Build the generated topology"
+    args = parseArgs()
+    params = dict( ( key, value ) for key, value in vars( args ).items()
+                   if value is not None and
+                   key not in ( 'spec', 'no_cli', 'ecmp', 'serial' ) )
+    topo = GeneratedTopo( spec=args.spec, **params )
+    # Static routes are computed here and installed by LinuxRouter.config()
+    routeTopo( topo, ecmp=args.ecmp )
+    cls = Mininet if args.serial else ParallelMininet
+    net = cls( topo=topo, controller=None )
+    net.start()
+    info( '*** %d routers, %d subnets, %d hosts\n' %
+          ( topo.opts[ 'routers' ], len( topo.subnets ),
+            sum( len( s.hosts ) for s in topo.subnets ) ) )
+    if not args.no_cli:
+        CLI( net )
+    net.stop()
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
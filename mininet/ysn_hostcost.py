@@ -0,0 +1,114 @@
+#!/usr/bin/python
+
+"""
+ysn_hostcost.py: processes and memory per node, with and without shells
+
+Brings up a ysn script ( or generated topology spec ) once with ordinary
+hosts and once with light hosts ( ysn/lighthost.py: a named namespace
+configured over netlink, no shell until something needs one ) and
+reports, for every namespaced node, the processes in its namespace and
+their resident ( RSS ) and proportional ( PSS ) memory, along with the
+time from start to a running network.  Routers keep their own class, so
+they show the same cost in both runs.
+
+    sudo python ysn_hostcost.py ysn_5.py --light h3 h4 h5 h6 h7 h8 --nodes
+    sudo python ysn_hostcost.py ysn_gen.json --json cost.json
+"""
+
+from argparse import ArgumentParser
+from time import time
+
+from mininet.log import setLogLevel, output
+from mininet.node import Host
+from ysn.scripts import withNetwork
+from ysn.lighthost import lightHosts, nodeCost
+from ysn.bench import metadata, writeJson, writeCsv
+
+FIELDS = [ 'mode', 'node', 'class', 'pids', 'rssKb', 'pssKb' ]
+
+
+def measure( target, host, ping, params ):
+    "Start the network with host class host and measure its nodes."
+    start = time()
+    result = {}
+
+    def collect( net ):
+        "Called once the network runs."
+        result[ 'setup' ] = time() - start
+        result[ 'nodes' ] = nodeCost( net )
+        if ping:
+            result[ 'loss' ] = net.pingAll()
+
+    withNetwork( target, collect, host=host, **params )
+    return result
+
+def summary( mode, result ):
+    "Totals of one run."
+    nodes = result[ 'nodes' ]
+    pss = [ n[ 'pssKb' ] for n in nodes ]
+    return { 'mode': mode, 'nodes': len( nodes ),
+             'light': sum( 1 for n in nodes if n[ 'class' ] == 'LightHost' ),
+             'pids': sum( n[ 'pids' ] for n in nodes ),
+             'rssKb': sum( n[ 'rssKb' ] for n in nodes ),
+             'pssKb': None if None in pss else sum( pss ),
+             'setup': result[ 'setup' ], 'loss': result.get( 'loss' ) }
+
+def report( results, nodes ):
+    "Print per-node costs ( with nodes ) and each run's totals."
+    if nodes:
+        output( '%-6s %-8s %-12s %5s %10s %10s\n' % (
+            'mode', 'node', 'class', 'pids', 'RSS kB', 'PSS kB' ) )
+        for mode, result in results:
+            for n in result[ 'nodes' ]:
+                output( '%-6s %-8s %-12s %5d %10d %10s\n' % (
+                    mode, n[ 'node' ], n[ 'class' ], n[ 'pids' ],
+                    n[ 'rssKb' ], '-' if n[ 'pssKb' ] is None
+                    else n[ 'pssKb' ] ) )
+        output( '\n' )
+    output( '%-6s %6s %6s %6s %10s %10s %8s %10s\n' % (
+        'mode', 'nodes', 'light', 'pids', 'RSS MB', 'PSS MB', 'setup s',
+        'ping loss' ) )
+    for mode, result in results:
+        s = summary( mode, result )
+        output( '%-6s %6d %6d %6d %10.1f %10s %8.2f %10s\n' % (
+            mode, s[ 'nodes' ], s[ 'light' ], s[ 'pids' ],
+            s[ 'rssKb' ] / 1024.0, '-' if s[ 'pssKb' ] is None
+            else '%.1f' % ( s[ 'pssKb' ] / 1024.0 ), s[ 'setup' ],
+            '-' if s[ 'loss' ] is None else '%g%%' % s[ 'loss' ] ) )
+
+def run():
+    "Compare the cost of ordinary and light hosts"
+    parser = ArgumentParser( description='Per-node process and memory cost' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--light', nargs='+', metavar='HOST',
+                         help='hosts to make light ( default: all )' )
+    parser.add_argument( '--modes', nargs='+', default=[ 'host', 'light' ],
+                         choices=[ 'host', 'light' ] )
+    parser.add_argument( '--nodes', action='store_true',
+                         help='report every node, not just totals' )
+    parser.add_argument( '--ping', action='store_true',
+                         help='check connectivity with pingAll' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--json', help='write results to this JSON file' )
+    parser.add_argument( '--csv', help='write per-node rows to this CSV' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    hosts = { 'host': Host, 'light': lightHosts( args.light ) }
+    results = [ ( mode, measure( args.target, hosts[ mode ], args.ping,
+                                 params ) )
+                for mode in args.modes ]
+    report( results, args.nodes )
+    if args.json:
+        writeJson( args.json, metadata( target=args.target,
+                                        light=args.light ),
+                   dict( results ),
+                   [ summary( mode, result ) for mode, result in results ] )
+    if args.csv:
+        writeCsv( args.csv, [ dict( n, mode=mode ) for mode, result in results
+                              for n in result[ 'nodes' ] ], FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+
+"""
+ysn_latency.py: concurrent RTT matrix over a ysn topology
+
+Brings up a ysn script or a generated topology spec, pings every
+selected host pair at once at a fixed rate, and reports per pair and
+per path class ( 'local', 'r2', 'r1-r2', ... ) the p50/p90/p99/max
+steady-state RTT, with first-packet latency ( ARP plus any controller
+flow setup ) reported separately.  Use --flush-flows on the
+controller-driven setups ( ysn_5_sdn.py, ysn_7.py, ysn_8.py ) so that
+first packets trigger flow setup again.
+
+    sudo python ysn_latency.py ysn_8.py --rate 20 --seconds 10 \\
+        --flush-flows --json ysn_8-rtt.json
+
+With --state FILE the network is kept between runs and restored from
+FILE on the next one ( see ysn/warm.py ); ysn_warm.py --discard FILE
+tears it down.
+"""
+
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import selectPairs, PathClasses, runWaves, metadata, \
+    writeJson, writeCsv
+from ysn.latency import Probe, resetState, aggregate
+
+FIELDS = [ 'src', 'dst', 'srcIp', 'dstIp', 'path', 'sent', 'received',
+           'lossPct', 'firstMs', 'firstSeq', 'samples', 'p50Ms', 'p90Ms',
+           'p99Ms', 'maxMs' ]
+
+
+def benchmark( net, args ):
+    "Probe all selected pairs on a running network."
+    paths = PathClasses( net )
+    probes = [ Probe( src, dst, args.rate, args.seconds, args.warmup,
+                      pathClass=paths( src, dst ) )
+               for src, dst in selectPairs( net, args.pairs, paths ) ]
+    resetState( net, flows=args.flush_flows )
+    runWaves( probes, args.concurrency )
+    return [ p.asDict() for p in probes ], aggregate( probes )
+
+def ms( value ):
+    "Format a latency or a missing one."
+    return '%.3f' % value if value is not None else '-'
+
+def report( results, classes ):
+    "Print the per-pair matrix and the per-class summary."
+    output( '%-6s %-6s %-8s %9s %9s %9s %9s %9s %7s\n' % (
+        'src', 'dst', 'path', 'first', 'p50', 'p90', 'p99', 'max',
+        'loss%' ) )
+    for r in results:
+        output( '%-6s %-6s %-8s %9s %9s %9s %9s %9s %7.1f\n' % (
+            r[ 'src' ], r[ 'dst' ], r[ 'path' ], ms( r[ 'firstMs' ] ),
+            ms( r[ 'p50Ms' ] ), ms( r[ 'p90Ms' ] ), ms( r[ 'p99Ms' ] ),
+            ms( r[ 'maxMs' ] ), r[ 'lossPct' ] ) )
+    output( '\n%-10s %5s %-7s %9s %9s %9s %9s\n' % (
+        'path', 'pairs', '', 'p50', 'p90', 'p99', 'max' ) )
+    for path, entry in sorted( classes.items() ):
+        for kind in 'first', 'steady':
+            d = entry[ kind ]
+            output( '%-10s %5d %-7s %9s %9s %9s %9s\n' % (
+                path, entry[ 'pairs' ], kind, ms( d[ 'p50' ] ),
+                ms( d[ 'p90' ] ), ms( d[ 'p99' ] ), ms( d[ 'max' ] ) ) )
+
+def run():
+    "Run the latency benchmark"
+    parser = ArgumentParser( description='Concurrent RTT matrix' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--pairs', default='all',
+                         help="'all', 'cross' or src:dst,src:dst,..." )
+    parser.add_argument( '--rate', type=float, default=10,
+                         help='probes per second per pair' )
+    parser.add_argument( '--seconds', type=float, default=5 )
+    parser.add_argument( '--warmup', type=int, default=1,
+                         help='probes left out of the steady state' )
+    parser.add_argument( '--concurrency', type=int,
+                         help='pairs at once ( default: all )' )
+    parser.add_argument( '--flush-flows', action='store_true',
+                         help='clear controller-installed flows first' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--state',
+                         help='keep the network here between runs' )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write per-pair results to this file' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    if args.state:
+        params[ 'state' ] = args.state
+    results, classes = withNetwork(
+        args.target, lambda net: benchmark( net, args ), **params )
+    report( results, classes )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results, classes )
+    if args.csv:
+        writeCsv( args.csv, results, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,76 @@
+#!/usr/bin/python
+
+"""
+ysn_linkbench.py: net.build() time against link count
+
+Builds generated ysn topologies of increasing size ( one router, subnets
+of one switch and nine hosts, so ten links per subnet ) and times
+net.build() for
+
+    mininet   - stock Mininet: one round-trip per link and interface
+    parallel  - ParallelMininet with per-link veth creation
+    bulk      - ParallelMininet with BatchLink bulk veth creation
+
+    sudo python ysn_linkbench.py --links 100 500 1000 2000 --json out.json
+"""
+
+import json
+from argparse import ArgumentParser
+from functools import partial
+from time import time
+
+from mininet.net import Mininet
+from mininet.log import setLogLevel, output
+from mininet.clean import cleanup
+from ysn.topogen import GeneratedTopo
+from ysn.startup import ParallelMininet
+
+HOSTS = 9
+
+VARIANTS = { 'mininet': Mininet,
+             'parallel': partial( ParallelMininet, batchLinks=False ),
+             'bulk': partial( ParallelMininet, batchLinks=True ) }
+
+
+def buildTime( netCls, links ):
+    "Return ( links built, seconds spent in net.build() )."
+    subnets = max( 1, links // ( HOSTS + 1 ) )
+    topo = GeneratedTopo( routers=1, subnets=subnets, hosts=HOSTS )
+    net = netCls( topo=topo, controller=None, build=False )
+    start = time()
+    net.build()
+    elapsed = time() - start
+    net.stop()
+    return len( topo.links() ), elapsed
+
+def run():
+    "Run the benchmark matrix"
+    parser = ArgumentParser( description='Link creation benchmark' )
+    parser.add_argument( '--links', type=int, nargs='+',
+                         default=[ 100, 250, 500, 1000 ] )
+    parser.add_argument( '--variants', nargs='+', default=sorted( VARIANTS ),
+                         choices=sorted( VARIANTS ) )
+    parser.add_argument( '--repeat', type=int, default=1 )
+    parser.add_argument( '--json', help='write results to this file' )
+    args = parser.parse_args()
+    cleanup()
+    results = []
+    for links in args.links:
+        for variant in args.variants:
+            for _ in range( args.repeat ):
+                built, elapsed = buildTime( VARIANTS[ variant ], links )
+                results.append( { 'variant': variant, 'links': built,
+                                  'seconds': round( elapsed, 3 ) } )
+    output( '%-10s %8s %10s %12s\n' % ( 'variant', 'links', 'seconds',
+                                        'ms/link' ) )
+    for r in results:
+        output( '%-10s %8d %10.3f %12.3f\n' % (
+            r[ 'variant' ], r[ 'links' ], r[ 'seconds' ],
+            1000.0 * r[ 'seconds' ] / r[ 'links' ] ) )
+    if args.json:
+        with open( args.json, 'w' ) as f:
+            json.dump( results, f, indent=2 )
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    run()
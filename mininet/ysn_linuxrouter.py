@@ -43,34 +43,31 @@ Acting as a Legacy L2 switch on vlan 172.28.28.0/24
 
 from mininet.topo import Topo
 from mininet.net import Mininet
-from mininet.node import Node, Controller, RemoteController, OVSKernelSwitch
+from mininet.node import Controller, RemoteController, OVSKernelSwitch
 from mininet.log import setLogLevel, info
 from mininet.cli import CLI
+from ysn.router import LinuxRouter
 
-class LinuxRouter( Node ):
-    "A Node with IP forwarding enabled."
-
-    def config( self, **params ):
-        super( LinuxRouter, self).config( **params )
-        # Enable forwarding on the router
-        self.cmd( 'sysctl net.ipv4.ip_forward=1' )
-
-    def terminate( self ):
-        self.cmd( 'sysctl net.ipv4.ip_forward=0' )
-        super( LinuxRouter, self ).terminate()
+# Static routes, installed in bulk by LinuxRouter.config()
+R1_ROUTES = [ '192.32.2.0/24 dev r1-eth2',
+              '172.28.28.0/24 via 192.32.2.8' ]
+R2_ROUTES = [ '192.31.2.0/24 dev r2-eth1',
+              '130.132.11.0/24 via 192.31.2.1' ]
 
 
 class NetworkTopo( Topo ):
     "A simple topology of a router with three subnets (one host in each)."
 
     def build( self, **_opts ):
-        router = self.addNode( 'r1', cls=LinuxRouter, ip='130.132.11.9/24')
+        router = self.addNode( 'r1', cls=LinuxRouter, ip='130.132.11.9/24',
+                               routes=R1_ROUTES )
         h1 = self.addHost( 'h1', ip='130.132.11.100/24',
                            defaultRoute='via 130.132.11.9' )
         self.addLink( h1, router, intfName2='r1-eth1',
                       params2={ 'ip' : '130.132.11.9/24' } )
         
-	router2 = self.addNode( 'r2', cls=LinuxRouter, ip='192.32.2.8/24' )
+	router2 = self.addNode( 'r2', cls=LinuxRouter, ip='192.32.2.8/24',
+				routes=R2_ROUTES )
         #h2 = self.addHost( 'h2', ip='172.28.28.100/24',
         #                   defaultRoute='via 172.28.28.10' )
 
@@ -98,10 +95,6 @@ def run():
     c0 = RemoteController('c0')
     net = Mininet( topo=topo, controller=c0)  # no controller needed
     net.start()
-    print net['r1'].cmd('ip route add 192.32.2.0/24 dev r1-eth2')
-    print net['r2'].cmd('ip route add 192.31.2.0/24 dev r2-eth1')
-    print net['r1'].cmd('ip route add 172.28.28.0/24 via 192.32.2.8')
-    print net['r2'].cmd('ip route add 130.132.11.0/24 via 192.31.2.1')
     info( '*** Routing Table on MX-104\n' )
     print net[ 'r1' ].cmd( 'route' )
     info( '*** Routing Table on KBT\n' )
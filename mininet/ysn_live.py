@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+"""
+ysn_live.py: edit a ysn topology while it runs
+
+Brings up a ysn script or generated topology spec and opens a CLI with
+two extra commands:
+
+    diff [target]   what differs between the running network and the
+                    target's current topology
+    apply [target]  change only that on the running network
+                    ( see ysn/live.py )
+    shape a b [p]   give the links between nodes a and b shaping
+                    profile p ( see ysn/shaping.py ), or none
+
+target defaults to the script or spec that was started, so the loop is:
+edit the file, then apply.
+
+    sudo python ysn_live.py ysn_5.py
+    mininet> apply
+    mininet> apply ysn_gen_bigger.json
+"""
+
+from argparse import ArgumentParser
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output, error
+from ysn.scripts import loadTopo, withNetwork
+from ysn.live import TopoDiff, applyDiff
+from ysn.shaping import PROFILES, setShape
+
+
+class LiveCLI( CLI ):
+    "CLI that can apply an edited topology to the running network."
+
+    def __init__( self, mininet, target, topoParams=None, **kwargs ):
+        self.target = target
+        self.topoParams = topoParams or {}
+        CLI.__init__( self, mininet, **kwargs )
+
+    def topoDiff( self, line ):
+        "Diff against the topology of target ( default: the one started )."
+        target = line.strip() or self.target
+        params = self.topoParams if target == self.target else {}
+        return TopoDiff( self.mn.topo, loadTopo( target, **params ) )
+
+    def do_diff( self, line ):
+        "Show what apply would change: diff [script or spec]"
+        try:
+            output( self.topoDiff( line ).summary() + '\n' )
+        except Exception as e:  # pylint: disable=broad-except
+            error( 'diff: %s\n' % e )
+
+    def do_apply( self, line ):
+        "Apply an edited topology to the running network: apply [target]"
+        try:
+            diff = self.topoDiff( line )
+            output( diff.summary() + '\n' )
+            if not diff.empty():
+                output( 'applied in %.3fs\n' % applyDiff( self.mn, diff ) )
+        except Exception as e:  # pylint: disable=broad-except
+            error( 'apply: %s\n' % e )
+
+    def do_shape( self, line ):
+        "Shape the links between two nodes: shape node1 node2 [profile]"
+        args = line.split()
+        if len( args ) not in ( 2, 3 ) or args[ 2: ] and \
+                args[ 2 ] not in PROFILES:
+            error( 'usage: shape node1 node2 [%s]\n' %
+                   '|'.join( sorted( PROFILES ) ) )
+            return
+        try:
+            links = setShape( self.mn, args[ 0 ], args[ 1 ],
+                              args[ 2 ] if args[ 2: ] else None )
+            output( 'shaped %d link(s)\n' % len( links ) )
+        except Exception as e:  # pylint: disable=broad-except
+            error( 'shape: %s\n' % e )
+
+
+def run():
+    "Run a topology under the live-editing CLI"
+    parser = ArgumentParser( description='Apply topology edits live' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    withNetwork( args.target, lambda net: LiveCLI( net, args.target, params ),
+                 **params )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
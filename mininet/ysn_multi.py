@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+"""
+ysn_multi.py: run many isolated instances of a ysn topology at once
+
+Runs every variant of a ysn script ( or generated topology spec ) as an
+isolated instance with its own switch names, OVS bridges and controller
+ports ( see ysn/instances.py ), as many at a time as there are cores,
+and reports each instance's bring-up time and measurements in one
+table.
+
+Variants come from a JSON/YAML file, either a list or a dict of lists
+whose product is taken:
+
+    { "backend": [ "ovsk", "ovs" ],
+      "cmap": [ {}, { "s1": "c0" } ],
+      "link": [ {}, { "delay": "5ms" }, { "bw": 10 } ] }
+
+    sudo python ysn_multi.py ysn_7.py --variants matrix.json \\
+        --measure ping verify --json multi.json --csv multi.csv
+    sudo python ysn_multi.py ysn_5.py --copies 8 --measure throughput
+"""
+
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.bench import metadata, writeJson, writeCsv
+from ysn.instances import runInstances, loadVariants
+
+FIELDS = [ 'instance', 'variant', 'bringup', 'seconds', 'pingLoss',
+           'reachable', 'pairs', 'flows', 'failed', 'totalMbps', 'error' ]
+
+
+def cell( value, fmt='%.2f' ):
+    "Format a table cell, which may be missing."
+    return fmt % value if value is not None else '-'
+
+def report( results ):
+    "Print one line per instance."
+    output( '%-6s %-32s %8s %8s %6s %9s %10s %s\n' % (
+        'inst', 'variant', 'bringup', 'seconds', 'loss%', 'reachable',
+        'total Mb/s', 'error' ) )
+    for r in results:
+        reachable = ( '%d/%d' % ( r[ 'reachable' ], r[ 'pairs' ] )
+                      if 'pairs' in r else '-' )
+        output( '%-6s %-32s %8s %8.2f %6s %9s %10s %s\n' % (
+            r[ 'instance' ], r[ 'variant' ][ :32 ],
+            cell( r.get( 'bringup' ) ), r[ 'seconds' ],
+            cell( r.get( 'pingLoss' ), '%.1f' ), reachable,
+            cell( r.get( 'totalMbps' ) ), r.get( 'error', '' ) ) )
+
+def run():
+    "Run the multi-instance runner"
+    parser = ArgumentParser( description='Parallel isolated instances' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--variants', help='JSON/YAML file of variants' )
+    parser.add_argument( '--copies', type=int, default=1,
+                         help='instances of each variant' )
+    parser.add_argument( '--processes', type=int,
+                         help='instances at once ( default: cores )' )
+    parser.add_argument( '--measure', nargs='*', default=[ 'ping' ],
+                         choices=[ 'ping', 'verify', 'throughput' ] )
+    parser.add_argument( '--seconds', type=int, default=5,
+                         help='throughput flow duration' )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write the table to this file' )
+    args = parser.parse_args()
+
+    variants = loadVariants( args.variants ) if args.variants else [ {} ]
+    variants = [ v for v in variants for _ in range( args.copies ) ]
+    results = runInstances( args.target, variants, args.processes,
+                            args.measure, args.seconds )
+    report( results )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results )
+    if args.csv:
+        writeCsv( args.csv, results, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
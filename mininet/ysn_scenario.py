@@ -0,0 +1,76 @@
+#!/usr/bin/python
+
+"""
+ysn_scenario.py: run a ysn topology unattended
+
+Brings up a ysn script ( or generated topology spec ), runs a scenario
+of timed actions where the CLI would start ( traffic, pings, link
+failures, route changes, data-plane checks; see ysn/scenario.py ),
+streams one JSON line per action to --out, tears the network down and
+exits with status 1 if any action failed, so it can run from cron or a
+nightly job.
+
+    sudo python ysn_scenario.py ysn_5.py failover.json --out ysn_5.jsonl
+
+The first line of --out describes the run ( commit, kernel, arguments ),
+the last one summarizes it.  --cli opens the CLI after the scenario,
+for a look at the state it left behind.
+"""
+
+import json
+import sys
+from argparse import ArgumentParser
+from time import time
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import metadata
+from ysn.scenario import Scenario, loadScenario
+
+
+def run():
+    "Run a scenario"
+    parser = ArgumentParser( description='Unattended scenario run' )
+    parser.add_argument( 'target', help='ysn script or topology spec' )
+    parser.add_argument( 'scenario', help='JSON/YAML scenario file' )
+    parser.add_argument( '--out', help='stream JSON results to this file' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--cli', action='store_true',
+                         help='open the CLI after the scenario' )
+    args = parser.parse_args()
+
+    actions = loadScenario( args.scenario )
+    stream = open( args.out, 'w' ) if args.out else None
+    if stream:
+        stream.write( json.dumps( { 'meta': metadata( **vars( args ) ) },
+                                  sort_keys=True ) + '\n' )
+    started = time()
+
+    def scenario( net ):
+        "Run the actions where the CLI would start."
+        result = Scenario( net, actions, stream )
+        ok = result.run()
+        if args.cli:
+            CLI( net )
+        return ok, result.results
+
+    params = { 'switch': args.switch } if args.switch else {}
+    try:
+        ok, results = withNetwork( args.target, scenario, **params )
+        failed = sum( 1 for r in results if not r[ 'ok' ] )
+        summary = { 'ok': ok, 'actions': len( results ), 'failed': failed,
+                    'seconds': round( time() - started, 3 ) }
+        if stream:
+            stream.write( json.dumps( { 'summary': summary },
+                                      sort_keys=True ) + '\n' )
+    finally:
+        if stream:
+            stream.close()
+    output( '%d/%d actions ok in %.1fs\n' % (
+        len( results ) - failed, len( results ), summary[ 'seconds' ] ) )
+    sys.exit( 0 if ok else 1 )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
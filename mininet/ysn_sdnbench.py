@@ -0,0 +1,117 @@
+#!/usr/bin/python
+
+"""
+ysn_sdnbench.py: proactive vs reactive flow setup in ysn_5_sdn.py
+
+Runs the SDN variant of ysn_5 in each mode and probes the selected host
+pairs concurrently ( see ysn/latency.py ):
+
+    reactive   controller-installed flows are cleared first, so every
+               pair's first packet waits for packet-ins
+    proactive  all L3 flows are pushed at start-up ( ysn/proactive.py )
+
+and reports the flow installation time, the flows in the switches
+afterwards, the packet-ins during probing ( table misses, which go to
+the controller ) and first-packet and steady-state RTTs.  The
+controller that ysn_5_sdn.py connects to ( RemoteController c1 ) must
+be running.
+
+    sudo python ysn_sdnbench.py --pairs all --rate 20 --json sdn.json
+"""
+
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.scripts import runScript
+from ysn.bench import selectPairs, PathClasses, runWaves, distribution, \
+    metadata, writeJson, writeCsv
+from ysn.latency import Probe, resetState
+from ysn.proactive import installProactive, tableMisses, flowCount
+
+MODES = [ 'reactive', 'proactive' ]
+
+FIELDS = [ 'mode', 'run', 'installed', 'installSeconds', 'flows',
+           'packetIns', 'firstP50Ms', 'firstP90Ms', 'firstMaxMs', 'p50Ms',
+           'p99Ms', 'lossPct' ]
+
+
+def measure( net, mode, args ):
+    "Set up forwarding in mode and probe all selected pairs."
+    installed, seconds = 0, None
+    if mode == 'proactive':
+        installed, seconds = installProactive( net )
+    resetState( net, flows=mode == 'reactive' )
+    paths = PathClasses( net )
+    probes = [ Probe( src, dst, args.rate, args.seconds,
+                      pathClass=paths( src, dst ) )
+               for src, dst in selectPairs( net, args.pairs, paths ) ]
+    misses = sum( tableMisses( s ) for s in net.switches )
+    runWaves( probes, args.concurrency )
+    misses = sum( tableMisses( s ) for s in net.switches ) - misses
+    first = distribution( [ p.first()[ 0 ] for p in probes if p.rtts ] )
+    steady = distribution( sum( [ p.steady() for p in probes ], [] ) )
+    sent = sum( p.count for p in probes )
+    return { 'installed': installed,
+             'installSeconds': round( seconds, 3 ) if seconds else None,
+             'flows': sum( flowCount( s ) for s in net.switches ),
+             'packetIns': misses,
+             'firstP50Ms': first[ 'p50' ], 'firstP90Ms': first[ 'p90' ],
+             'firstMaxMs': first[ 'max' ], 'p50Ms': steady[ 'p50' ],
+             'p99Ms': steady[ 'p99' ],
+             'lossPct': 100.0 * ( sent - sum( len( p.rtts )
+                                              for p in probes ) ) / sent
+                        if sent else None,
+             'pairs': [ p.asDict() for p in probes ] }
+
+def cell( value, fmt='%.3f' ):
+    "Format a table cell, which may be missing."
+    return fmt % value if value is not None else '-'
+
+def report( results ):
+    "Print the comparison table."
+    output( '%-10s %3s %9s %9s %6s %10s %9s %9s %9s %9s %9s\n' % (
+        'mode', 'run', 'installed', 'install s', 'flows', 'packet-ins',
+        'first p50', 'first p90', 'first max', 'p50', 'p99' ) )
+    for r in results:
+        output( '%-10s %3d %9d %9s %6d %10d %9s %9s %9s %9s %9s\n' % (
+            r[ 'mode' ], r[ 'run' ], r[ 'installed' ],
+            cell( r[ 'installSeconds' ] ), r[ 'flows' ], r[ 'packetIns' ],
+            cell( r[ 'firstP50Ms' ] ), cell( r[ 'firstP90Ms' ] ),
+            cell( r[ 'firstMaxMs' ] ), cell( r[ 'p50Ms' ] ),
+            cell( r[ 'p99Ms' ] ) ) )
+
+def run():
+    "Run the flow setup comparison"
+    parser = ArgumentParser( description='Proactive vs reactive flows' )
+    parser.add_argument( 'script', nargs='?', default='ysn_5_sdn.py' )
+    parser.add_argument( '--modes', nargs='+', default=MODES,
+                         choices=MODES )
+    parser.add_argument( '--pairs', default='all',
+                         help="'all', 'cross' or src:dst,src:dst,..." )
+    parser.add_argument( '--rate', type=float, default=10,
+                         help='probes per second per pair' )
+    parser.add_argument( '--seconds', type=float, default=3 )
+    parser.add_argument( '--concurrency', type=int,
+                         help='pairs at once ( default: all )' )
+    parser.add_argument( '--repeat', type=int, default=1 )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write the table to this file' )
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        for run in range( args.repeat ):
+            output( '*** %s, run %d\n' % ( mode, run ) )
+            results.append( dict(
+                runScript( args.script,
+                           lambda net: measure( net, mode, args ) ),
+                mode=mode, run=run ) )
+    report( results )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results )
+    if args.csv:
+        writeCsv( args.csv, results, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    run()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+"""
+ysn_shape.py: check that shaped links deliver their profiles
+
+Brings up a ysn script ( or generated topology spec with --wan/--lan
+shapes ) and, for every shaped link between two routers or hosts ( such
+as the r1-r2 WAN link of ysn_5.py ), measures the TCP rate with iperf
+and the RTT with ping, next to what its shape asks for ( see
+ysn/shaping.py ).  Exits with status 1 if a rate or RTT is off by more
+than --tolerance.
+
+    sudo python ysn_shape.py ysn_5.py
+    sudo python ysn_shape.py ysn_gen.json --wan wan-lossy --json shape.json
+"""
+
+import sys
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import metadata, writeJson
+from ysn.shaping import PROFILES, shapeOf, measurable, measureLink
+
+
+def cell( value, fmt='%.2f' ):
+    "Format a table cell, which may be missing."
+    return fmt % value if value is not None else '-'
+
+def within( result, tolerance ):
+    "Are the achieved rate and RTT within tolerance of the expected?"
+    if result[ 'expectedMbps' ] and (
+            result[ 'mbps' ] is None or
+            abs( result[ 'rateRatio' ] - 1 ) > tolerance ):
+        return False
+    # RTTs get 1ms of slack for the unshaped path
+    if result[ 'expectedRttMs' ] and (
+            result[ 'rttMs' ] is None or
+            abs( result[ 'rttMs' ] - result[ 'expectedRttMs' ] ) >
+            tolerance * result[ 'expectedRttMs' ] + 1 ):
+        return False
+    return True
+
+def measure( net, args ):
+    "Measure every measurable shaped link."
+    results = []
+    for link in net.links:
+        if not ( shapeOf( link.intf1 ) or shapeOf( link.intf2 ) ):
+            continue
+        if not measurable( link ):
+            output( '*** Skipping %s-%s: no addresses at both ends\n' % (
+                link.intf1, link.intf2 ) )
+            continue
+        result = measureLink( link, args.seconds )
+        result[ 'ok' ] = within( result, args.tolerance )
+        results.append( result )
+    return results
+
+def report( results ):
+    "Print expected against achieved, one line per link."
+    output( '%-20s %10s %10s %10s %10s %6s %4s\n' % (
+        'link', 'want Mb/s', 'got Mb/s', 'want RTT', 'got RTT', 'loss%',
+        'ok' ) )
+    for r in results:
+        output( '%-20s %10s %10s %10s %10s %6.1f %4s\n' % (
+            r[ 'link' ], cell( r[ 'expectedMbps' ] ), cell( r[ 'mbps' ] ),
+            cell( r[ 'expectedRttMs' ], '%.3f' ), cell( r[ 'rttMs' ], '%.3f' ),
+            r[ 'lossPct' ], 'yes' if r[ 'ok' ] else 'NO' ) )
+
+def run():
+    "Run the shaping check"
+    parser = ArgumentParser( description='Shaped link check' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--wan', choices=sorted( PROFILES ),
+                         help='router-to-router shape, for specs' )
+    parser.add_argument( '--lan', choices=sorted( PROFILES ),
+                         help='subnet link shape, for specs' )
+    parser.add_argument( '--seconds', type=int, default=5 )
+    parser.add_argument( '--tolerance', type=float, default=.1,
+                         help='allowed relative error ( default .1 )' )
+    parser.add_argument( '--json', help='write results to this file' )
+    args = parser.parse_args()
+
+    params = {}
+    if args.wan:
+        params[ 'wanShape' ] = args.wan
+    if args.lan:
+        params[ 'lanShape' ] = args.lan
+    results = withNetwork( args.target, lambda net: measure( net, args ),
+                           **params )
+    report( results )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results )
+    sys.exit( 0 if all( r[ 'ok' ] for r in results ) else 1 )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+
+"""
+ysn_startprof.py: where do the seconds go before the CLI prompt?
+
+Runs an unmodified ysn script ( anything with a run() that ends in
+CLI( net ); net.stop() ) under StartupProfiler, and reports per phase
+and per node the wall time, shell round-trips and spawned processes,
+from importing the script ( module-level controllers such as Maple )
+through net.build(), switch and controller start-up, route and sysctl
+installation, up to the CLI prompt and net.stop().
+
+    sudo python ysn_startprof.py ysn_8.py --json ysn_8-startup.json
+"""
+
+import imp
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from mininet.cli import CLI
+from ysn.profiler import StartupProfiler
+
+# Module-level helpers of the scripts that get a phase of their own
+HELPERS = { 'applySysctls': 'sysctls',
+            'installRoutes': 'routes',
+            'applyShaping': 'shaping' }
+
+
+def timed( profiler, fn, phase ):
+    "Wrap a plain function in a profiler phase."
+    def wrapper( *args, **kwargs ):
+        with profiler.phase( phase ):
+            return fn( *args, **kwargs )
+    return wrapper
+
+def run():
+    "Profile a ysn script"
+    parser = ArgumentParser( description='Startup profiler' )
+    parser.add_argument( 'script', help='ysn script with a run() function' )
+    parser.add_argument( '--json', help='write the report to this file' )
+    parser.add_argument( '--cli', action='store_true',
+                         help='still enter the CLI once the network is up' )
+    args = parser.parse_args()
+
+    profiler = StartupProfiler().install( hooks=False )
+    with profiler.phase( 'import' ):
+        script = imp.load_source( 'ysnscript', args.script )
+    # Hooks go in after the import so that the script's own
+    # subclasses ( MultiSwitch, Maple, ... ) are wrapped too
+    profiler.installHooks()
+    for name, phase in HELPERS.items():
+        if hasattr( script, name ):
+            setattr( script, name, timed( profiler, getattr( script, name ),
+                                          phase ) )
+
+    def prompt( net, *cliArgs, **cliKwargs ):
+        "Stand-in for CLI(): startup ends here."
+        profiler.mark( 'cli' )
+        if args.cli:
+            CLI( net, *cliArgs, **cliKwargs )
+
+    script.CLI = prompt
+    with profiler.phase( 'run' ):
+        script.run()
+    profiler.uninstall()
+    output( profiler.summary() )
+    if args.json:
+        profiler.dump( args.json )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+"""
+ysn_switchbench.py: compare switch backends on the same topology
+
+Runs one ysn script ( or generated topology spec ) once per switch
+backend ( see ysn/backends.py: ovsk, ovsbr, ovs, ovs-user, user, lxbr ),
+with the same workload each time:
+
+    bring-up    seconds from run() to the point where the CLI would start
+    throughput  concurrent TCP iperf flows between the selected pairs
+    cpu         CPU seconds of the switch processes and of softirq
+                during the throughput run, and per GB forwarded
+    latency     first-packet and steady-state RTTs between the pairs
+
+and prints one comparison table.
+
+    sudo python ysn_switchbench.py ysn_5.py --backends ovsk ovsbr user \\
+        --pairs cross --json switches.json --csv switches.csv
+"""
+
+from argparse import ArgumentParser
+from time import time
+
+from mininet.log import setLogLevel, output
+from mininet.node import Controller
+from ysn.scripts import loadScript, runScript, runSpec
+from ysn.bench import selectPairs, PathClasses, runWaves, distribution, \
+    metadata, writeJson, writeCsv
+from ysn.backends import BACKENDS, ProcessCpu, useBackend
+from ysn.throughput import Flow, runFlows
+from ysn.latency import Probe, resetState
+
+FIELDS = [ 'backend', 'run', 'bringup', 'flows', 'failed', 'totalMbps',
+           'meanMbps', 'switchCpu', 'softirq', 'cpuPerGB', 'firstP50Ms',
+           'p50Ms', 'p99Ms', 'lossPct' ]
+
+
+def workload( net, args ):
+    "Run the throughput and latency workload on a running network."
+    paths = PathClasses( net )
+    pairs = selectPairs( net, args.pairs, paths )
+    flows = [ Flow( src, dst, 'tcp', args.seconds ) for src, dst in pairs ]
+    cpu = ProcessCpu()
+    cpu.start()
+    waves = runFlows( flows, args.concurrency )
+    usage = cpu.stop()
+    done = [ f.result for f in flows if f.result ]
+    probes = [ Probe( src, dst, args.rate, args.seconds )
+               for src, dst in pairs ]
+    resetState( net )
+    runWaves( probes, args.concurrency )
+    first = distribution( [ p.first()[ 0 ] for p in probes
+                            if p.rtts ] )
+    steady = distribution( sum( [ p.steady() for p in probes ], [] ) )
+    sent = sum( p.count for p in probes )
+    gbytes = sum( r[ 'bytes' ] for r in done ) / 1e9
+    switchCpu = sum( usage[ 'byName' ].values() )
+    return {
+        'flows': len( flows ), 'failed': len( flows ) - len( done ),
+        # Mean over waves of the sum of the concurrent flows' rates
+        'totalMbps': ( sum( sum( f.result[ 'bps' ] for f in wave
+                                 if f.result )
+                            for wave, _s in waves ) / len( waves ) / 1e6
+                       if waves else None ),
+        'meanMbps': ( sum( r[ 'bps' ] for r in done ) / len( done ) / 1e6
+                      if done else None ),
+        'switchCpu': round( switchCpu, 3 ), 'softirq': usage[ 'softirq' ],
+        'cpuPerGB': ( round( ( switchCpu + usage[ 'softirq' ] ) / gbytes, 3 )
+                      if gbytes else None ),
+        'cpu': usage,
+        'firstP50Ms': first[ 'p50' ], 'p50Ms': steady[ 'p50' ],
+        'p99Ms': steady[ 'p99' ],
+        'lossPct': 100.0 * ( sent - sum( len( p.rtts ) for p in probes ) ) /
+                   sent if sent else None }
+
+def runBackend( target, backend, args ):
+    "Bring up target with backend's switches and run the workload."
+    def measure( net ):
+        "Callback at the point where the CLI would start."
+        bringup = time() - started
+        return dict( workload( net, args ), bringup=round( bringup, 3 ) )
+
+    if target.endswith( '.py' ):
+        script = useBackend( loadScript( target ), backend )
+        started = time()
+        return runScript( script, measure )
+    cls, opts, needsController = BACKENDS[ backend ]
+    started = time()
+    return runSpec( target, measure, switch=cls, switchOpts=opts,
+                    controller=Controller if needsController else None )
+
+def cell( value, fmt='%.2f' ):
+    "Format a table cell, which may be missing."
+    return fmt % value if value is not None else '-'
+
+def report( results ):
+    "Print the comparison table."
+    output( '%-9s %3s %8s %6s %10s %10s %8s %8s %8s %9s %8s %8s\n' % (
+        'backend', 'run', 'bringup', 'fail', 'total Mb/s', 'mean Mb/s',
+        'swCPU s', 'sirq s', 'CPU s/GB', 'first ms', 'p50 ms', 'p99 ms' ) )
+    for r in results:
+        output( '%-9s %3d %8.2f %6d %10s %10s %8.2f %8.2f %8s %9s %8s %8s\n' %
+                ( r[ 'backend' ], r[ 'run' ], r[ 'bringup' ], r[ 'failed' ],
+                  cell( r[ 'totalMbps' ] ), cell( r[ 'meanMbps' ] ),
+                  r[ 'switchCpu' ], r[ 'softirq' ], cell( r[ 'cpuPerGB' ] ),
+                  cell( r[ 'firstP50Ms' ], '%.3f' ),
+                  cell( r[ 'p50Ms' ], '%.3f' ),
+                  cell( r[ 'p99Ms' ], '%.3f' ) ) )
+
+def run():
+    "Run the switch backend comparison"
+    parser = ArgumentParser( description='Switch backend comparison' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--backends', nargs='+', default=sorted( BACKENDS ),
+                         choices=sorted( BACKENDS ) )
+    parser.add_argument( '--pairs', default='cross',
+                         help="'all', 'cross' or src:dst,src:dst,..." )
+    parser.add_argument( '--seconds', type=int, default=5 )
+    parser.add_argument( '--rate', type=float, default=10,
+                         help='latency probes per second per pair' )
+    parser.add_argument( '--concurrency', type=int,
+                         help='flows at once ( default: all )' )
+    parser.add_argument( '--repeat', type=int, default=1 )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write the table to this file' )
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backends:
+        for run in range( args.repeat ):
+            output( '*** Backend %s, run %d\n' % ( backend, run ) )
+            results.append( dict( runBackend( args.target, backend, args ),
+                                  backend=backend, run=run ) )
+    report( results )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results )
+    if args.csv:
+        writeCsv( args.csv, results, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'warning' )
+    run()
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+"""
+ysn_telemetry.py: stream counters from a running ysn topology
+
+Brings up a ysn script ( or generated topology spec ) and samples every
+OVS switch's port and flow counters and every router's and host's
+interface and qdisc counters at sub-second intervals ( see
+ysn/telemetry.py ), streaming them to CSV, JSON lines or a directory of
+column files while the CLI ( or --seconds of waiting ) runs.  Prints the
+busiest interfaces at the end.
+
+    sudo python ysn_telemetry.py ysn_5.py --interval .2 --csv t.csv --cli
+    sudo python ysn_telemetry.py ysn_gen.json --seconds 30 --columns t/
+"""
+
+from argparse import ArgumentParser
+from time import sleep
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.telemetry import Telemetry, CsvSink, JsonlSink, ColumnSink
+
+
+def collect( net, args ):
+    "Sample while the CLI or the wait runs."
+    sinks = []
+    if args.csv:
+        sinks.append( CsvSink( args.csv ) )
+    if args.jsonl:
+        sinks.append( JsonlSink( args.jsonl ) )
+    if args.columns:
+        sinks.append( ColumnSink( args.columns ) )
+    telemetry = Telemetry( net, args.interval, args.capacity,
+                           flows=not args.no_flows,
+                           qdiscs=not args.no_qdiscs, sinks=sinks )
+    telemetry.start()
+    try:
+        if args.cli:
+            CLI( net )
+        else:
+            sleep( args.seconds )
+    finally:
+        telemetry.stop()
+    return telemetry.ring
+
+def report( ring, top ):
+    "Print the interfaces that sent the most, with their mean rates."
+    rates = []
+    for key in ring.keys:
+        if key[ 1 ] == 'intf' and key[ 3 ] == 'tx_bytes':
+            rate = ring.rate( key )
+            if rate:
+                rates.append( ( rate, key ) )
+    output( '%-8s %-14s %14s\n' % ( 'node', 'intf', 'tx Mbits/sec' ) )
+    for rate, key in sorted( rates, reverse=True )[ :top ]:
+        output( '%-8s %-14s %14.3f\n' % ( key[ 0 ], key[ 2 ],
+                                          rate * 8 / 1e6 ) )
+
+def run():
+    "Run the telemetry collector"
+    parser = ArgumentParser( description='Streaming counter telemetry' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--interval', type=float, default=.5,
+                         help='seconds between samples ( default .5 )' )
+    parser.add_argument( '--capacity', type=int, default=1 << 20,
+                         help='samples kept in memory' )
+    parser.add_argument( '--seconds', type=float, default=10,
+                         help='how long to sample without --cli' )
+    parser.add_argument( '--cli', action='store_true',
+                         help='sample while the CLI runs' )
+    parser.add_argument( '--no-flows', action='store_true',
+                         help='leave out OVS flow counters' )
+    parser.add_argument( '--no-qdiscs', action='store_true',
+                         help='leave out qdisc counters' )
+    parser.add_argument( '--csv', help='stream samples to this CSV file' )
+    parser.add_argument( '--jsonl', help='stream samples as JSON lines' )
+    parser.add_argument( '--columns', metavar='DIR',
+                         help='stream samples as column files' )
+    parser.add_argument( '--top', type=int, default=10,
+                         help='interfaces to report' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    ring = withNetwork( args.target, lambda net: collect( net, args ),
+                        **params )
+    report( ring, args.top )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+"""
+ysn_throughput.py: all-pairs iperf throughput over a ysn topology
+
+Brings up a ysn script ( e.g. ysn_5.py ) or a generated topology spec
+( e.g. ysn_gen.json ), runs TCP and/or UDP iperf flows for all or
+selected host pairs, many at once, and reports per-pair throughput and
+aggregates per protocol and per path class ( 'local', 'r2', 'r1-r2',
+... ), so the cost of each router hop and of the r1-r2 link shows up
+directly.  Results carry the git commit and run parameters, so runs of
+different commits can be compared.
+
+    sudo python ysn_throughput.py ysn_5.py --pairs cross --proto tcp udp \\
+        --seconds 10 --concurrency 4 --json out.json --csv out.csv
+
+With --state FILE the network is kept between runs and restored from
+FILE on the next one ( see ysn/warm.py ); ysn_warm.py --discard FILE
+tears it down.
+"""
+
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import selectPairs, PathClasses, metadata, writeJson, writeCsv
+from ysn.throughput import Flow, runFlows, aggregate
+
+FIELDS = [ 'run', 'src', 'dst', 'srcIp', 'dstIp', 'proto', 'path', 'seconds',
+           'ok', 'bytes', 'bps', 'jitterMs', 'lost', 'total', 'lossPct' ]
+
+
+def benchmark( net, args ):
+    "Run every protocol and repetition on a running network."
+    paths = PathClasses( net )
+    pairs = selectPairs( net, args.pairs, paths )
+    results, aggregates = [], []
+    for run in range( args.repeat ):
+        for proto in args.proto:
+            flows = [ Flow( src, dst, proto, args.seconds, args.bw,
+                            pathClass=paths( src, dst ) )
+                      for src, dst in pairs ]
+            waves = runFlows( flows, args.concurrency )
+            results += [ dict( f.asDict(), run=run ) for f in flows ]
+            aggregates.append( dict( aggregate( waves ), run=run,
+                                     proto=proto ) )
+    return results, aggregates
+
+def report( results, aggregates ):
+    "Print per-pair results and aggregates."
+    output( '%-4s %-6s %-6s %-5s %-8s %12s %8s\n' % (
+        'run', 'src', 'dst', 'proto', 'path', 'Mbits/sec', 'loss%' ) )
+    for r in results:
+        output( '%-4d %-6s %-6s %-5s %-8s %12s %8s\n' % (
+            r[ 'run' ], r[ 'src' ], r[ 'dst' ], r[ 'proto' ], r[ 'path' ],
+            '%.2f' % ( r[ 'bps' ] / 1e6 ) if r[ 'ok' ] else 'failed',
+            '%.2f' % r[ 'lossPct' ] if 'lossPct' in r else '' ) )
+    for a in aggregates:
+        for path, entry in sorted( a[ 'paths' ].items() ):
+            output( 'run %d %-14s %3d flows %10.2f Mbits/sec total '
+                    '%10.2f mean\n' % ( a[ 'run' ], path, entry[ 'flows' ],
+                                        entry[ 'bps' ] / 1e6,
+                                        entry[ 'meanBps' ] / 1e6 ) )
+
+def run():
+    "Run the throughput benchmark"
+    parser = ArgumentParser( description='All-pairs throughput benchmark' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--pairs', default='all',
+                         help="'all', 'cross' or src:dst,src:dst,..." )
+    parser.add_argument( '--proto', nargs='+', default=[ 'tcp' ],
+                         choices=[ 'tcp', 'udp' ] )
+    parser.add_argument( '--seconds', type=int, default=5 )
+    parser.add_argument( '--bw', default='10M', help='UDP target rate' )
+    parser.add_argument( '--concurrency', type=int,
+                         help='flows at once ( default: all )' )
+    parser.add_argument( '--repeat', type=int, default=1 )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--state',
+                         help='keep the network here between runs' )
+    parser.add_argument( '--json', help='write results to this file' )
+    parser.add_argument( '--csv', help='write per-pair results to this file' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    if args.state:
+        params[ 'state' ] = args.state
+    results, aggregates = withNetwork(
+        args.target, lambda net: benchmark( net, args ), **params )
+    report( results, aggregates )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), results, aggregates )
+    if args.csv:
+        writeCsv( args.csv, results, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
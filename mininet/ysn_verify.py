@@ -0,0 +1,132 @@
+#!/usr/bin/python
+
+"""
+ysn_verify.py: check reachability without sending packets
+
+Captures the data plane of a ysn script or generated topology spec
+( addresses, routing tables, forwarding and rp_filter sysctls, OVS
+flows; see ysn/verify.py ) at the point where the CLI would start, and
+reports for every host pair whether packets get through and over which
+path, plus forwarding loops and blackholes.
+
+    sudo python ysn_verify.py ysn_5.py --snapshot ysn_5.json
+    python ysn_verify.py --load ysn_5.json --json report.json
+    python ysn_verify.py ysn_gen.json --topo
+
+--load verifies a saved snapshot, and --topo the state predicted from
+the topology alone ( nothing is started ); neither needs root.  The
+exit status is 1 if any pair is unreachable or a loop was found.
+
+--watch verifies the running network once and then opens the CLI,
+re-verifying incrementally after every route or flow change made there
+( see ysn/watch.py ) and printing what changed:
+
+    sudo python ysn_verify.py ysn_5.py --watch
+    mininet> r2 ip route del 10.1.3.0/24 via 10.1.4.1
+"""
+
+import sys
+from argparse import ArgumentParser
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output
+from ysn.scripts import loadTopo, withNetwork
+from ysn.bench import metadata, writeJson
+from ysn.verify import Snapshot, Model
+from ysn.watch import Watcher
+
+
+def report( result ):
+    "Print the pairs that are not reachable and the summary."
+    pairs = result[ 'pairs' ]
+    bad = [ p for p in pairs if p[ 'status' ] != 'reachable' ]
+    if bad:
+        output( '%-6s %-6s %-15s %-20s %s\n' % (
+            'src', 'dst', 'addr', 'status', 'path' ) )
+    for p in bad:
+        output( '%-6s %-6s %-15s %-20s %s\n' % (
+            p[ 'src' ], p[ 'dst' ], p[ 'addr' ], p[ 'status' ],
+            ' '.join( p[ 'path' ] ) ) )
+    for loop in result[ 'loops' ]:
+        output( 'loop %s for %s\n' % ( ' '.join( loop[ 'cycle' ] ),
+                                      ' '.join( loop[ 'prefixes' ] ) ) )
+    for hole in result[ 'blackholes' ]:
+        output( 'blackhole at %s for %s: %s\n' % (
+            hole[ 'at' ], hole[ 'addr' ], hole[ 'reason' ] ) )
+    stats = result[ 'stats' ]
+    output( '%d/%d pairs reachable, %d loops, %d blackholes '
+            '( %d nodes, %d entries, %d classes, %.3fs build, '
+            '%.3fs verify )\n' % (
+                len( pairs ) - len( bad ), len( pairs ),
+                len( result[ 'loops' ] ), len( result[ 'blackholes' ] ),
+                stats[ 'nodes' ], stats[ 'entries' ], stats[ 'classes' ],
+                stats[ 'buildSeconds' ], stats[ 'verifySeconds' ] ) )
+    return not bad and not result[ 'loops' ]
+
+def reportChange( change ):
+    "Print what a batch of route or flow changes did."
+    output( '*** %d change(s) on %s: %s, %.1fms\n' % (
+        change[ 'events' ], ' '.join( change[ 'nodes' ] ),
+        ' '.join( change[ 'prefixes' ][ :4 ] ) or 'no effect',
+        change[ 'seconds' ] * 1000 ) )
+    for p in change[ 'pairs' ]:
+        output( '    %s -> %s ( %s ): %s -> %s %s\n' % (
+            p[ 'src' ], p[ 'dst' ], p[ 'addr' ], p[ 'was' ], p[ 'status' ],
+            ' '.join( p[ 'path' ] ) ) )
+    for loop in change[ 'loops' ]:
+        output( '    new loop %s for %s\n' % (
+            ' '.join( loop[ 'cycle' ] ), ' '.join( loop[ 'prefixes' ] ) ) )
+    for loop in change[ 'cleared' ]:
+        output( '    loop %s cleared\n' % ' '.join( loop[ 'cycle' ] ) )
+    for hole in change[ 'blackholes' ]:
+        output( '    blackhole at %s for %s: %s\n' % (
+            hole[ 'at' ], hole[ 'addr' ], hole[ 'reason' ] ) )
+
+def watch( net, args ):
+    "Verify a running network, then keep verifying it under the CLI."
+    model = Model( Snapshot.capture( net ) )
+    report( model.verify( args.hosts.split( ',' ) if args.hosts else None ) )
+    watcher = Watcher( net, model, callback=reportChange )
+    watcher.start()
+    try:
+        CLI( net )
+    finally:
+        watcher.stop()
+
+def run():
+    "Run the verifier"
+    parser = ArgumentParser( description='Data-plane reachability check' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--load', help='verify this saved snapshot' )
+    parser.add_argument( '--topo', action='store_true',
+                         help='verify the state predicted from the topology' )
+    parser.add_argument( '--snapshot', help='save the snapshot to this file' )
+    parser.add_argument( '--hosts', help='only these hosts, h1,h2,...' )
+    parser.add_argument( '--watch', action='store_true',
+                         help='keep verifying changes made at the CLI' )
+    parser.add_argument( '--json', help='write the report to this file' )
+    args = parser.parse_args()
+
+    if args.watch:
+        return withNetwork( args.target, lambda net: watch( net, args ) )
+    if args.load:
+        snap = Snapshot.load( args.load )
+    elif args.topo:
+        snap = Snapshot.fromTopo( loadTopo( args.target ) )
+    else:
+        snap = withNetwork( args.target, Snapshot.capture )
+    if args.snapshot:
+        snap.dump( args.snapshot )
+    result = Model( snap ).verify(
+        args.hosts.split( ',' ) if args.hosts else None )
+    ok = report( result )
+    if args.json:
+        writeJson( args.json, metadata( **vars( args ) ), result[ 'pairs' ],
+                   dict( ( k, v ) for k, v in result.items()
+                         if k != 'pairs' ) )
+    sys.exit( 0 if ok else 1 )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
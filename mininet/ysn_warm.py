@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+"""
+ysn_warm.py: bring up a ysn topology from a kept network
+
+Brings up a ysn script or generated topology spec as a WarmMininet
+( see ysn/warm.py ): the first run builds it and keeps it in the state
+file, later runs restore it and only fix what changed since.  Reports
+the seconds up to the point where the CLI would start.
+
+    sudo python ysn_warm.py ysn_5.py --state /tmp/ysn_5.warm
+    sudo python ysn_warm.py ysn_5.py --state /tmp/ysn_5.warm --cli
+    sudo python ysn_warm.py --discard /tmp/ysn_5.warm
+"""
+
+from argparse import ArgumentParser
+from time import time
+
+from mininet.cli import CLI
+from mininet.log import setLogLevel, output, error
+from ysn.scripts import withNetwork
+from ysn.warm import discardState
+
+
+def run():
+    "Warm-start a topology"
+    parser = ArgumentParser( description='Warm-start a ysn topology' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--state', help='keep the network in this file' )
+    parser.add_argument( '--discard', metavar='STATE',
+                         help='tear down the network kept in this file' )
+    parser.add_argument( '--cli', action='store_true',
+                         help='enter the CLI once up' )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    args = parser.parse_args()
+
+    if args.discard:
+        return discardState( args.discard )
+    if not args.state:
+        return error( 'ysn_warm.py: --state or --discard is required\n' )
+    params = { 'state': args.state }
+    if args.switch:
+        params[ 'switch' ] = args.switch
+    start = time()
+
+    def ready( net ):
+        "Report the bring-up time, then maybe enter the CLI."
+        output( '%s up in %.3fs ( %s )\n' % (
+            args.target, time() - start,
+            'warm' if getattr( net, 'warm', False ) else 'cold' ) )
+        if args.cli:
+            CLI( net )
+
+    return withNetwork( args.target, ready, **params )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+
+"""
+ysn_workload.py: flow completion times under a realistic flow mix
+
+Brings up a ysn script ( or generated topology spec ) and runs a traffic
+matrix of Poisson flow arrivals with heavy-tailed sizes over it ( see
+ysn/workload.py ), one event-loop agent per host, then reports flow
+completion time distributions by path class and size bucket:
+
+    sudo python ysn_workload.py ysn_5.py --matrix h1,h2:h5,h6,h7,h8 \\
+        --rate 50 --sizes websearch --seconds 20 --seed 1 --json wl.json
+    sudo python ysn_workload.py ysn_gen.json --file matrix.yaml
+
+A matrix entry is SRC[,SRC]:DST[,DST][:RATE[:SIZES]]; without --matrix
+or --file every end host sends to every other one.
+"""
+
+from argparse import ArgumentParser
+
+from mininet.log import setLogLevel, output
+from ysn.scripts import withNetwork
+from ysn.bench import hostsOf, metadata, writeJson, writeCsv
+from ysn.workload import ( Workload, parseEntry, loadMatrix, fctTable,
+                           bucketOrder )
+
+FIELDS = [ 'id', 'at', 'src', 'dst', 'size', 'bucket', 'path', 'ok',
+           'fctMs', 'lagMs' ]
+
+
+def runWorkload( net, args ):
+    "Run the matrix on a running network."
+    if args.file:
+        matrix = loadMatrix( args.file )
+    elif args.matrix:
+        matrix = [ parseEntry( e, args.rate, args.sizes )
+                   for e in args.matrix ]
+    else:
+        names = [ h.name for h in hostsOf( net ) ]
+        matrix = [ { 'src': names, 'dst': names } ]
+    workload = Workload( net, matrix, args.seconds, args.rate, args.sizes,
+                         args.seed, args.port, args.timeout, args.max_size )
+    return workload.run()
+
+def fmt( value ):
+    "A millisecond figure, or '-'."
+    return '-' if value is None else '%.2f' % value
+
+def report( flows, table, seconds ):
+    "Print offered load, lateness and the FCT table."
+    offered = sum( f[ 'size' ] for f in flows ) * 8 / float( seconds )
+    lags = [ f[ 'lagMs' ] for f in flows if f[ 'lagMs' ] is not None ]
+    output( '%d flows, %.2f Mbits/sec offered, start lag max %s ms\n' % (
+        len( flows ), offered / 1e6, fmt( max( lags ) if lags else None ) ) )
+    output( '%-10s %-10s %6s %6s %9s %9s %9s %9s %9s\n' % (
+        'path', 'size', 'flows', 'failed', 'mean ms', 'p50', 'p90', 'p99',
+        'max' ) )
+    for path in sorted( table, key=lambda p: ( p == 'all', p ) ):
+        for bucket in sorted( table[ path ], key=bucketOrder ):
+            d = table[ path ][ bucket ]
+            output( '%-10s %-10s %6d %6d %9s %9s %9s %9s %9s\n' % (
+                path, bucket, d[ 'flows' ], d[ 'failed' ],
+                fmt( d[ 'meanMs' ] ), fmt( d[ 'p50' ] ), fmt( d[ 'p90' ] ),
+                fmt( d[ 'p99' ] ), fmt( d[ 'max' ] ) ) )
+
+def run():
+    "Run a workload and report flow completion times"
+    parser = ArgumentParser( description='Flow mix with FCT reporting' )
+    parser.add_argument( 'target', nargs='?', default='ysn_5.py',
+                         help='ysn script or topology spec' )
+    parser.add_argument( '--matrix', nargs='+', metavar='ENTRY',
+                         help='SRC[,SRC]:DST[,DST][:RATE[:SIZES]]' )
+    parser.add_argument( '--file', help='JSON or YAML traffic matrix' )
+    parser.add_argument( '--rate', type=float, default=10,
+                         help='flow arrivals per second per entry' )
+    parser.add_argument( '--sizes', default='websearch',
+                         help='websearch, datamining, pareto:MEAN[:ALPHA] '
+                         'or fixed:BYTES' )
+    parser.add_argument( '--max-size', type=int, metavar='BYTES',
+                         help='cap on flow sizes' )
+    parser.add_argument( '--seconds', type=float, default=10,
+                         help='how long flows keep arriving' )
+    parser.add_argument( '--seed', type=int )
+    parser.add_argument( '--timeout', type=float, default=30,
+                         help='seconds before a flow counts as failed' )
+    parser.add_argument( '--port', type=int, default=5700 )
+    parser.add_argument( '--switch', help='switch type, for specs' )
+    parser.add_argument( '--json', help='write results to this JSON file' )
+    parser.add_argument( '--csv', help='write per-flow rows to this CSV' )
+    args = parser.parse_args()
+
+    params = { 'switch': args.switch } if args.switch else {}
+    flows = withNetwork( args.target, lambda net: runWorkload( net, args ),
+                         **params )
+    if not flows:
+        return
+    table = fctTable( flows )
+    report( flows, table, args.seconds )
+    if args.json:
+        writeJson( args.json, metadata( target=args.target,
+                                        matrix=args.matrix, file=args.file,
+                                        rate=args.rate, sizes=args.sizes,
+                                        seconds=args.seconds, seed=args.seed,
+                                        maxSize=args.max_size ),
+                   flows, table )
+    if args.csv:
+        writeCsv( args.csv, flows, FIELDS )
+
+if __name__ == '__main__':
+    setLogLevel( 'info' )
+    run()